@@ -0,0 +1,61 @@
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Tuple, Type, TypeVar
+
+T = TypeVar("T")
+
+
+class ServiceContainer:
+    """
+    Process-wide registry of services and repositories.
+
+    get() builds an object on first use and returns the same instance afterwards,
+    so the service graph is built once per process instead of once per request or task.
+    Services are stateless, which makes sharing them between threads safe.
+    """
+
+    def __init__(self) -> None:
+        self._instances: Dict[Tuple[type, Tuple[Any, ...]], Any] = {}
+        self._overrides: Dict[type, Any] = {}
+        # reentrant: building a service gets the services it depends on
+        self._lock = threading.RLock()
+
+    def get(self, cls: Type[T], *args: Any) -> T:
+        """
+        Return the shared instance of cls built with args.
+
+        Args:
+        - cls (Type[T]): The class of the service or repository.
+        - *args: Arguments of the constructor, e.g. the model of a repository.
+
+        Returns:
+        - T: The shared instance, or the override of cls if one is set.
+        """
+        if cls in self._overrides:
+            return self._overrides[cls]
+        key = (cls, args)
+        instance = self._instances.get(key)
+        if instance is None:
+            with self._lock:
+                instance = self._instances.get(key)
+                if instance is None:
+                    instance = cls(*args)
+                    self._instances[key] = instance
+        return instance
+
+    @contextmanager
+    def override(self, cls: type, instance: Any) -> Iterator[Any]:
+        """Return instance from get(cls) while the block runs, e.g. a mock in tests."""
+        self._overrides[cls] = instance
+        try:
+            yield instance
+        finally:
+            del self._overrides[cls]
+
+    def reset(self) -> None:
+        """Drop all built instances; they are built again on next use."""
+        with self._lock:
+            self._instances.clear()
+
+
+container = ServiceContainer()
@@ -0,0 +1,51 @@
+from contextlib import contextmanager
+from contextvars import ContextVar, Token
+from typing import Dict, Iterator, Optional, Tuple, Type
+
+from django.db.models import Model
+
+IdentityMap = Dict[Tuple[Type[Model], object], Model]
+
+_identity_map: ContextVar[Optional[IdentityMap]] = ContextVar("identity_map", default=None)
+
+
+def open_scope() -> Token:
+    """Start a new identity map for the current request or task."""
+    return _identity_map.set({})
+
+
+def close_scope(token: Token) -> None:
+    """Drop the identity map started by open_scope."""
+    _identity_map.reset(token)
+
+
+@contextmanager
+def scope() -> Iterator[None]:
+    """Keep loaded objects in an identity map while the block runs."""
+    token = open_scope()
+    try:
+        yield
+    finally:
+        close_scope(token)
+
+
+def get(model: Type[Model], obj_id: object) -> Optional[Model]:
+    """Return the already loaded object of model by id, if any."""
+    identity_map = _identity_map.get()
+    if identity_map is None:
+        return None
+    return identity_map.get((model._meta.concrete_model, obj_id))
+
+
+def add(obj: Model) -> None:
+    """Remember a loaded object; it replaces any previously loaded copy of the same row."""
+    identity_map = _identity_map.get()
+    if identity_map is not None and obj.pk is not None:
+        identity_map[(obj._meta.concrete_model, obj.pk)] = obj
+
+
+def discard(obj: Model) -> None:
+    """Forget a loaded object, e.g. after it was deleted."""
+    identity_map = _identity_map.get()
+    if identity_map is not None:
+        identity_map.pop((obj._meta.concrete_model, obj.pk), None)
@@ -0,0 +1,120 @@
+import inspect
+import logging
+import threading
+import uuid
+from functools import wraps
+from typing import Callable, Dict, Optional
+
+import redis
+
+from base.redis_client import get_redis_client
+
+logger = logging.getLogger(__name__)
+
+LOCK_METRICS_KEY = "locks:metrics"
+
+
+class LeaseLock:
+    """
+    Redis lock that expires after ttl seconds unless its holder keeps it alive.
+
+    While held, a heartbeat thread extends the lease every ttl / 3 seconds, so a long run
+    keeps the lock and a crashed holder loses it after at most ttl seconds.
+    """
+
+    EXTEND_SCRIPT = """
+    if redis.call("get", KEYS[1]) == ARGV[1] then
+        return redis.call("pexpire", KEYS[1], ARGV[2])
+    end
+    return 0
+    """
+    RELEASE_SCRIPT = """
+    if redis.call("get", KEYS[1]) == ARGV[1] then
+        return redis.call("del", KEYS[1])
+    end
+    return 0
+    """
+
+    def __init__(self, name: str, ttl: int = 60, client: Optional[redis.Redis] = None) -> None:
+        self.name = name
+        self.key = f"locks:{name}"
+        self.ttl = ttl
+        self.client = client or get_redis_client()
+        self.token = uuid.uuid4().hex
+        self.lost = False
+        self._stop_heartbeat = threading.Event()
+        self._heartbeat: Optional[threading.Thread] = None
+
+    def acquire(self) -> bool:
+        if not self.client.set(self.key, self.token, nx=True, px=self.ttl * 1000):
+            return False
+        self._heartbeat = threading.Thread(
+            target=self._keep_alive, name=f"lease-{self.name}", daemon=True
+        )
+        self._heartbeat.start()
+        return True
+
+    def release(self) -> None:
+        self._stop_heartbeat.set()
+        if self._heartbeat is not None:
+            self._heartbeat.join()
+        self.client.eval(self.RELEASE_SCRIPT, 1, self.key, self.token)
+
+    def _keep_alive(self) -> None:
+        while not self._stop_heartbeat.wait(self.ttl / 3):
+            try:
+                extended = self.client.eval(
+                    self.EXTEND_SCRIPT, 1, self.key, self.token, self.ttl * 1000
+                )
+            except redis.RedisError as e:
+                logger.error(f"[ERROR] LeaseLock {self.name}: heartbeat failed: {e}")
+                continue
+            if not extended:
+                self.lost = True
+                logger.error(f"[ERROR] LeaseLock {self.name}: lease lost while running")
+                return
+
+
+def record_lock_event(name: str, event: str) -> None:
+    """Count acquired, skipped and lost runs of a lock."""
+    get_redis_client().hincrby(LOCK_METRICS_KEY, f"{name}:{event}", 1)
+
+
+def get_lock_metrics() -> Dict[str, int]:
+    return {
+        key.decode(): int(value)
+        for key, value in get_redis_client().hgetall(LOCK_METRICS_KEY).items()
+    }
+
+
+def single_instance(name: str, ttl: int = 60) -> Callable:
+    """
+    Run the decorated function only if no other process runs it right now.
+
+    name is formatted with the arguments of the call by parameter name, however they are
+    passed, e.g. "partition:{index}". An overlapping call is skipped and returns None.
+    """
+
+    def decorator(func: Callable) -> Callable:
+        signature = inspect.signature(func)
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            arguments = signature.bind(*args, **kwargs)
+            arguments.apply_defaults()
+            lock = LeaseLock(name.format(**arguments.arguments), ttl=ttl)
+            if not lock.acquire():
+                record_lock_event(lock.name, "skipped")
+                logger.warning(f"[WARNING] {lock.name} is already running, run skipped")
+                return None
+            record_lock_event(lock.name, "acquired")
+            try:
+                return func(*args, **kwargs)
+            finally:
+                lock.release()
+                if lock.lost:
+                    record_lock_event(lock.name, "lost")
+
+        return wrapper
+
+    return decorator
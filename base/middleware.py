@@ -0,0 +1,12 @@
+from base import identity_map
+
+
+class IdentityMapMiddleware:
+    """Share loaded objects between services for the duration of one request."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with identity_map.scope():
+            return self.get_response(request)
@@ -0,0 +1,14 @@
+from typing import Optional
+
+import redis
+from django.conf import settings
+
+_client: Optional[redis.Redis] = None
+
+
+def get_redis_client() -> redis.Redis:
+    """Return the process-wide Redis client for REDIS_URL."""
+    global _client
+    if _client is None:
+        _client = redis.Redis.from_url(settings.REDIS_URL)
+    return _client
@@ -1,8 +1,9 @@
-from typing import Type
+from typing import Dict, Iterable, List, Optional, Type
 
 from django.core.exceptions import ObjectDoesNotExist
 from django.db.models import Model, QuerySet
 
+from base import identity_map
 from base.exceptions import BaseClientException
 
 
@@ -11,18 +12,25 @@ class BaseRepository:
         self.model = model
 
     def get_by_id(self, obj_id: int) -> Model:
+        obj = identity_map.get(self.model, obj_id)
+        if obj is not None:
+            return obj
         try:
-            return self.model.objects.get(id=obj_id)
+            obj = self.model.objects.get(id=obj_id)
         except ObjectDoesNotExist:
             raise BaseClientException(
                 f"Object of <{self.model.__name__}> by this obj_id not exist."
             )
+        identity_map.add(obj)
+        return obj
 
     def get_all(self) -> QuerySet[Model]:
         return self.model.objects.all()
 
     def create(self, **kwargs) -> Model:
-        return self.model.objects.create(**kwargs)
+        obj = self.model.objects.create(**kwargs)
+        identity_map.add(obj)
+        return obj
 
     def update(self, obj: Model, **kwargs) -> None:
         for key, value in kwargs.items():
@@ -30,7 +38,26 @@ class BaseRepository:
         obj.save()
 
     def delete(self, obj: Model) -> None:
+        identity_map.discard(obj)
         obj.delete()
 
     def filter_objs(self, **kwargs) -> QuerySet[Model]:
         return self.model.objects.filter(**kwargs)
+
+    def get_for_update(self, obj_ids: Iterable[int]) -> Dict[int, Model]:
+        # not in_bulk, which drops the ordering: rows are locked in id order against deadlocks
+        locked = self.model.objects.select_for_update().filter(id__in=list(obj_ids)).order_by("id")
+        objs = {obj.id: obj for obj in locked}
+        for obj in objs.values():
+            identity_map.add(obj)
+        return objs
+
+    def bulk_update(self, objs: List[Model], fields: List[str]) -> None:
+        if objs:
+            self.model.objects.bulk_update(objs, fields)
+
+    def sync_loaded(self, obj_id: int, field: str, delta, obj: Optional[Model] = None) -> None:
+        """Apply a change already made in the db to the loaded copies of the object."""
+        loaded = {id(copy): copy for copy in (obj, identity_map.get(self.model, obj_id)) if copy}
+        for copy in loaded.values():
+            setattr(copy, field, getattr(copy, field) + delta)
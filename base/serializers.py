@@ -0,0 +1,12 @@
+from rest_framework import serializers
+
+from base import identity_map
+
+
+class IdentityMapPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """PrimaryKeyRelatedField that shares the loaded object with services of the request."""
+
+    def to_internal_value(self, data):
+        obj = super().to_internal_value(data)
+        identity_map.add(obj)
+        return obj
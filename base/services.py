@@ -1,13 +1,14 @@
-from typing import Type
+from typing import Dict, Iterable, List, Type
 
 from django.db.models import Model, QuerySet
 
+from base.container import container
 from base.repositories import BaseRepository
 
 
 class BaseService:
     def __init__(self, model: Type[Model], repository: Type[BaseRepository]) -> None:
-        self.repository = repository(model)
+        self.repository = container.get(repository, model)
 
     def get_by_id(self, obj_id: int) -> Model:
         return self.repository.get_by_id(obj_id=obj_id)
@@ -29,3 +30,9 @@ class BaseService:
 
     def filter_objs(self, **kwargs) -> QuerySet[Model]:
         return self.repository.filter_objs(**kwargs)
+
+    def get_for_update(self, obj_ids: Iterable[int]) -> Dict[int, Model]:
+        return self.repository.get_for_update(obj_ids)
+
+    def bulk_update(self, objs: List[Model], fields: List[str]) -> None:
+        self.repository.bulk_update(objs, fields)
@@ -6,4 +6,4 @@ poetry run python manage.py migrate user_management
 poetry run python manage.py makemigrations
 poetry run python manage.py migrate
 
-poetry run python manage.py runserver 0.0.0.0:8000
+poetry run uvicorn trading_platform.asgi:application --host 0.0.0.0 --port 8000 --reload
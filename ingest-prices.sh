@@ -0,0 +1,2 @@
+#!/bin/sh
+poetry run python manage.py ingest_prices
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.5 on 2026-10-18 03:15
+
+from django.db import migrations
+from django.db.models import Count, Sum
+
+
+def merge_duplicate_inventories(apps, schema_editor):
+    """Keep one inventory per (user, stock) with the summed quantity."""
+    Inventory = apps.get_model("inventory", "Inventory")
+    duplicates = (
+        Inventory.objects.values("user_id", "stock_id")
+        .annotate(count=Count("id"), total_quantity=Sum("quantity"))
+        .filter(count__gt=1)
+    )
+    for duplicate in duplicates:
+        inventories = Inventory.objects.filter(
+            user_id=duplicate["user_id"], stock_id=duplicate["stock_id"]
+        ).order_by("id")
+        inventory = inventories.first()
+        inventories.exclude(id=inventory.id).delete()
+        inventory.quantity = duplicate["total_quantity"]
+        inventory.save(update_fields=["quantity"])
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("inventory", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_inventories, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.5 on 2026-10-18 03:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("inventory", "0002_merge_duplicate_inventories"),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name="inventory",
+            constraint=models.UniqueConstraint(
+                fields=("user", "stock"), name="inventory_unique_user_stock"
+            ),
+        ),
+    ]
@@ -9,5 +9,10 @@ class Inventory(models.Model):
     stock = models.ForeignKey(Stock, on_delete=models.CASCADE)
     quantity = models.PositiveIntegerField()
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "stock"], name="inventory_unique_user_stock"),
+        ]
+
     def __str__(self):
         return f"{self.user} has {self.quantity} shares of {self.stock.name}"
@@ -1,6 +1,7 @@
-from typing import Type
+from typing import Dict, Iterable, List, Tuple, Type
 
-from django.db.models import QuerySet
+from django.db import IntegrityError, transaction
+from django.db.models import F, QuerySet
 
 from base.repositories import BaseRepository
 from inventory.models import Inventory
@@ -16,14 +17,88 @@ class InventoryRepository(BaseRepository):
         return self.model.query.filter_by(user=user)
 
     def add_quantity(self, inventory: Inventory, quantity: int) -> None:
+        self.credit_quantity(inventory.user_id, inventory.stock_id, quantity)
         inventory.quantity += quantity
-        inventory.save()
 
     def subtract_quantity(self, inventory: Inventory, quantity: int) -> None:
-        if inventory.quantity < quantity:
+        if not self.debit_quantity(inventory.user_id, inventory.stock_id, quantity):
             raise Exception("You don't own that many stocks in your inventory.")
-        if inventory.quantity == quantity:
-            self.delete(inventory)
-            return
         inventory.quantity -= quantity
-        inventory.save()
+
+    def credit_quantity(self, user_id: int, stock_id: int, quantity: int) -> None:
+        """
+        Add quantity to the user's inventory of a stock in one UPDATE statement,
+        creating the inventory if the user doesn't own the stock yet.
+
+        Args:
+        - user_id (int): The ID of the user.
+        - stock_id (int): The ID of the stock.
+        - quantity (int): The quantity to add.
+        """
+        inventories = self.model.objects.filter(user_id=user_id, stock_id=stock_id)
+        if inventories.update(quantity=F("quantity") + quantity):
+            return
+        try:
+            with transaction.atomic():
+                self.model.objects.create(user_id=user_id, stock_id=stock_id, quantity=quantity)
+        except IntegrityError:
+            # created concurrently after the update above
+            inventories.update(quantity=F("quantity") + quantity)
+
+    def debit_quantity(self, user_id: int, stock_id: int, quantity: int) -> bool:
+        """
+        Subtract quantity from the user's inventory of a stock if the user owns enough,
+        in one conditional UPDATE statement. The emptied inventory is deleted.
+
+        Args:
+        - user_id (int): The ID of the user.
+        - stock_id (int): The ID of the stock.
+        - quantity (int): The quantity to subtract.
+
+        Returns:
+        - bool: True if the user owned enough stock and the inventory was updated.
+        """
+        inventories = self.model.objects.filter(user_id=user_id, stock_id=stock_id)
+        updated = inventories.filter(quantity__gte=quantity).update(
+            quantity=F("quantity") - quantity
+        )
+        if updated:
+            inventories.filter(quantity=0).delete()
+        return bool(updated)
+
+    def get_for_update_by_users_and_stocks(
+        self, user_ids: Iterable[int], stock_ids: Iterable[int]
+    ) -> Dict[Tuple[int, int], Inventory]:
+        """
+        Lock and return inventories of the given users in the given stocks.
+
+        Args:
+        - user_ids (Iterable[int]): Ids of users.
+        - stock_ids (Iterable[int]): Ids of stocks.
+
+        Returns:
+        - Dict[Tuple[int, int], Inventory]: Inventories by (user_id, stock_id).
+        """
+        inventories = (
+            self.model.objects.select_for_update()
+            .filter(user_id__in=list(user_ids), stock_id__in=list(stock_ids))
+            .order_by("id")
+        )
+        return {(inventory.user_id, inventory.stock_id): inventory for inventory in inventories}
+
+    def save_quantities(self, inventories: List[Inventory]) -> None:
+        """
+        Save changed inventories in bulk: create new ones, update existing ones
+        and delete the ones whose quantity dropped to zero.
+
+        Args:
+        - inventories (List[Inventory]): Changed inventories.
+        """
+        to_create = [inv for inv in inventories if inv.pk is None and inv.quantity > 0]
+        to_update = [inv for inv in inventories if inv.pk is not None and inv.quantity > 0]
+        to_delete = [inv.pk for inv in inventories if inv.pk is not None and inv.quantity == 0]
+        if to_create:
+            self.model.objects.bulk_create(to_create)
+        self.bulk_update(to_update, ["quantity"])
+        if to_delete:
+            self.model.objects.filter(pk__in=to_delete).delete()
@@ -1,7 +1,8 @@
-from typing import Union
+from typing import Dict, Iterable, List, Tuple, Union
 
 from django.db.models import QuerySet
 
+from base.container import container
 from base.services import BaseService
 from inventory.exceptions import InventoryException, InventoryUpdateException
 from inventory.models import Inventory
@@ -15,8 +16,8 @@ from user_management.services import UserService
 
 class InventoryService(BaseService):
     def __init__(self) -> None:
-        self.user_service = UserService()
-        self.stock_service = StockService()
+        self.user_service = container.get(UserService)
+        self.stock_service = container.get(StockService)
         super().__init__(model=Inventory, repository=InventoryRepository)
 
     def get_user_inventory(self, user_id: int) -> QuerySet[Inventory]:
@@ -120,16 +121,57 @@ class InventoryService(BaseService):
                 # raise InsufficientStockException("Not enough stocks available for purchase.")
 
     def add_quantity(self, user_id: int, stock_id: int, quantity: int) -> None:
-        inventory = self.get_user_stock_inventory(user_id, stock_id)
-        if inventory is None:
-            inventory = self.create(
-                user=self.user_service.get_by_id(user_id),
-                stock=self.stock_service.get_by_id(stock_id),
-                quantity=quantity,
-            )
-            return
-        self.repository.add_quantity(inventory=inventory, quantity=quantity)
+        """
+        Add quantity to the user's inventory of a stock, creating it if needed.
+        Args:
+        - user_id (int): The ID of the user.
+        - stock_id (int): The ID of the stock.
+        - quantity (int): The quantity to add.
+        """
+        self.repository.credit_quantity(user_id=user_id, stock_id=stock_id, quantity=quantity)
 
     def subtract_quantity(self, user_id: int, stock_id: int, quantity: int) -> None:
-        inventory = self.get_user_stock_inventory(user_id, stock_id)
-        self.repository.subtract_quantity(inventory=inventory, quantity=quantity)
+        """
+        Subtract quantity from the user's inventory of a stock.
+        Args:
+        - user_id (int): The ID of the user.
+        - stock_id (int): The ID of the stock.
+        - quantity (int): The quantity to subtract.
+        Raises:
+        - InventoryUpdateException: If the user doesn't own enough stock.
+        """
+        if not self.debit_quantity(user_id=user_id, stock_id=stock_id, quantity=quantity):
+            raise InventoryUpdateException("You don't own that many stocks in your inventory.")
+
+    def debit_quantity(self, user_id: int, stock_id: int, quantity: int) -> bool:
+        """
+        Subtract quantity from the user's inventory of a stock if the user owns enough.
+        Args:
+        - user_id (int): The ID of the user.
+        - stock_id (int): The ID of the stock.
+        - quantity (int): The quantity to subtract.
+        Returns:
+        - bool: True if the inventory was updated, otherwise False.
+        """
+        return self.repository.debit_quantity(user_id=user_id, stock_id=stock_id, quantity=quantity)
+
+    def get_for_update_by_users_and_stocks(
+        self, user_ids: Iterable[int], stock_ids: Iterable[int]
+    ) -> Dict[Tuple[int, int], Inventory]:
+        """
+        Lock and return inventories of the given users in the given stocks.
+        Args:
+        - user_ids (Iterable[int]): Ids of users.
+        - stock_ids (Iterable[int]): Ids of stocks.
+        Returns:
+        - Dict[Tuple[int, int], Inventory]: Inventories by (user_id, stock_id).
+        """
+        return self.repository.get_for_update_by_users_and_stocks(user_ids, stock_ids)
+
+    def save_quantities(self, inventories: List[Inventory]) -> None:
+        """
+        Save changed inventories in bulk, deleting the emptied ones.
+        Args:
+        - inventories (List[Inventory]): Changed inventories.
+        """
+        self.repository.save_quantities(inventories)
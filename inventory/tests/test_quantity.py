@@ -0,0 +1,56 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+
+from inventory.models import Inventory
+from inventory.services import InventoryService
+from stocks.models import Stock
+
+User = get_user_model()
+
+
+class ConditionalQuantityUpdateTestCase(TestCase):
+    inventory_service = InventoryService()
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="user_test", password="user_password", email="user_test@gmail.com"
+        )
+        self.stock = Stock.objects.create(
+            name="test Stock 1",
+            symbol="tFS1",
+            price_per_unit_sail=120,
+            price_per_unit_buy=110,
+            available_quantity=10,
+        )
+
+    def test_add_quantity_creates_and_updates_inventory(self):
+        self.inventory_service.add_quantity(
+            user_id=self.user.id, stock_id=self.stock.id, quantity=2
+        )
+        self.inventory_service.add_quantity(
+            user_id=self.user.id, stock_id=self.stock.id, quantity=3
+        )
+        self.assertEqual(Inventory.objects.get(user=self.user, stock=self.stock).quantity, 5)
+
+    def test_debit_quantity(self):
+        Inventory.objects.create(user=self.user, stock=self.stock, quantity=3)
+
+        self.assertFalse(
+            self.inventory_service.debit_quantity(
+                user_id=self.user.id, stock_id=self.stock.id, quantity=4
+            )
+        )
+        self.assertTrue(
+            self.inventory_service.debit_quantity(
+                user_id=self.user.id, stock_id=self.stock.id, quantity=3
+            )
+        )
+        self.assertFalse(Inventory.objects.filter(user=self.user, stock=self.stock).exists())
+
+    def test_debit_available_quantity(self):
+        stock_service = self.inventory_service.stock_service
+        self.assertFalse(stock_service.debit_available_quantity(stock=self.stock, quantity=11))
+        self.assertTrue(stock_service.debit_available_quantity(stock=self.stock, quantity=10))
+        self.assertEqual(self.stock.available_quantity, 0)
+        self.stock.refresh_from_db()
+        self.assertEqual(self.stock.available_quantity, 0)
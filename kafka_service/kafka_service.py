@@ -1,57 +1,123 @@
-import json
+import atexit
 import logging
 import os
+import threading
+from typing import Dict, Iterable, Optional
+
 from dotenv import load_dotenv
-from kafka import KafkaConsumer, KafkaProducer
+
+from kafka_service import serializers
+from kafka_service.serializers import get_codec
+from kafka_service.transports import AssignCallback, RevokeCallback, get_transport
 
 load_dotenv()
 
 logger = logging.getLogger(__name__)
 
+_producer = None
+_producer_lock = threading.Lock()
+
+
+def get_producer():
+    """
+    Return the producer shared by the process, connecting it on first use.
+    """
+    global _producer
+    if _producer is None:
+        with _producer_lock:
+            if _producer is None:
+                _producer = get_transport().create_producer(
+                    key_serializer=lambda k: k.encode("utf-8") if k is not None else None,
+                    value_serializer=get_codec(KafkaService.VALUE_CODEC).encode,
+                    compression_type=KafkaService.COMPRESSION_TYPE,
+                    acks="all",
+                    retries=KafkaService.RETRIES,
+                    linger_ms=5,
+                )
+    return _producer
+
+
+def close_producer() -> None:
+    """Flush pending messages and close the shared producer, e.g. when a process stops."""
+    global _producer
+    with _producer_lock:
+        producer, _producer = _producer, None
+    if producer is not None:
+        producer.close()
+
+
+def reset_producer() -> None:
+    """
+    Forget the producer inherited from a parent process without closing it:
+    its connections and sender thread belong to the parent.
+    """
+    global _producer, _producer_lock
+    _producer = None
+    _producer_lock = threading.Lock()
+
+
+atexit.register(close_producer)
+os.register_at_fork(after_in_child=reset_producer)
+
 
 class KafkaService:
     KAFKA_TOPIC_STOCK_PRICES = os.environ.get("KAFKA_TOPIC_STOCK_PRICES")
     KAFKA_TOPIC_STOCK_SYMBOLS = os.environ.get("KAFKA_TOPIC_STOCK_SYMBOLS")
     BOOTSTRAP_SERVERS = os.environ.get("BOOTSTRAP_SERVERS")
+    # kafka, or memory for the in-process stand-in
+    TRANSPORT = os.environ.get("KAFKA_TRANSPORT", "kafka")
+    COMPRESSION_TYPE = os.environ.get("KAFKA_COMPRESSION_TYPE", "gzip")
+    RETRIES = int(os.environ.get("KAFKA_PRODUCER_RETRIES", 5))
+    STOCK_PRICES_GROUP = "read_stock_prices_group"
+    # encoding of published messages: json or msgpack
+    VALUE_CODEC = os.environ.get("KAFKA_VALUE_CODEC", "json")
 
-    def __init__(self):
-        self.producer = KafkaProducer(
-            bootstrap_servers=self.BOOTSTRAP_SERVERS,
-            value_serializer=lambda v: json.dumps(v).encode("utf-8"),
-        )
+    @property
+    def producer(self):
+        return get_producer()
+
+    @classmethod
+    def create_stock_prices_consumer(
+        cls,
+        group_id: Optional[str] = None,
+        on_revoked: Optional[RevokeCallback] = None,
+        on_assigned: Optional[AssignCallback] = None,
+    ):
+        """
+        Create a long-lived consumer of stock prices that commits offsets only when asked to,
+        i.e. after the prices it returned were saved.
 
-        self.consumer = KafkaConsumer(
-            bootstrap_servers=self.BOOTSTRAP_SERVERS,
-            value_deserializer=lambda x: json.loads(x.decode("utf-8")),
+        Args:
+        - group_id (Optional[str]): The consumer group, STOCK_PRICES_GROUP by default.
+        - on_revoked (Optional[Callable]): Called with partitions the consumer group moves
+        to another consumer, before they are moved.
+        - on_assigned (Optional[Callable]): Called with partitions assigned to the consumer,
+        before it fetches from them; it may seek to offsets stored elsewhere.
+        """
+        return get_transport().create_consumer(
+            cls.KAFKA_TOPIC_STOCK_PRICES,  # topic: "stock_prices"
+            group_id=group_id or cls.STOCK_PRICES_GROUP,
+            on_revoked=on_revoked,
+            on_assigned=on_assigned,
+            value_deserializer=serializers.decode_or_none,
             auto_offset_reset="earliest",
-            group_id="read_stock_prices_group",
-            consumer_timeout_ms=1000,
+            enable_auto_commit=False,
         )
 
-        self.consumer.subscribe([self.KAFKA_TOPIC_STOCK_PRICES])  # topic: "stock_prices"
-
-    def read_stock_prices_from_kafka(self):
-        logger.info("start read_stock_prices_from_kafka")
-        try:
-            for message in self.consumer:
-                stocks_data = message.value
-                logger.info(f"Data received from Kafka: {stocks_data}")
-                yield stocks_data
-        except Exception as e:
-            logger.error(f"An error occurred: {e}")
-        finally:
-            logger.info("end read_stock_prices_from_kafka")
-
-    def send_stock_symbols_to_kafka(self, symbols):
-        try:
-            logger.info(f"start sending: {symbols}")
-            for symbol in symbols:
-                self.producer.send(self.KAFKA_TOPIC_STOCK_SYMBOLS, value={"symbol": symbol})
-            logger.info(f"Stock symbols {symbols} sent to Kafka successfully")
-
-        except Exception as e:
-            logger.error(f"Error sending stock symbols to Kafka: {e}")
+    def send_stock_prices(self, stocks_prices: Iterable[Dict]) -> None:
+        """
+        Publish prices, one message per stock keyed by its symbol, so all prices of a stock
+        go to the same partition and are ingested by the same consumer, in order.
+
+        Args:
+        - stocks_prices (Iterable[Dict]): symbol, sell_price and buy_price of stocks.
+        """
+        for stock_prices in stocks_prices:
+            self.producer.send(
+                self.KAFKA_TOPIC_STOCK_PRICES,
+                key=stock_prices["symbol"],
+                value={"stocks": [stock_prices]},
+            )
 
     def close_kafka_connection(self):
-        self.producer.close()
-        self.consumer.close()
+        close_producer()
@@ -0,0 +1,234 @@
+import itertools
+import threading
+import time
+import zlib
+from collections import defaultdict, namedtuple
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+TopicPartition = namedtuple("TopicPartition", ["topic", "partition"])
+Message = namedtuple("Message", ["topic", "partition", "offset", "key", "value"])
+
+
+class CommitFailedError(Exception):
+    """A consumer committed offsets of partitions it no longer owns."""
+
+
+class InMemoryBroker:
+    """
+    In-process stand-in for a Kafka cluster, for benchmarks on a single machine.
+
+    Topics are lists of partitions; keyed messages go to the partition of their key.
+    Consumers of a group share the partitions of their topic and commit offsets per group.
+
+    Every rebalance starts a new generation of the group. A partition moving to another
+    member stays owned by its previous member until that member has polled, run its revoke
+    callback and released it; only then does the new member take it over, read the committed
+    offset and run its assign callback. Commits are fenced by ownership and generation, so
+    the final flush of the previous owner always lands before the new owner reads offsets.
+    As with Kafka, a member that stops polling without closing holds its partitions.
+    """
+
+    def __init__(self, partitions: int = 8) -> None:
+        self.partitions = partitions
+        self._logs: Dict[str, List[List[Message]]] = {}
+        self._committed: Dict[Tuple[str, TopicPartition], int] = {}
+        self._members: Dict[Tuple[str, str], List["InMemoryConsumer"]] = defaultdict(list)
+        self._generations: Dict[Tuple[str, str], int] = defaultdict(int)
+        # member and generation owning a partition of a group
+        self._owners: Dict[Tuple[str, TopicPartition], Tuple["InMemoryConsumer", int]] = {}
+        self._round_robin = itertools.count()
+        self._changed = threading.Condition()
+
+    def send(self, topic: str, value: Any, key: Optional[bytes] = None) -> Message:
+        with self._changed:
+            log = self._log(topic)
+            if key is None:
+                partition = next(self._round_robin) % len(log)
+            else:
+                partition = zlib.crc32(key) % len(log)
+            message = Message(topic, partition, len(log[partition]), key, value)
+            log[partition].append(message)
+            self._changed.notify_all()
+        return message
+
+    def consumer(
+        self,
+        topic: str,
+        group_id: str,
+        on_revoked: Optional[Callable[[Iterable[TopicPartition]], None]] = None,
+        on_assigned: Optional[Callable[[Iterable[TopicPartition]], None]] = None,
+        value_deserializer: Optional[Callable[[Any], Any]] = None,
+    ) -> "InMemoryConsumer":
+        """Join a consumer group; partitions of the topic are reassigned among its members."""
+        consumer = InMemoryConsumer(
+            self, topic, group_id, on_revoked, on_assigned, value_deserializer
+        )
+        with self._changed:
+            self._log(topic)
+            self._members[(group_id, topic)].append(consumer)
+            self._rebalance(group_id, topic)
+        return consumer
+
+    def end_offsets(self, topic: str) -> Dict[TopicPartition, int]:
+        with self._changed:
+            return {
+                TopicPartition(topic, partition): len(messages)
+                for partition, messages in enumerate(self._log(topic))
+            }
+
+    def committed(self, group_id: str, partition: TopicPartition) -> int:
+        with self._changed:
+            return self._committed.get((group_id, partition), 0)
+
+    def _log(self, topic: str) -> List[List[Message]]:
+        if topic not in self._logs:
+            self._logs[topic] = [[] for _ in range(self.partitions)]
+        return self._logs[topic]
+
+    def _rebalance(self, group_id: str, topic: str) -> None:
+        # range assignment; members apply it on their next poll
+        self._generations[(group_id, topic)] += 1
+        generation = self._generations[(group_id, topic)]
+        members = self._members[(group_id, topic)]
+        for index, member in enumerate(members):
+            member._next_assignment = (
+                generation,
+                [
+                    TopicPartition(topic, partition)
+                    for partition in range(len(self._log(topic)))
+                    if partition % len(members) == index
+                ],
+            )
+        self._changed.notify_all()
+
+    def _release(self, consumer: "InMemoryConsumer", partitions: Iterable[TopicPartition]) -> None:
+        for partition in partitions:
+            if self._owners.get((consumer.group_id, partition), (None,))[0] is consumer:
+                del self._owners[(consumer.group_id, partition)]
+        self._changed.notify_all()
+
+    def _leave(self, consumer: "InMemoryConsumer") -> None:
+        with self._changed:
+            self._release(consumer, consumer._assignment)
+            members = self._members[(consumer.group_id, consumer.topic)]
+            members.remove(consumer)
+            if members:
+                self._rebalance(consumer.group_id, consumer.topic)
+
+
+class InMemoryConsumer:
+    """The subset of the KafkaConsumer API used by price ingestion."""
+
+    def __init__(
+        self, broker, topic, group_id, on_revoked, on_assigned, value_deserializer
+    ) -> None:
+        self.broker = broker
+        self.topic = topic
+        self.group_id = group_id
+        self.on_revoked = on_revoked
+        self.on_assigned = on_assigned
+        self.value_deserializer = value_deserializer
+        self._assignment: List[TopicPartition] = []
+        # generation and partitions of a rebalance not applied yet
+        self._next_assignment: Optional[Tuple[int, List[TopicPartition]]] = None
+        # partitions of the current generation waiting for their previous owners
+        self._joining: Optional[List[TopicPartition]] = None
+        self._generation = 0
+        self._positions: Dict[TopicPartition, int] = {}
+
+    def assignment(self) -> List[TopicPartition]:
+        return list(self._assignment)
+
+    def poll(self, timeout_ms: int = 0, max_records: int = 500) -> Dict[TopicPartition, List]:
+        deadline = time.monotonic() + timeout_ms / 1000
+        self._apply_assignment(deadline)
+        broker = self.broker
+        with broker._changed:
+            while True:
+                records = self._fetch(max_records)
+                remaining = deadline - time.monotonic()
+                if records or remaining <= 0:
+                    break
+                broker._changed.wait(remaining)
+        if self.value_deserializer is not None:
+            records = {
+                partition: [
+                    message._replace(value=self.value_deserializer(message.value))
+                    for message in messages
+                ]
+                for partition, messages in records.items()
+            }
+        return records
+
+    def seek(self, partition: TopicPartition, offset: int) -> None:
+        self._positions[partition] = offset
+
+    def commit(self) -> None:
+        with self.broker._changed:
+            for partition in self._assignment:
+                if self.broker._owners.get((self.group_id, partition)) != (self, self._generation):
+                    raise CommitFailedError(
+                        f"{partition} isn't owned by generation {self._generation} of this member."
+                    )
+            for partition in self._assignment:
+                self.broker._committed[(self.group_id, partition)] = self._positions[partition]
+
+    def close(self) -> None:
+        self.broker._leave(self)
+
+    def _apply_assignment(self, deadline: float) -> None:
+        while True:
+            with self.broker._changed:
+                next_assignment, self._next_assignment = self._next_assignment, None
+            if next_assignment is not None:
+                # the final flush of the revoked partitions happens while they are still owned
+                if self.on_revoked is not None and self._assignment:
+                    self.on_revoked(self._assignment)
+                with self.broker._changed:
+                    self.broker._release(self, self._assignment)
+                self._assignment = []
+                self._positions = {}
+                self._generation, self._joining = next_assignment
+            if self._joining is None or not self._take_over(deadline):
+                return
+            if self.on_assigned is not None:
+                self.on_assigned(self._assignment)
+
+    def _take_over(self, deadline: float) -> bool:
+        """Wait until previous owners released the partitions being joined, then own them."""
+        broker = self.broker
+        with broker._changed:
+            while True:
+                if self._next_assignment is not None:
+                    # rebalanced again meanwhile
+                    return False
+                if all((self.group_id, p) not in broker._owners for p in self._joining):
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                broker._changed.wait(remaining)
+            assignment, self._joining = self._joining, None
+            for partition in assignment:
+                broker._owners[(self.group_id, partition)] = (self, self._generation)
+            self._assignment = assignment
+            self._positions = {
+                partition: broker._committed.get((self.group_id, partition), 0)
+                for partition in assignment
+            }
+        return True
+
+    def _fetch(self, max_records: int) -> Dict[TopicPartition, List[Message]]:
+        records = {}
+        for partition in self._assignment:
+            log = self.broker._logs[partition.topic][partition.partition]
+            position = self._positions[partition]
+            end = position + max_records
+            messages = log[position:end]
+            if messages:
+                records[partition] = messages
+                self._positions[partition] = position + len(messages)
+                max_records -= len(messages)
+            if max_records <= 0:
+                break
+        return records
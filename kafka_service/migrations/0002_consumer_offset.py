@@ -0,0 +1,34 @@
+# Generated by Django 4.2.5 on 2026-10-18 03:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("kafka_service", "0001_outbox_message"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ConsumerOffset",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True, primary_key=True, serialize=False, verbose_name="ID"
+                    ),
+                ),
+                ("group_id", models.CharField(max_length=255)),
+                ("topic", models.CharField(max_length=255)),
+                ("partition", models.PositiveIntegerField()),
+                ("offset", models.BigIntegerField()),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="consumeroffset",
+            constraint=models.UniqueConstraint(
+                fields=("group_id", "topic", "partition"), name="unique_consumer_offset"
+            ),
+        ),
+    ]
@@ -0,0 +1,42 @@
+from django.db import models
+
+
+class OutboxMessage(models.Model):
+    """
+    Kafka message saved in the transaction of the change it announces.
+    The relay_outbox task publishes messages in id order and deletes published ones.
+    """
+
+    topic = models.CharField(max_length=255)
+    key = models.CharField(max_length=255, null=True, blank=True)
+    value = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True, default="")
+
+    def __str__(self):
+        return f"{self.topic}:{self.key}"
+
+
+class ConsumerOffset(models.Model):
+    """
+    Next offset to consume of a partition, saved in the transaction of the writes made from
+    the messages before it. Consumers seek to it when the partition is assigned to them,
+    so a message is applied once even if the consumer crashes before committing to Kafka.
+    """
+
+    group_id = models.CharField(max_length=255)
+    topic = models.CharField(max_length=255)
+    partition = models.PositiveIntegerField()
+    offset = models.BigIntegerField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["group_id", "topic", "partition"], name="unique_consumer_offset"
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.group_id}:{self.topic}:{self.partition}"
@@ -0,0 +1,136 @@
+from typing import Dict, Iterable, List, Optional, Type
+
+from django.db.models import F
+
+from base.repositories import BaseRepository
+from kafka_service.models import ConsumerOffset, OutboxMessage
+
+
+class OutboxRepository(BaseRepository):
+    def __init__(self, model: Type[OutboxMessage]):
+        super().__init__(model=model)
+
+    def add(self, topic: str, value: Dict, key: Optional[str] = None) -> OutboxMessage:
+        """
+        Save a message to be published.
+
+        Args:
+        - topic (str): The Kafka topic.
+        - value (Dict): The message.
+        - key (Optional[str]): The message key.
+
+        Returns:
+        - OutboxMessage: The saved message.
+        """
+        return self.model.objects.create(topic=topic, key=key, value=value)
+
+    def get_pending(self, limit: int) -> List[OutboxMessage]:
+        """
+        Get the oldest messages.
+
+        Args:
+        - limit (int): The maximum number of messages.
+
+        Returns:
+        - List[OutboxMessage]: The messages in the order they were saved.
+        """
+        return list(self.model.objects.order_by("id")[:limit])
+
+    def delete_published(self, message_ids: Iterable[int]) -> None:
+        """
+        Delete messages that were published.
+
+        Args:
+        - message_ids (Iterable[int]): The IDs of the messages.
+
+        Returns:
+        - None.
+        """
+        self.model.objects.filter(id__in=list(message_ids)).delete()
+
+    def record_failure(self, message_ids: Iterable[int], error: str) -> None:
+        """
+        Count a failed publishing attempt of messages.
+
+        Args:
+        - message_ids (Iterable[int]): The IDs of the messages.
+        - error (str): The error of the attempt.
+
+        Returns:
+        - None.
+        """
+        self.model.objects.filter(id__in=list(message_ids)).update(
+            attempts=F("attempts") + 1, last_error=error
+        )
+
+
+class ConsumerOffsetRepository(BaseRepository):
+    def __init__(self, model: Type[ConsumerOffset]):
+        super().__init__(model=model)
+
+    def get_offsets(self, group_id: str, topic: str) -> Dict[int, int]:
+        """
+        Get the stored offsets of a consumer group.
+
+        Args:
+        - group_id (str): The consumer group.
+        - topic (str): The Kafka topic.
+
+        Returns:
+        - Dict[int, int]: Next offset to consume by partition.
+        """
+        offsets = self.model.objects.filter(group_id=group_id, topic=topic)
+        return dict(offsets.values_list("partition", "offset"))
+
+    def get_offsets_for_update(
+        self, group_id: str, topic: str, partitions: Iterable[int]
+    ) -> Dict[int, int]:
+        """
+        Lock and get the stored offsets of partitions of a consumer group.
+
+        Args:
+        - group_id (str): The consumer group.
+        - topic (str): The Kafka topic.
+        - partitions (Iterable[int]): The partitions.
+
+        Returns:
+        - Dict[int, int]: Next offset to consume by partition, for partitions with one.
+        """
+        offsets = (
+            self.model.objects.select_for_update()
+            .filter(group_id=group_id, topic=topic, partition__in=list(partitions))
+            .order_by("partition")
+        )
+        return dict(offsets.values_list("partition", "offset"))
+
+    def save_offsets(self, group_id: str, topic: str, offsets: Dict[int, int]) -> None:
+        """
+        Insert or update offsets of a consumer group. Offsets only move forward: stored
+        offsets are locked, and the ones already at or past the new offset are kept, so a
+        consumer that lost its partitions can't move them back.
+
+        Args:
+        - group_id (str): The consumer group.
+        - topic (str): The Kafka topic.
+        - offsets (Dict[int, int]): Next offset to consume by partition.
+
+        Returns:
+        - None.
+        """
+        stored = self.get_offsets_for_update(group_id, topic, offsets)
+        advanced = {
+            partition: offset
+            for partition, offset in offsets.items()
+            if offset > stored.get(partition, -1)
+        }
+        if not advanced:
+            return
+        self.model.objects.bulk_create(
+            [
+                self.model(group_id=group_id, topic=topic, partition=partition, offset=offset)
+                for partition, offset in advanced.items()
+            ],
+            update_conflicts=True,
+            unique_fields=["group_id", "topic", "partition"],
+            update_fields=["offset", "updated_at"],
+        )
@@ -0,0 +1,168 @@
+import json
+import logging
+import struct
+import sys
+from array import array
+from decimal import Decimal
+from typing import Any, Dict, Iterator, Optional, Tuple, Union
+
+try:
+    import msgpack
+except ImportError:  # optional: JSON is used when msgpack isn't installed
+    msgpack = None
+
+logger = logging.getLogger(__name__)
+
+# prices travel as integer ticks of one cent, the precision of price fields
+PRICE_TICK = Decimal("0.01")
+
+
+def to_ticks(value: Union[str, float, Decimal]) -> int:
+    """Convert a price to integer ticks, rounding to the nearest tick."""
+    return int((Decimal(str(value)) / PRICE_TICK).to_integral_value())
+
+
+def from_ticks(ticks: int) -> Decimal:
+    """Convert integer ticks to a price."""
+    return ticks * PRICE_TICK
+
+
+class PriceBatch:
+    """
+    Prices of many stocks as columns: symbol dictionary ids (stock ids, published with
+    the symbols versions) and sell and buy prices in ticks.
+    """
+
+    def __init__(self, symbol_ids: array, sell_ticks: array, buy_ticks: array) -> None:
+        self.symbol_ids = symbol_ids
+        self.sell_ticks = sell_ticks
+        self.buy_ticks = buy_ticks
+
+    def __len__(self) -> int:
+        return len(self.symbol_ids)
+
+    def __iter__(self) -> Iterator[Tuple[int, int, int]]:
+        return zip(self.symbol_ids, self.sell_ticks, self.buy_ticks)
+
+    def __eq__(self, other: Any) -> bool:
+        return isinstance(other, PriceBatch) and list(self) == list(other)
+
+
+class JsonCodec:
+    content_type = "application/json"
+
+    def encode(self, value: Any) -> bytes:
+        return json.dumps(value).encode("utf-8")
+
+    def decode(self, data: bytes) -> Any:
+        return json.loads(data.decode("utf-8"))
+
+
+class MsgpackCodec:
+    content_type = "application/msgpack"
+
+    def __init__(self) -> None:
+        if msgpack is None:
+            raise ImportError("msgpack is not installed, use the json codec.")
+
+    def encode(self, value: Any) -> bytes:
+        return msgpack.packb(value)
+
+    def decode(self, data: bytes) -> Any:
+        return msgpack.unpackb(data)
+
+
+class PriceBatchCodec:
+    """
+    Fixed layout of a PriceBatch: a header of magic, version and count, then the columns of
+    count uint32 symbol ids, int64 sell ticks and int64 buy ticks, little endian.
+    Columns are copied into arrays as a whole instead of being parsed value by value.
+    """
+
+    content_type = "application/x-price-batch"
+    MAGIC = b"PB"
+    VERSION = 1
+    HEADER = struct.Struct("<2sBI")
+
+    def encode(self, batch: PriceBatch) -> bytes:
+        columns = [
+            array("I", batch.symbol_ids),
+            array("q", batch.sell_ticks),
+            array("q", batch.buy_ticks),
+        ]
+        if sys.byteorder != "little":
+            for column in columns:
+                column.byteswap()
+        header = self.HEADER.pack(self.MAGIC, self.VERSION, len(batch))
+        return header + b"".join(column.tobytes() for column in columns)
+
+    def decode(self, data: bytes) -> PriceBatch:
+        magic, version, count = self.HEADER.unpack_from(data)
+        if magic != self.MAGIC or version != self.VERSION:
+            raise ValueError(f"Not a price batch of version {self.VERSION}.")
+        if len(data) != self.HEADER.size + count * (4 + 8 + 8):
+            raise ValueError(f"Price batch of {len(data)} bytes can't hold {count} prices.")
+        columns = []
+        offset = self.HEADER.size
+        for typecode in ("I", "q", "q"):
+            column = array(typecode)
+            end = offset + count * column.itemsize
+            column.frombytes(data[offset:end])
+            if sys.byteorder != "little":
+                column.byteswap()
+            columns.append(column)
+            offset = end
+        return PriceBatch(*columns)
+
+
+CODECS = {
+    "json": JsonCodec,
+    "msgpack": MsgpackCodec,
+}
+
+
+def get_codec(name: str):
+    """
+    Return the codec of messages published by this service.
+
+    Args:
+    - name (str): json or msgpack.
+    """
+    return CODECS[name]()
+
+
+price_batch_codec = PriceBatchCodec()
+json_codec = JsonCodec()
+
+
+def decode(data: bytes) -> Union[Dict, PriceBatch]:
+    """
+    Decode a message in any supported encoding: a price batch, JSON, or msgpack.
+    JSON values always start with "{" or "[", so they are told apart from msgpack maps.
+    """
+    if data[:2] == PriceBatchCodec.MAGIC:
+        return price_batch_codec.decode(data)
+    if data[:1] in (b"{", b"["):
+        return json_codec.decode(data)
+    if msgpack is None:
+        raise ValueError("Message is msgpack encoded but msgpack is not installed.")
+    return msgpack.unpackb(data)
+
+
+# errors of decoding a malformed message
+DECODE_ERRORS = (ValueError, TypeError, struct.error) + (
+    (msgpack.UnpackException,) if msgpack is not None else ()
+)
+
+
+def decode_or_none(data: bytes) -> Optional[Union[Dict, PriceBatch]]:
+    """
+    Decode a consumed message like decode(), used as the deserializer of consumers.
+    A message that can't be decoded is logged and returned as None, so one bad record
+    doesn't stop the consumer that polls it.
+    """
+    try:
+        return decode(data)
+    except DECODE_ERRORS as e:
+        logger.error(f"Failed to decode a message of {len(data)} bytes: {e!r} {data[:64]!r}")
+        return None
@@ -0,0 +1,169 @@
+import logging
+from typing import Dict, Iterable, Optional, Set
+
+from django.conf import settings
+from django.db import transaction
+
+from base.services import BaseService
+from kafka_service.kafka_service import get_producer
+from kafka_service.memory import TopicPartition
+from kafka_service.models import ConsumerOffset, OutboxMessage
+from kafka_service.repositories import ConsumerOffsetRepository, OutboxRepository
+
+logger = logging.getLogger(__name__)
+
+
+class OutboxService(BaseService):
+    def __init__(self) -> None:
+        """Initialize OutboxService instance."""
+        super().__init__(model=OutboxMessage, repository=OutboxRepository)
+
+    def enqueue(self, topic: str, value: Dict, key: Optional[str] = None) -> OutboxMessage:
+        """
+        Save a message to be published once the current transaction commits.
+        Nothing is published if the transaction is rolled back.
+
+        Args:
+        - topic (str): The Kafka topic.
+        - value (Dict): The message.
+        - key (Optional[str]): The message key.
+
+        Returns:
+        - OutboxMessage: The saved message.
+        """
+        from kafka_service.tasks import relay_outbox
+
+        message = self.repository.add(topic=topic, value=value, key=key)
+        transaction.on_commit(relay_outbox.delay)
+        return message
+
+    def relay(self, batch_size: int = None) -> int:
+        """
+        Publish a batch of saved messages to Kafka and delete the published ones.
+
+        The relay_outbox task runs one relay at a time, so no rows are locked while Kafka
+        acknowledges the batch; the outcome is saved in a short transaction afterwards.
+        Messages of a key are kept in order: after the first failed message of a key, the
+        later messages of that key stay in the outbox, whether Kafka acknowledged them or not,
+        and are published again after it by the next relay.
+
+        Args:
+        - batch_size (int): The maximum number of messages, OUTBOX_RELAY_BATCH_SIZE by default.
+
+        Returns:
+        - int: The number of published messages.
+        """
+        batch_size = batch_size or settings.OUTBOX_RELAY_BATCH_SIZE
+        messages = self.repository.get_pending(batch_size)
+        if not messages:
+            return 0
+
+        producer = get_producer()
+        futures = {}
+        failed_keys = set()
+        for message in messages:
+            if message.key in failed_keys:
+                continue
+            try:
+                futures[message.id] = producer.send(
+                    message.topic, key=message.key, value=message.value
+                )
+            except Exception as e:
+                logger.error(f"[ERROR] Outbox relay: send of message #{message.id} failed: {e}")
+                failed_keys.add(message.key)
+        try:
+            producer.flush(timeout=settings.OUTBOX_RELAY_FLUSH_TIMEOUT)
+        except Exception as e:
+            logger.error(f"[ERROR] Outbox relay: flush failed: {e}")
+
+        published, failed = [], []
+        failed_keys = set()
+        for message in messages:
+            future = futures.get(message.id)
+            if message.key in failed_keys or future is None or not future.succeeded():
+                failed_keys.add(message.key)
+                failed.append(message.id)
+            else:
+                published.append(message.id)
+
+        with transaction.atomic():
+            self.repository.delete_published(published)
+            if failed:
+                self.repository.record_failure(failed, "Message was not acknowledged by Kafka.")
+        if failed:
+            logger.error(f"[ERROR] Outbox relay: {len(failed)} messages were not published")
+        return len(published)
+
+
+class ConsumerOffsetService(BaseService):
+    def __init__(self) -> None:
+        """Initialize ConsumerOffsetService instance."""
+        super().__init__(model=ConsumerOffset, repository=ConsumerOffsetRepository)
+
+    def store(self, group_id: str, positions: Dict[TopicPartition, int]) -> None:
+        """
+        Save positions of a consumer; call it in the transaction of the writes made from
+        the messages before them, so the writes and the offsets are committed together.
+
+        Args:
+        - group_id (str): The consumer group.
+        - positions (Dict[TopicPartition, int]): Next offset to consume by partition.
+
+        Returns:
+        - None.
+        """
+        by_topic: Dict[str, Dict[int, int]] = {}
+        for partition, offset in positions.items():
+            by_topic.setdefault(partition.topic, {})[partition.partition] = offset
+        for topic, offsets in by_topic.items():
+            self.repository.save_offsets(group_id, topic, offsets)
+
+    def lock_saved_past(
+        self, group_id: str, positions: Dict[TopicPartition, int]
+    ) -> Set[TopicPartition]:
+        """
+        Lock the stored offsets of partitions until the end of the transaction and return
+        the partitions whose stored offset is already at or past the position: a consumer
+        that took them over saved the messages before the position, or later ones.
+
+        Args:
+        - group_id (str): The consumer group.
+        - positions (Dict[TopicPartition, int]): Next offset to consume by partition.
+
+        Returns:
+        - Set[TopicPartition]: The partitions saved past their position.
+        """
+        by_topic: Dict[str, Dict[int, TopicPartition]] = {}
+        for partition in positions:
+            by_topic.setdefault(partition.topic, {})[partition.partition] = partition
+        saved_past = set()
+        for topic, partitions in by_topic.items():
+            stored = self.repository.get_offsets_for_update(group_id, topic, partitions)
+            for number, offset in stored.items():
+                if offset >= positions[partitions[number]]:
+                    saved_past.add(partitions[number])
+        return saved_past
+
+    def seek_stored(self, consumer, group_id: str, partitions: Iterable[TopicPartition]) -> int:
+        """
+        Move a consumer to the stored offsets of partitions assigned to it.
+        Partitions without a stored offset keep the position committed to Kafka.
+
+        Args:
+        - consumer: The Kafka consumer.
+        - group_id (str): The consumer group.
+        - partitions (Iterable[TopicPartition]): The assigned partitions.
+
+        Returns:
+        - int: The number of partitions moved.
+        """
+        stored: Dict[str, Dict[int, int]] = {}
+        moved = 0
+        for partition in partitions:
+            if partition.topic not in stored:
+                stored[partition.topic] = self.repository.get_offsets(group_id, partition.topic)
+            offset = stored[partition.topic].get(partition.partition)
+            if offset is not None:
+                consumer.seek(partition, offset)
+                moved += 1
+        return moved
@@ -0,0 +1,27 @@
+import logging
+
+from celery import shared_task
+
+from base.container import container
+from base.locks import single_instance
+from kafka_service.services import OutboxService
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+@single_instance("kafka_service:relay_outbox")
+def relay_outbox() -> int:
+    """
+    Publish saved messages until the outbox is empty.
+    A single relay runs at a time, so messages are published in the order they were saved.
+    """
+    outbox_service = container.get(OutboxService)
+    published = 0
+    while True:
+        relayed = outbox_service.relay()
+        published += relayed
+        if not relayed:
+            break
+    logger.info(f"[INFO] celery_task(relay_outbox): {published} messages published")
+    return published
@@ -0,0 +1,114 @@
+from unittest import mock
+
+from django.db import transaction
+from django.test import TestCase
+
+from kafka_service.kafka_service import KafkaService
+from kafka_service.models import OutboxMessage
+from kafka_service.services import OutboxService
+from stocks.models import Stock
+from stocks.services import StockService
+
+
+class OutboxTestCase(TestCase):
+    outbox_service = OutboxService()
+
+    def setUp(self):
+        self.producer = mock.Mock()
+        patcher = mock.patch("kafka_service.services.get_producer", return_value=self.producer)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def create_stock(self, symbol):
+        return StockService().create(
+            name=symbol,
+            symbol=symbol,
+            price_per_unit_sail=10,
+            price_per_unit_buy=9,
+            available_quantity=10,
+        )
+
+    def test_stock_symbol_is_saved_with_stock_and_relayed_after_commit(self):
+        with mock.patch("kafka_service.tasks.relay_outbox.delay") as relay_outbox:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.create_stock("tOB1")
+            relay_outbox.assert_called_once_with()
+
+        message = OutboxMessage.objects.get()
+        stock = Stock.objects.get(symbol="tOB1")
+        self.assertEqual(
+            (message.topic, message.key),
+            (KafkaService.KAFKA_TOPIC_STOCK_SYMBOLS, StockService.STOCK_SYMBOLS_KEY),
+        )
+        self.assertEqual(
+            message.value,
+            {
+                "version": 1,
+                "base_version": 0,
+                "added": ["tOB1"],
+                "removed": [],
+                "ids": {"tOB1": stock.id},
+            },
+        )
+        self.producer.send.assert_not_called()
+
+    def test_rolled_back_stock_is_not_published(self):
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                self.create_stock("tOB2")
+                raise RuntimeError()
+
+        self.assertFalse(Stock.objects.filter(symbol="tOB2").exists())
+        self.assertFalse(OutboxMessage.objects.exists())
+
+    def test_relay_deletes_published_and_keeps_failed_messages(self):
+        published = OutboxMessage.objects.create(topic="t", key="a", value={"n": 1})
+        failed = OutboxMessage.objects.create(topic="t", key="b", value={"n": 2})
+        self.producer.send.side_effect = [
+            mock.Mock(**{"succeeded.return_value": True}),
+            mock.Mock(**{"succeeded.return_value": False}),
+        ]
+
+        self.assertEqual(self.outbox_service.relay(batch_size=10), 1)
+
+        self.producer.send.assert_has_calls(
+            [mock.call("t", key="a", value={"n": 1}), mock.call("t", key="b", value={"n": 2})]
+        )
+        self.producer.flush.assert_called_once()
+        self.assertFalse(OutboxMessage.objects.filter(id=published.id).exists())
+        failed.refresh_from_db()
+        self.assertEqual(failed.attempts, 1)
+
+    def test_relay_keeps_messages_of_a_key_after_its_first_failure(self):
+        failed = OutboxMessage.objects.create(topic="t", key="a", value={"n": 1})
+        later = OutboxMessage.objects.create(topic="t", key="a", value={"n": 2})
+        other = OutboxMessage.objects.create(topic="t", key="b", value={"n": 3})
+        self.producer.send.side_effect = [
+            mock.Mock(**{"succeeded.return_value": False}),
+            mock.Mock(**{"succeeded.return_value": True}),
+            mock.Mock(**{"succeeded.return_value": True}),
+        ]
+
+        self.assertEqual(self.outbox_service.relay(batch_size=10), 1)
+
+        self.assertEqual(
+            list(OutboxMessage.objects.order_by("id").values_list("id", "attempts")),
+            [(failed.id, 1), (later.id, 1)],
+        )
+        self.assertFalse(OutboxMessage.objects.filter(id=other.id).exists())
+
+    def test_relay_stops_sending_a_key_when_send_raises(self):
+        OutboxMessage.objects.create(topic="t", key="a", value={"n": 1})
+        OutboxMessage.objects.create(topic="t", key="a", value={"n": 2})
+        OutboxMessage.objects.create(topic="t", key="b", value={"n": 3})
+        self.producer.send.side_effect = [
+            RuntimeError("buffer full"),
+            mock.Mock(**{"succeeded.return_value": True}),
+        ]
+
+        self.assertEqual(self.outbox_service.relay(batch_size=10), 1)
+
+        self.producer.send.assert_has_calls(
+            [mock.call("t", key="a", value={"n": 1}), mock.call("t", key="b", value={"n": 3})]
+        )
+        self.assertEqual(OutboxMessage.objects.count(), 2)
@@ -0,0 +1,47 @@
+import unittest
+from array import array
+from decimal import Decimal
+
+from django.test import SimpleTestCase
+
+from kafka_service import serializers
+from kafka_service.serializers import PriceBatch, PriceBatchCodec, from_ticks, to_ticks
+
+
+class SerializersTestCase(SimpleTestCase):
+    def test_prices_round_trip_as_ticks(self):
+        self.assertEqual(to_ticks(120.1), 12010)
+        self.assertEqual(to_ticks("0.015"), 2)
+        self.assertEqual(from_ticks(12010), Decimal("120.10"))
+
+    def test_price_batch_is_decoded_into_arrays(self):
+        batch = PriceBatch(array("I", [1, 7]), array("q", [12010, 5]), array("q", [8000, 4]))
+
+        data = PriceBatchCodec().encode(batch)
+        decoded = serializers.decode(data)
+
+        self.assertEqual(len(data), PriceBatchCodec.HEADER.size + 2 * (4 + 8 + 8))
+        self.assertIsInstance(decoded.sell_ticks, array)
+        self.assertEqual(decoded, batch)
+
+    def test_json_is_decoded_as_fallback(self):
+        message = {"stocks": [{"symbol": "A", "sell_price": 1, "buy_price": 2}]}
+
+        self.assertEqual(serializers.decode(serializers.get_codec("json").encode(message)), message)
+
+    @unittest.skipIf(serializers.msgpack is None, "msgpack is not installed")
+    def test_msgpack_is_decoded(self):
+        message = {"stocks": [{"symbol": "A", "sell_price": 1, "buy_price": 2}]}
+
+        self.assertEqual(
+            serializers.decode(serializers.get_codec("msgpack").encode(message)), message
+        )
+
+    def test_undecodable_message_is_decoded_as_none(self):
+        batch = PriceBatchCodec().encode(
+            PriceBatch(array("I", [1]), array("q", [1]), array("q", [1]))
+        )
+
+        for data in (b'{"stocks": [', b"\xff\xfe", b"PB", batch[:-1]):
+            with self.subTest(data=data):
+                self.assertIsNone(serializers.decode_or_none(data))
@@ -0,0 +1,104 @@
+import threading
+
+from django.test import SimpleTestCase
+
+from kafka_service import kafka_service, transports
+from kafka_service.kafka_service import KafkaService
+from kafka_service.memory import CommitFailedError
+from kafka_service.transports import InMemoryTransport
+
+
+class InMemoryTransportTestCase(SimpleTestCase):
+    def setUp(self):
+        self.transport = InMemoryTransport(partitions=4)
+
+    def test_keyed_messages_keep_their_partition(self):
+        producer = self.transport.create_producer()
+
+        partitions = {
+            producer.send("prices", value=i, key=b"AAPL").get().partition for i in range(5)
+        }
+
+        self.assertEqual(len(partitions), 1)
+
+    def test_group_members_share_partitions_and_resume_from_committed_offsets(self):
+        producer = self.transport.create_producer()
+        for i in range(8):
+            producer.send("prices", value=i, key=str(i).encode())
+
+        first = self.transport.create_consumer("prices", "group")
+        second = self.transport.create_consumer("prices", "group")
+        first_values = self.values(first.poll(max_records=100))
+        second_values = self.values(second.poll(max_records=100))
+
+        self.assertEqual(sorted(first_values + second_values), list(range(8)))
+        self.assertFalse(set(first.assignment()) & set(second.assignment()))
+
+        first.commit()
+        first.close()
+        second.close()
+        resumed = self.transport.create_consumer("prices", "group")
+
+        self.assertEqual(sorted(self.values(resumed.poll(max_records=100))), sorted(second_values))
+
+    def test_new_owner_reads_offsets_after_previous_owner_revoked(self):
+        producer = self.transport.create_producer()
+        for i in range(8):
+            producer.send("prices", value=i, key=str(i).encode())
+        first = self.transport.create_consumer(
+            "prices", "group", on_revoked=lambda partitions: first.commit()
+        )
+        self.assertEqual(len(self.values(first.poll(max_records=100))), 8)
+
+        second = self.transport.create_consumer("prices", "group")
+        # the partitions moving to the second member are still owned by the first one
+        self.assertEqual(second.poll(max_records=100), {})
+        self.assertEqual(second.assignment(), [])
+
+        first.poll(max_records=100)
+        self.assertEqual(second.poll(max_records=100), {})
+        self.assertEqual(len(second.assignment()), 2)
+        self.assertFalse(set(first.assignment()) & set(second.assignment()))
+
+    def test_commit_of_partitions_no_longer_owned_fails(self):
+        consumer = self.transport.create_consumer("prices", "group")
+        consumer.poll()
+        consumer.close()
+
+        with self.assertRaises(CommitFailedError):
+            consumer.commit()
+
+    @staticmethod
+    def values(records):
+        return [message.value for messages in records.values() for message in messages]
+
+    def test_concurrent_sends_are_all_appended(self):
+        producer = self.transport.create_producer()
+
+        def send():
+            for i in range(100):
+                producer.send("prices", value=i)
+
+        threads = [threading.Thread(target=send) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(sum(self.transport.broker.end_offsets("prices").values()), 800)
+
+
+class KafkaServiceInMemoryTestCase(SimpleTestCase):
+    def setUp(self):
+        transports.set_transport(InMemoryTransport(partitions=2))
+        kafka_service.reset_producer()
+        self.addCleanup(transports.set_transport, None)
+        self.addCleanup(kafka_service.reset_producer)
+
+    def test_prices_round_trip_without_a_broker(self):
+        KafkaService().send_stock_prices([{"symbol": "A", "sell_price": 1, "buy_price": 2}])
+
+        consumer = KafkaService.create_stock_prices_consumer()
+        values = InMemoryTransportTestCase.values(consumer.poll())
+
+        self.assertEqual(values, [{"stocks": [{"symbol": "A", "sell_price": 1, "buy_price": 2}]}])
@@ -0,0 +1,149 @@
+import threading
+from typing import Any, Callable, Iterable, Optional
+
+from kafka_service.memory import InMemoryBroker, TopicPartition
+
+# Called with partitions the consumer group moves to another consumer, before they are moved.
+RevokeCallback = Callable[[Iterable[TopicPartition]], None]
+# Called with partitions assigned to the consumer, before it fetches from them.
+AssignCallback = Callable[[Iterable[TopicPartition]], None]
+
+
+class KafkaTransport:
+    """Producers and consumers of a Kafka cluster, through kafka-python."""
+
+    def __init__(self, bootstrap_servers: str) -> None:
+        self.bootstrap_servers = bootstrap_servers
+
+    def create_producer(self, **config):
+        from kafka import KafkaProducer
+
+        return KafkaProducer(bootstrap_servers=self.bootstrap_servers, **config)
+
+    def create_consumer(
+        self,
+        topic: str,
+        group_id: str,
+        on_revoked: Optional[RevokeCallback] = None,
+        on_assigned: Optional[AssignCallback] = None,
+        **config,
+    ):
+        from kafka import ConsumerRebalanceListener, KafkaConsumer
+
+        class RebalanceListener(ConsumerRebalanceListener):
+            def on_partitions_revoked(self, revoked):
+                if on_revoked is not None:
+                    on_revoked(revoked)
+
+            def on_partitions_assigned(self, assigned):
+                if on_assigned is not None:
+                    on_assigned(assigned)
+
+        consumer = KafkaConsumer(
+            bootstrap_servers=self.bootstrap_servers, group_id=group_id, **config
+        )
+        listener = RebalanceListener() if on_revoked or on_assigned else None
+        consumer.subscribe([topic], listener=listener)
+        return consumer
+
+
+class InMemoryFuture:
+    """A send that was appended to the in-memory log, i.e. acknowledged."""
+
+    def __init__(self, message) -> None:
+        self.message = message
+
+    def succeeded(self) -> bool:
+        return True
+
+    def failed(self) -> bool:
+        return False
+
+    def get(self, timeout: Optional[float] = None):
+        return self.message
+
+
+class InMemoryProducer:
+    """The subset of the KafkaProducer API used by this project, writing to a broker stand-in."""
+
+    def __init__(
+        self,
+        broker: InMemoryBroker,
+        key_serializer: Optional[Callable[[Any], bytes]] = None,
+        value_serializer: Optional[Callable[[Any], bytes]] = None,
+        **config,
+    ) -> None:
+        self.broker = broker
+        self.key_serializer = key_serializer
+        self.value_serializer = value_serializer
+
+    def send(self, topic: str, value: Any = None, key: Any = None) -> InMemoryFuture:
+        if self.key_serializer is not None:
+            key = self.key_serializer(key)
+        if self.value_serializer is not None:
+            value = self.value_serializer(value)
+        return InMemoryFuture(self.broker.send(topic, value, key=key))
+
+    def flush(self, timeout: Optional[float] = None) -> None:
+        pass
+
+    def close(self, timeout: Optional[float] = None) -> None:
+        pass
+
+
+class InMemoryTransport:
+    """
+    Producers and consumers of an in-process broker stand-in, for tests and load tests
+    of the ingestion pipeline on a single machine with no network.
+    """
+
+    def __init__(self, partitions: int = 8) -> None:
+        self.broker = InMemoryBroker(partitions=partitions)
+
+    def create_producer(self, **config) -> InMemoryProducer:
+        return InMemoryProducer(self.broker, **config)
+
+    def create_consumer(
+        self,
+        topic: str,
+        group_id: str,
+        on_revoked: Optional[RevokeCallback] = None,
+        on_assigned: Optional[AssignCallback] = None,
+        value_deserializer: Optional[Callable[[bytes], Any]] = None,
+        **config,
+    ):
+        return self.broker.consumer(
+            topic,
+            group_id,
+            on_revoked=on_revoked,
+            on_assigned=on_assigned,
+            value_deserializer=value_deserializer,
+        )
+
+
+_transport = None
+_transport_lock = threading.Lock()
+
+
+def get_transport():
+    """
+    Return the transport of the process: KAFKA_TRANSPORT=memory selects the in-process
+    stand-in, anything else the Kafka cluster at BOOTSTRAP_SERVERS.
+    """
+    global _transport
+    if _transport is None:
+        from kafka_service.kafka_service import KafkaService
+
+        with _transport_lock:
+            if _transport is None:
+                if KafkaService.TRANSPORT == "memory":
+                    _transport = InMemoryTransport()
+                else:
+                    _transport = KafkaTransport(KafkaService.BOOTSTRAP_SERVERS)
+    return _transport
+
+
+def set_transport(transport) -> None:
+    """Use transport in this process, e.g. an InMemoryTransport in a load test."""
+    global _transport
+    _transport = transport
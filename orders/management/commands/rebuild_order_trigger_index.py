@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from base.container import container
+from orders.services import OrderService
+
+
+class Command(BaseCommand):
+    help = "Rebuild the Redis trigger index of open automatic orders from the Order table."
+
+    def handle(self, *args, **options):
+        indexed = container.get(OrderService).rebuild_trigger_index()
+        self.stdout.write(self.style.SUCCESS(f"Trigger index rebuilt: {indexed} orders indexed."))
@@ -0,0 +1,24 @@
+# Generated by Django 4.2.5 on 2026-10-18 03:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("orders", "0004_order_closing_price"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="order",
+            index=models.Index(
+                condition=models.Q(("manual", False), ("status", "open")),
+                fields=["stock", "price_limit"],
+                name="order_open_auto_limit_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="order",
+            index=models.Index(fields=["user", "-id"], name="order_user_history_idx"),
+        ),
+    ]
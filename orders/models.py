@@ -28,5 +28,15 @@ class Order(models.Model):
     manual = models.BooleanField(default=True)
     closing_price = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True)
 
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["stock", "price_limit"],
+                condition=models.Q(status="open", manual=False),
+                name="order_open_auto_limit_idx",
+            ),
+            models.Index(fields=["user", "-id"], name="order_user_history_idx"),
+        ]
+
     def __str__(self):
         return f"Order for {self.quantity} {self.stock.name} by {self.user} - {self.order_type}"
@@ -1,8 +1,33 @@
-from typing import Type
+from typing import Dict, Iterator, List, Optional, Tuple, Type
+
+from django.db.models import F, Q, QuerySet
 
 from base.repositories import BaseRepository
 from orders.models import Order
 
+TRIGGER_CONDITION = (
+    Q(
+        order_type=Order.ORDER_TYPE.SHORT,
+        user_action_type=Order.USER_ACTION_TYPE.SELL,
+        stock__price_per_unit_buy__gte=F("price_limit"),
+    )
+    | Q(
+        order_type=Order.ORDER_TYPE.SHORT,
+        user_action_type=Order.USER_ACTION_TYPE.BUY,
+        stock__price_per_unit_sail__gte=F("price_limit"),
+    )
+    | Q(
+        order_type=Order.ORDER_TYPE.LONG,
+        user_action_type=Order.USER_ACTION_TYPE.SELL,
+        stock__price_per_unit_buy__lte=F("price_limit"),
+    )
+    | Q(
+        order_type=Order.ORDER_TYPE.LONG,
+        user_action_type=Order.USER_ACTION_TYPE.BUY,
+        stock__price_per_unit_sail__lte=F("price_limit"),
+    )
+)
+
 
 class OrderRepository(BaseRepository):
     def __init__(self, model: Type[Order]):
@@ -34,5 +59,136 @@ class OrderRepository(BaseRepository):
         None
         """
         order.closing_price = closing_price
-        self.set_status(order=order, status=Order.ORDER_TYPE.CLOSED)
-        order.save()
+        self.set_status(order=order, status=Order.ORDER_STATUS.CLOSED)
+
+    def get_user_orders(self, user_id: int) -> QuerySet[Order]:
+        """
+        Get the order history of a user, newest first.
+
+        Args:
+        user_id (int): The ID of the user.
+
+        Returns:
+        QuerySet[Order]: QuerySet of the user's orders.
+        """
+        return self.model.objects.filter(user_id=user_id).order_by("-id")
+
+    def filter_open_automatic(self, **kwargs) -> QuerySet[Order]:
+        """
+        Get open orders that are closed automatically by price_limit.
+
+        Args:
+        **kwargs: Additional filters for the orders.
+
+        Returns:
+        QuerySet[Order]: QuerySet of open automatic orders.
+        """
+        return self.model.objects.filter(status=Order.ORDER_STATUS.OPEN, manual=False, **kwargs)
+
+    def filter_triggered(self, **kwargs) -> QuerySet[Order]:
+        """
+        Get open automatic orders whose price_limit is crossed by the current stock price.
+
+        The short/long x buy/sell condition of is_ready_to_close is evaluated in SQL
+        against the joined stock row.
+
+        Args:
+        **kwargs: Additional filters for the orders (e.g. stock_id__in).
+
+        Returns:
+        QuerySet[Order]: QuerySet of orders ready to close.
+        """
+        return self.filter_open_automatic(**kwargs).filter(TRIGGER_CONDITION)
+
+    def get_triggered_order_ids(
+        self, chunk_size: int, partition: Optional[Tuple[int, int]] = None, **kwargs
+    ) -> Iterator[List[int]]:
+        """
+        Stream ids of triggered orders in chunks, paginated by primary key.
+
+        Args:
+        chunk_size (int): Max number of ids in one chunk.
+        partition (Optional[Tuple[int, int]]): (index, partitions) - take only orders
+            of stocks with stock_id % partitions == index.
+        **kwargs: Additional filters for the orders.
+
+        Returns:
+        Iterator[List[int]]: Chunks of ids of orders ready to close.
+        """
+        queryset = self.filter_triggered(**kwargs)
+        if partition is not None:
+            index, partitions = partition
+            queryset = queryset.annotate(stock_partition=F("stock_id") % partitions).filter(
+                stock_partition=index
+            )
+        queryset = queryset.order_by("id").values_list("id", flat=True)
+        last_id = 0
+        while True:
+            order_ids = list(queryset.filter(id__gt=last_id)[:chunk_size])
+            if not order_ids:
+                return
+            yield order_ids
+            if len(order_ids) < chunk_size:
+                return
+            last_id = order_ids[-1]
+
+    def get_orders_for_close(self, order_ids: List[int]) -> QuerySet[Order]:
+        """
+        Get orders by ids that are still open and ready to close.
+
+        Args:
+        order_ids (List[int]): Ids of orders.
+
+        Returns:
+        QuerySet[Order]: QuerySet of orders ready to close.
+        """
+        return self.filter_triggered(id__in=order_ids).order_by("id")
+
+    def get_open_for_update(self, order_ids: List[int]) -> Dict[int, Order]:
+        """
+        Lock orders by ids that are still open.
+
+        Args:
+        order_ids (List[int]): Ids of orders.
+
+        Returns:
+        Dict[int, Order]: Locked open orders by id.
+        """
+        # not in_bulk, which drops the ordering: rows are locked in id order against deadlocks
+        orders = (
+            self.model.objects.select_for_update()
+            .filter(status=Order.ORDER_STATUS.OPEN, id__in=order_ids)
+            .order_by("id")
+        )
+        return {order.id: order for order in orders}
+
+    def bulk_close(self, orders: List[Order]) -> None:
+        """
+        Mark orders as closed with their closing_price in one statement.
+
+        Args:
+        orders (List[Order]): Orders with closing_price already set.
+
+        Returns:
+        None
+        """
+        for order in orders:
+            order.status = Order.ORDER_STATUS.CLOSED
+        self.bulk_update(orders, ["status", "closing_price"])
+
+    def bulk_cancel(self, orders: List[Order]) -> None:
+        """
+        Mark orders as canceled in one statement.
+
+        Args:
+        orders (List[Order]): Orders to cancel.
+
+        Returns:
+        None
+        """
+        for order in orders:
+            order.status = Order.ORDER_STATUS.CANCELED
+        if orders:
+            self.model.objects.filter(id__in=[order.id for order in orders]).update(
+                status=Order.ORDER_STATUS.CANCELED
+            )
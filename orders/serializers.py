@@ -1,6 +1,7 @@
 from django.contrib.auth import get_user_model
 from rest_framework import serializers
 
+from base.serializers import IdentityMapPrimaryKeyRelatedField
 from stocks.models import Stock
 
 from .models import Order
@@ -15,10 +16,10 @@ class OrderSerializer(serializers.ModelSerializer):
 
 
 class CreateOrderSerializer(serializers.ModelSerializer):
-    user_id = serializers.PrimaryKeyRelatedField(
+    user_id = IdentityMapPrimaryKeyRelatedField(
         queryset=User.objects.all(), required=False, default=serializers.CurrentUserDefault()
     )
-    stock_id = serializers.PrimaryKeyRelatedField(queryset=Stock.objects.all(), required=True)
+    stock_id = IdentityMapPrimaryKeyRelatedField(queryset=Stock.objects.all(), required=True)
     manual = serializers.BooleanField(default=True)
     price_limit = serializers.DecimalField(max_digits=10, decimal_places=2, required=False)
 
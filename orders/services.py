@@ -1,12 +1,18 @@
 import logging
+from functools import partial
+from typing import Iterator, List, Optional, Tuple
 
 from django.db import transaction
+from django.db.models import QuerySet
 
+from base.container import container
 from base.services import BaseService
+from inventory.models import Inventory
 from inventory.services import InventoryService
 from orders.exceptions import OrderCanceled, OrderNotCreated
 from orders.models import Order
 from orders.repositories import OrderRepository
+from orders.trigger_index import OrderTriggerIndex
 from stocks.services import StockService
 from user_management.exceptions import SubtractBalanceException
 from user_management.services import UserService
@@ -17,9 +23,10 @@ logger = logging.getLogger(__name__)
 class OrderService(BaseService):
     def __init__(self) -> None:
         """Initialize OrderService instance."""
-        self.user_service = UserService()
-        self.stock_service = StockService()
-        self.inventory_service = InventoryService()
+        self.user_service = container.get(UserService)
+        self.stock_service = container.get(StockService)
+        self.inventory_service = container.get(InventoryService)
+        self.trigger_index = OrderTriggerIndex()
         super().__init__(model=Order, repository=OrderRepository)
 
     def create_order(self, **kwargs) -> Order:
@@ -81,8 +88,22 @@ class OrderService(BaseService):
 
         if order.manual:
             self.close_order(order=order)
+        else:
+            transaction.on_commit(partial(self.trigger_index.add, [order]))
         return order
 
+    def get_user_orders(self, user_id: int) -> QuerySet[Order]:
+        """
+        Get the order history of a user, newest first.
+
+        Args:
+        user_id (int): The ID of the user.
+
+        Returns:
+        QuerySet[Order]: QuerySet of the user's orders.
+        """
+        return self.repository.get_user_orders(user_id)
+
     def can_cancel_order(self, order: Order) -> bool:
         """
         Check the ability to cancel an order.
@@ -102,6 +123,7 @@ class OrderService(BaseService):
         Returns: None
         """
         self.repository.set_status(order=order, status=Order.ORDER_STATUS.CANCELED)
+        transaction.on_commit(partial(self.trigger_index.remove, [order]))
 
     # @transaction.atomic
     def close_order(self, order: Order) -> None:
@@ -123,10 +145,105 @@ class OrderService(BaseService):
                     stock=order.stock, action=order.user_action_type
                 )
                 self.repository.close_order(order, closing_price)
+            transaction.on_commit(partial(self.trigger_index.remove, [order]))
         except OrderCanceled as e:
+            # the transaction was rolled back, reload the shared instances changed in memory
+            order.stock.refresh_from_db()
+            order.user.refresh_from_db()
             self.cancel_order(order)
             logger.info(f"[INFO] close_order: CANCEL ORDER#{order.id}. {e.detail}")
 
+    def settle_orders(self, orders: List[Order]) -> Tuple[List[Order], List[Order]]:
+        """
+        Close a batch of orders in one transaction.
+
+        Stocks, users and inventories touched by the batch are locked and loaded once,
+        every order is checked against the running quantities and balances, and the
+        accumulated changes are written back with bulk updates. Orders that fail their
+        conditions are canceled.
+
+        Args:
+        orders (List[Order]): The orders to be closed.
+
+        Returns:
+        Tuple[List[Order], List[Order]]: Closed and canceled orders.
+        """
+        closed_orders, canceled_orders = [], []
+        if not orders:
+            return closed_orders, canceled_orders
+
+        with transaction.atomic():
+            # skip orders already settled by another worker since they were loaded
+            locked_orders = self.repository.get_open_for_update([order.id for order in orders])
+            orders = [order for order in orders if order.id in locked_orders]
+            stocks = self.stock_service.get_for_update({order.stock_id for order in orders})
+            users = self.user_service.get_for_update({order.user_id for order in orders})
+            inventories = self.inventory_service.get_for_update_by_users_and_stocks(
+                user_ids=users.keys(), stock_ids=stocks.keys()
+            )
+            changed_stocks, changed_users, changed_inventories = {}, {}, {}
+
+            for order in sorted(orders, key=lambda order: order.id):
+                stock = stocks[order.stock_id]
+                user = users[order.user_id]
+                inventory = inventories.get((user.id, stock.id))
+                closing_price = self.stock_service.get_price(
+                    stock=stock, action=order.user_action_type
+                )
+                total_price = order.quantity * closing_price
+
+                if order.user_action_type == Order.USER_ACTION_TYPE.BUY:
+                    if not self.stock_service.can_buy(stock=stock, quantity=order.quantity):
+                        logger.info(
+                            f"[INFO] settle_orders: CANCEL ORDER#{order.id}. "
+                            "Stock available quantity not enought for order."
+                        )
+                        canceled_orders.append(order)
+                        continue
+                    if user.balance < total_price:
+                        logger.info(
+                            f"[INFO] settle_orders: CANCEL ORDER#{order.id}. Insufficient balance."
+                        )
+                        canceled_orders.append(order)
+                        continue
+                    if inventory is None:
+                        inventory = Inventory(user=user, stock=stock, quantity=0)
+                        inventories[(user.id, stock.id)] = inventory
+                    inventory.quantity += order.quantity
+                    stock.available_quantity -= order.quantity
+                    user.balance -= total_price
+                else:
+                    if inventory is None or inventory.quantity < order.quantity:
+                        logger.info(
+                            f"[INFO] settle_orders: CANCEL ORDER#{order.id}. "
+                            "Not enought stock quantity in inventory."
+                        )
+                        canceled_orders.append(order)
+                        continue
+                    inventory.quantity -= order.quantity
+                    stock.available_quantity += order.quantity
+                    user.balance += total_price
+
+                order.closing_price = closing_price
+                closed_orders.append(order)
+                changed_stocks[stock.id] = stock
+                changed_users[user.id] = user
+                changed_inventories[(user.id, stock.id)] = inventory
+
+            self.stock_service.bulk_update(list(changed_stocks.values()), ["available_quantity"])
+            self.user_service.bulk_update(list(changed_users.values()), ["balance"])
+            self.inventory_service.save_quantities(list(changed_inventories.values()))
+            self.repository.bulk_close(closed_orders)
+            self.repository.bulk_cancel(canceled_orders)
+            transaction.on_commit(
+                partial(self.trigger_index.remove, closed_orders + canceled_orders)
+            )
+
+        logger.info(
+            f"[INFO] settle_orders: closed {len(closed_orders)}, canceled {len(canceled_orders)}"
+        )
+        return closed_orders, canceled_orders
+
     def check_stock_available_quantity(self, **kwargs) -> bool:
         """
         Check if the stock is available for user action.
@@ -208,7 +325,7 @@ class OrderService(BaseService):
         if order.user_action_type == "buy":
             try:
                 total_price = order.quantity * order.stock.price_per_unit_sail
-                self.user_service.subtract_from_balance(order.user.id, total_price)
+                self.user_service.subtract_from_balance(order.user_id, total_price)
                 return
 
             except SubtractBalanceException as e:
@@ -216,7 +333,7 @@ class OrderService(BaseService):
 
         elif order.user_action_type == "sell":
             total_price = order.quantity * order.stock.price_per_unit_buy
-            self.user_service.add_to_balance(order.user.id, total_price)
+            self.user_service.add_to_balance(order.user_id, total_price)
             return
         raise OrderNotCreated('Order not created: field <user_action_type> is not "buy" or "sell".')
 
@@ -232,32 +349,78 @@ class OrderService(BaseService):
         """
 
         if order.user_action_type == Order.USER_ACTION_TYPE.BUY:
-            if self.stock_service.can_buy(stock=order.stock, quantity=order.quantity):
-                # transaction
+            if self.stock_service.debit_available_quantity(
+                stock=order.stock, quantity=order.quantity
+            ):
                 self.inventory_service.add_quantity(
-                    stock_id=order.stock.id, user_id=order.user.id, quantity=order.quantity
+                    stock_id=order.stock_id, user_id=order.user_id, quantity=order.quantity
                 )
-                new_value = order.stock.available_quantity - order.quantity
-                # end
-                self.stock_service.set_available_quantity(stock=order.stock, new_value=new_value)
                 return
             raise OrderCanceled("Order canceled: stock available quantity not enought for order.")
 
         if order.user_action_type == Order.USER_ACTION_TYPE.SELL:
-            if self.inventory_service.can_sell_stock(
-                stock_id=order.stock.id, user_id=order.user.id, quantity=order.quantity
+            if self.inventory_service.debit_quantity(
+                stock_id=order.stock_id, user_id=order.user_id, quantity=order.quantity
             ):
-                # transaction
-                self.inventory_service.subtract_quantity(
-                    stock_id=order.stock.id, user_id=order.user.id, quantity=order.quantity
+                self.stock_service.credit_available_quantity(
+                    stock=order.stock, quantity=order.quantity
                 )
-                new_value = order.stock.available_quantity + order.quantity
-                # end
-                self.stock_service.set_available_quantity(stock=order.stock, new_value=new_value)
                 return
             raise OrderCanceled("Order canceled: stock available quantity not enought for order.")
         raise OrderNotCreated('Order not created: field <user_action_type> is not "buy" or "sell".')
 
+    def get_triggered_order_ids(
+        self,
+        chunk_size: int,
+        stock_ids: Optional[List[int]] = None,
+        partition: Optional[Tuple[int, int]] = None,
+    ) -> Iterator[List[int]]:
+        """
+        Get ids of open automatic orders that are ready to close, in chunks.
+        Orders of specific stocks are taken from the trigger index when it is enabled.
+
+        Args:
+        chunk_size (int): Max number of ids in one chunk.
+        stock_ids (Optional[List[int]]): Check only orders of these stocks.
+        partition (Optional[Tuple[int, int]]): (index, partitions) - check only orders
+            of stocks in this partition of stock ids.
+
+        Returns:
+        Iterator[List[int]]: Chunks of ids of orders ready to close.
+        """
+        if stock_ids is None:
+            return self.repository.get_triggered_order_ids(
+                chunk_size=chunk_size, partition=partition
+            )
+        if self.trigger_index.enabled:
+            stock_prices = self.stock_service.get_prices(stock_ids)
+            return self.trigger_index.get_triggered_order_ids(stock_prices, chunk_size)
+        return self.repository.get_triggered_order_ids(
+            chunk_size=chunk_size, stock_id__in=stock_ids
+        )
+
+    def rebuild_trigger_index(self) -> int:
+        """
+        Rebuild the trigger index from open automatic orders in the db.
+
+        Returns:
+        int: Number of indexed orders.
+        """
+        orders = self.repository.filter_open_automatic().iterator(chunk_size=2000)
+        return self.trigger_index.rebuild(orders)
+
+    def get_orders_for_close(self, order_ids: List[int]) -> QuerySet[Order]:
+        """
+        Get orders by ids that are still open and ready to close.
+
+        Args:
+        order_ids (List[int]): Ids of orders.
+
+        Returns:
+        QuerySet[Order]: QuerySet of open orders.
+        """
+        return self.repository.get_orders_for_close(order_ids)
+
     def order_cancel_notification(self, order: Order) -> None:
         pass
 
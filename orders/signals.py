@@ -0,0 +1,14 @@
+from functools import partial
+
+from django.db import transaction
+from django.dispatch import receiver
+
+from stocks.signals import stock_prices_changed
+
+
+@receiver(stock_prices_changed)
+def check_orders_on_stock_prices_changed(sender, stock_ids, **kwargs):
+    """Check open orders of stocks whose prices changed once the new prices are committed."""
+    from orders.tasks import check_stock_orders
+
+    transaction.on_commit(partial(check_stock_orders.delay, stock_ids=list(stock_ids)))
@@ -1,10 +1,15 @@
 import logging
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
 
 import boto3
 from botocore.exceptions import NoCredentialsError
-from celery import shared_task
+from celery import chord, group, shared_task
+from celery.exceptions import MaxRetriesExceededError
 from django.conf import settings
 
+from base.container import container
+from base.locks import single_instance
 from orders.services import OrderService
 from stocks.services import StockService
 from trading_platform.settings import EMAIL_HOST_USER
@@ -12,28 +17,133 @@ from trading_platform.settings import EMAIL_HOST_USER
 logger = logging.getLogger(__name__)
 
 
+PARTITION_LOCK = "orders:partition:{index}:{partitions}"
+
+
+def stock_partition(stock_id: int, partitions: int) -> int:
+    """Return the partition of stock ids the stock belongs to, as in OrderRepository."""
+    return stock_id % partitions
+
+
+def close_triggered_orders(
+    order_service: OrderService,
+    stock_ids: Optional[List[int]] = None,
+    partition: Optional[Tuple[int, int]] = None,
+) -> Dict[str, int]:
+    """Settle open orders ready to close, chunk by chunk, and notify their users."""
+    result = {"triggered": 0, "closed": 0, "canceled": 0}
+    for order_ids in order_service.get_triggered_order_ids(
+        chunk_size=settings.ORDER_TRIGGER_CHUNK_SIZE, stock_ids=stock_ids, partition=partition
+    ):
+        orders = list(order_service.get_orders_for_close(order_ids))
+        closed_orders, canceled_orders = order_service.settle_orders(orders)
+        result["triggered"] += len(order_ids)
+        result["closed"] += len(closed_orders)
+        result["canceled"] += len(canceled_orders)
+        for order in closed_orders + canceled_orders:
+            logger.info(
+                f"[INFO] celery_task(close_triggered_orders): ORDER#{order.id} {order.status}"
+            )
+            send_notification.delay(order_id=order.id)
+    return result
+
+
+@shared_task(bind=True)
+def check_open_orders(self) -> Optional[Dict[str, int]]:
+    """
+    Check open orders in parallel: one sub-task per partition of stock ids.
+
+    A check run eagerly, or with a single partition, checks the partitions inline and
+    returns the totals, since there is nothing to gain from a chord.
+    """
+    partitions = settings.ORDER_TRIGGER_PARTITIONS
+
+    logger.info(f"[INFO] celery_task: check_open_orders in {partitions} partitions")
+
+    partition_checks = [
+        check_open_orders_partition.s(index=index, partitions=partitions)
+        for index in range(partitions)
+    ]
+    if self.request.is_eager or partitions == 1:
+        return aggregate_order_checks(group(partition_checks).apply().get())
+
+    chord(partition_checks)(aggregate_order_checks.s())
+    return None
+
+
 @shared_task
-def check_open_orders():
-    order_service = OrderService()
+@single_instance(PARTITION_LOCK, ttl=settings.ORDER_CHECK_LOCK_TTL)
+def check_open_orders_partition(index: int, partitions: int) -> Dict[str, int]:
+    order_service = container.get(OrderService)
 
-    logger.info("[INFO] celery_task: check_open_orders")
+    logger.info(f"[INFO] celery_task: check_open_orders_partition {index}/{partitions}")
+
+    return close_triggered_orders(order_service, partition=(index, partitions))
+
+
+@shared_task
+def aggregate_order_checks(results: List[Optional[Dict[str, int]]]) -> Dict[str, int]:
+    total = {"triggered": 0, "closed": 0, "canceled": 0, "skipped_partitions": 0}
+    for result in results:
+        if result is None:
+            # the partition was still being checked by an overlapping run
+            total["skipped_partitions"] += 1
+            continue
+        for key in result:
+            total[key] += result[key]
+    logger.info(f"[INFO] celery_task(check_open_orders): {total}")
+    return total
+
+
+@single_instance(PARTITION_LOCK, ttl=settings.ORDER_CHECK_LOCK_TTL)
+def close_partition_stock_orders(
+    index: int, partitions: int, stock_ids: List[int]
+) -> Dict[str, int]:
+    return close_triggered_orders(container.get(OrderService), stock_ids=stock_ids)
+
+
+@shared_task(bind=True, max_retries=settings.ORDER_CHECK_MAX_RETRIES)
+def check_stock_orders(self, stock_ids: List[int]) -> Dict[str, int]:
+    """
+    Check open orders of stocks, holding the lock of each stock's partition.
+    Stocks of partitions busy with another check are re-checked a second later, up to
+    ORDER_CHECK_MAX_RETRIES times; after that they are left to the periodic check_open_orders.
+    """
+    logger.info(f"[INFO] celery_task: check_stock_orders {stock_ids}")
+
+    partitions = settings.ORDER_TRIGGER_PARTITIONS
+    stock_ids_by_partition = defaultdict(list)
+    for stock_id in stock_ids:
+        stock_ids_by_partition[stock_partition(stock_id, partitions)].append(stock_id)
+
+    total = {"triggered": 0, "closed": 0, "canceled": 0}
+    busy_stock_ids = []
+    for index, partition_stock_ids in stock_ids_by_partition.items():
+        result = close_partition_stock_orders(
+            index=index, partitions=partitions, stock_ids=partition_stock_ids
+        )
+        if result is None:
+            busy_stock_ids.extend(partition_stock_ids)
+            continue
+        for key in total:
+            total[key] += result[key]
 
-    open_orders = order_service.filter_objs(status="open", manual=False)
-    logger.info(f"[INFO] open orders for check: {len(open_orders)}")
-    if open_orders.exists():
-        for order in open_orders:
-            if order_service.is_ready_to_close(order):
-                order_service.close_order(order)
-                logger.info(
-                    f"[INFO] celery_task(check_open_orders): ORDER#{order.id} {order.status}"
-                )
-                send_notification.delay(order_id=order.id)
+    logger.info(f"[INFO] celery_task(check_stock_orders): {total}")
+    if busy_stock_ids:
+        try:
+            raise self.retry(kwargs={"stock_ids": busy_stock_ids}, countdown=1)
+        except MaxRetriesExceededError:
+            logger.warning(
+                f"[WARNING] celery_task(check_stock_orders): partitions still busy, "
+                f"stocks {busy_stock_ids} are left to check_open_orders"
+            )
+    return total
 
 
 @shared_task
 def send_notification(order_id: int):
-    order_service = OrderService()
-    stock_service = StockService()
+    order_service = container.get(OrderService)
+    stock_service = container.get(StockService)
 
     order = order_service.get_by_id(obj_id=order_id)
     subject = f"Order {order.status}"
@@ -42,7 +152,7 @@ def send_notification(order_id: int):
               was {order.status}.\n"
         f"Closing price in moment of closing order: {order.closing_price}.\n"
         f"Your balance now: {order.user.balance}.\n"
-        f"Stock price now: {stock_service.get_price(order.stock,order.user_action_type)}."
+        f"Stock price now: {stock_service.get_latest_price(order.stock, order.user_action_type)}."
     )
 
     from_email = EMAIL_HOST_USER
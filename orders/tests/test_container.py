@@ -0,0 +1,36 @@
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from base.container import ServiceContainer, container
+from inventory.services import InventoryService
+from orders import tasks
+from orders.services import OrderService
+from stocks.services import StockService
+from user_management.services import UserService
+
+
+class ServiceContainerTestCase(SimpleTestCase):
+    def test_services_are_built_once_and_shared(self):
+        services = ServiceContainer()
+
+        order_service = services.get(OrderService)
+
+        self.assertIs(services.get(OrderService), order_service)
+        self.assertIs(order_service.inventory_service, container.get(InventoryService))
+        self.assertIs(order_service.stock_service, order_service.inventory_service.stock_service)
+        self.assertIs(order_service.user_service, container.get(UserService))
+        self.assertIs(order_service.stock_service, container.get(StockService))
+
+    def test_repositories_are_shared_by_model(self):
+        self.assertIs(StockService().repository, container.get(StockService).repository)
+
+    def test_override_replaces_service_in_tasks(self):
+        order_service = mock.Mock()
+
+        with mock.patch.object(tasks, "close_triggered_orders") as close_triggered_orders:
+            with container.override(OrderService, order_service):
+                tasks.close_partition_stock_orders.__wrapped__(index=0, partitions=1, stock_ids=[1])
+
+        close_triggered_orders.assert_called_once_with(order_service, stock_ids=[1])
+        self.assertIsNot(container.get(OrderService), order_service)
@@ -0,0 +1,75 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from base import identity_map
+from orders.models import Order
+from orders.services import OrderService
+from stocks.models import Stock
+
+User = get_user_model()
+
+
+class IdentityMapTestCase(TestCase):
+    order_service = OrderService()
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="user_test", password="user_password", email="user_test@gmail.com"
+        )
+        self.user.balance = 1000
+        self.user.save()
+        self.stock = Stock.objects.create(
+            name="test Stock 1",
+            symbol="tFS1",
+            price_per_unit_sail=120,
+            price_per_unit_buy=110,
+            available_quantity=10,
+        )
+
+    def test_get_by_id_loads_object_once_per_scope(self):
+        with identity_map.scope():
+            with self.assertNumQueries(1):
+                user = self.order_service.user_service.get_by_id(self.user.id)
+                self.assertIs(
+                    self.order_service.inventory_service.user_service.get_by_id(self.user.id), user
+                )
+
+        with self.assertNumQueries(2):
+            self.order_service.user_service.get_by_id(self.user.id)
+            self.order_service.user_service.get_by_id(self.user.id)
+
+    def test_create_manual_order_shares_loaded_objects(self):
+        order_data = {
+            "user_id": self.user.id,
+            "stock_id": self.stock.id,
+            "quantity": 2,
+            "manual": True,
+            "user_action_type": Order.USER_ACTION_TYPE.BUY,
+        }
+        with identity_map.scope():
+            order = self.order_service.create_order(**order_data)
+            self.assertIs(order.user, self.order_service.user_service.get_by_id(self.user.id))
+
+        self.user.refresh_from_db()
+        self.stock.refresh_from_db()
+        self.assertEqual(order.status, Order.ORDER_STATUS.CLOSED)
+        self.assertEqual(self.user.balance, 1000 - 2 * 120)
+        self.assertEqual(self.stock.available_quantity, 8)
+
+    def test_get_for_update_locks_in_id_order(self):
+        other = Stock.objects.create(
+            name="test Stock 2",
+            symbol="tFS2",
+            price_per_unit_sail=60,
+            price_per_unit_buy=50,
+            available_quantity=1,
+        )
+
+        with identity_map.scope(), CaptureQueriesContext(connection) as queries:
+            stocks = self.order_service.stock_service.get_for_update([other.id, self.stock.id])
+            self.assertIs(self.order_service.stock_service.get_by_id(other.id), stocks[other.id])
+
+        self.assertEqual(list(stocks), [self.stock.id, other.id])
+        self.assertIn('ORDER BY "stocks_stock"."id" ASC', queries[0]["sql"])
@@ -0,0 +1,51 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+
+from inventory.models import Inventory
+from orders.services import OrderService
+from stocks.models import Stock
+
+User = get_user_model()
+
+
+class QueryPlanTestCase(TestCase):
+    order_service = OrderService()
+
+    def setUp(self):
+        if connection.vendor == "postgresql":
+            # tables of a test are tiny, make the planner pick indexes over seq scans
+            with connection.cursor() as cursor:
+                cursor.execute("SET LOCAL enable_seqscan = off")
+
+        self.user = User.objects.create_user(
+            username="user_test", password="user_password", email="user_test@gmail.com"
+        )
+        self.stock = Stock.objects.create(
+            name="test Stock 1",
+            symbol="tFS1",
+            price_per_unit_sail=120,
+            price_per_unit_buy=110,
+            available_quantity=10,
+        )
+
+    def assertUsesIndex(self, queryset, index_name):
+        self.assertIn(index_name, queryset.explain())
+
+    def test_open_automatic_orders_of_stock_use_partial_index(self):
+        queryset = self.order_service.repository.filter_open_automatic(
+            stock_id=self.stock.id, price_limit__lte=100
+        )
+        self.assertUsesIndex(queryset, "order_open_auto_limit_idx")
+
+    def test_user_order_history_uses_index(self):
+        queryset = self.order_service.get_user_orders(user_id=self.user.id)
+        self.assertUsesIndex(queryset, "order_user_history_idx")
+
+    def test_user_stock_inventory_uses_unique_index(self):
+        queryset = Inventory.objects.filter(user=self.user, stock=self.stock)
+        if connection.vendor == "sqlite":
+            # SQLite backs unique constraints with its own autoindexes
+            self.assertUsesIndex(queryset, "sqlite_autoindex_inventory_inventory")
+            return
+        self.assertUsesIndex(queryset, "inventory_unique_user_stock")
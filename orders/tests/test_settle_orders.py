@@ -0,0 +1,102 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from inventory.models import Inventory
+from orders.models import Order
+from orders.services import OrderService
+from stocks.models import Stock
+
+User = get_user_model()
+
+
+class SettleOrdersTestCase(TestCase):
+    order_service = OrderService()
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="user_test", password="user_password", email="user_test@gmail.com"
+        )
+        self.user.balance = 300
+        self.user.save()
+        self.stock = Stock.objects.create(
+            name="test Stock 1",
+            symbol="tFS1",
+            price_per_unit_sail=120,
+            price_per_unit_buy=110,
+            available_quantity=10,
+        )
+        self.other_stock = Stock.objects.create(
+            name="test Stock 2",
+            symbol="tFS2",
+            price_per_unit_sail=60,
+            price_per_unit_buy=50,
+            available_quantity=1,
+        )
+
+    def create_order(self, stock, user_action_type, quantity):
+        return Order.objects.create(
+            user=self.user,
+            stock=stock,
+            quantity=quantity,
+            status=Order.ORDER_STATUS.OPEN,
+            manual=False,
+            user_action_type=user_action_type,
+            price_limit=100,
+            order_type=Order.ORDER_TYPE.LONG,
+        )
+
+    def test_settle_orders(self):
+        buy_order = self.create_order(self.stock, Order.USER_ACTION_TYPE.BUY, 2)
+        # balance left after the first buy is 60, not enough for another 120
+        no_balance_order = self.create_order(self.stock, Order.USER_ACTION_TYPE.BUY, 1)
+        sell_order = self.create_order(self.stock, Order.USER_ACTION_TYPE.SELL, 1)
+        # user owns no shares of other_stock
+        no_inventory_order = self.create_order(self.other_stock, Order.USER_ACTION_TYPE.SELL, 1)
+
+        closed_orders, canceled_orders = self.order_service.settle_orders(
+            [buy_order, no_balance_order, sell_order, no_inventory_order]
+        )
+
+        self.assertEqual(closed_orders, [buy_order, sell_order])
+        self.assertEqual(canceled_orders, [no_balance_order, no_inventory_order])
+
+        for order in (buy_order, no_balance_order, sell_order, no_inventory_order):
+            order.refresh_from_db()
+        self.user.refresh_from_db()
+        self.stock.refresh_from_db()
+        self.other_stock.refresh_from_db()
+
+        self.assertEqual(buy_order.status, Order.ORDER_STATUS.CLOSED)
+        self.assertEqual(buy_order.closing_price, 120)
+        self.assertEqual(sell_order.status, Order.ORDER_STATUS.CLOSED)
+        self.assertEqual(sell_order.closing_price, 110)
+        self.assertEqual(no_balance_order.status, Order.ORDER_STATUS.CANCELED)
+        self.assertEqual(no_inventory_order.status, Order.ORDER_STATUS.CANCELED)
+
+        self.assertEqual(self.user.balance, 300 - 2 * 120 + 110)
+        self.assertEqual(self.stock.available_quantity, 10 - 2 + 1)
+        self.assertEqual(self.other_stock.available_quantity, 1)
+        self.assertEqual(Inventory.objects.get(user=self.user, stock=self.stock).quantity, 1)
+
+    def test_settle_orders_deletes_emptied_inventory(self):
+        Inventory.objects.create(user=self.user, stock=self.stock, quantity=2)
+        sell_order = self.create_order(self.stock, Order.USER_ACTION_TYPE.SELL, 2)
+
+        closed_orders, canceled_orders = self.order_service.settle_orders([sell_order])
+
+        self.assertEqual(closed_orders, [sell_order])
+        self.assertEqual(canceled_orders, [])
+        self.assertFalse(Inventory.objects.filter(user=self.user, stock=self.stock).exists())
+
+    def test_open_orders_are_locked_in_id_order(self):
+        orders = [self.create_order(self.stock, Order.USER_ACTION_TYPE.BUY, 1) for _ in range(2)]
+
+        with CaptureQueriesContext(connection) as queries:
+            locked = self.order_service.repository.get_open_for_update(
+                [order.id for order in reversed(orders)]
+            )
+
+        self.assertEqual(list(locked), [order.id for order in orders])
+        self.assertIn('ORDER BY "orders_order"."id" ASC', queries[0]["sql"])
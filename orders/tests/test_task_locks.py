@@ -0,0 +1,89 @@
+from unittest import mock
+
+from celery.exceptions import MaxRetriesExceededError, Retry
+from django.test import SimpleTestCase, override_settings
+
+from base.locks import LeaseLock
+from orders import tasks
+
+
+class LeaseLockTestCase(SimpleTestCase):
+    def setUp(self):
+        self.client = mock.MagicMock()
+
+    def test_acquire_sets_key_with_expiry_only_if_free(self):
+        self.client.set.return_value = True
+        lock = LeaseLock("orders:partition:1:8", ttl=30, client=self.client)
+
+        self.assertTrue(lock.acquire())
+        lock.release()
+
+        self.client.set.assert_called_once_with(
+            "locks:orders:partition:1:8", lock.token, nx=True, px=30000
+        )
+        self.client.eval.assert_called_once_with(
+            LeaseLock.RELEASE_SCRIPT, 1, "locks:orders:partition:1:8", lock.token
+        )
+
+    def test_acquire_fails_while_held(self):
+        self.client.set.return_value = None
+        lock = LeaseLock("orders:partition:1:8", client=self.client)
+
+        self.assertFalse(lock.acquire())
+        self.assertIsNone(lock._heartbeat)
+
+
+@override_settings(ORDER_TRIGGER_PARTITIONS=2)
+@mock.patch("base.locks.record_lock_event")
+class CheckStockOrdersLockTestCase(SimpleTestCase):
+    def check_stock_orders(self, stock_ids):
+        def acquire(lock):
+            return lock.name != "orders:partition:1:2"
+
+        with mock.patch.object(LeaseLock, "acquire", acquire), mock.patch.object(
+            LeaseLock, "release"
+        ), mock.patch("base.locks.get_redis_client"):
+            return tasks.check_stock_orders(stock_ids=stock_ids)
+
+    @mock.patch.object(tasks, "close_triggered_orders")
+    @mock.patch.object(tasks.check_stock_orders, "retry", side_effect=Retry())
+    def test_busy_partitions_are_checked_again(self, retry, close_triggered_orders, _):
+        close_triggered_orders.return_value = {"triggered": 1, "closed": 1, "canceled": 0}
+
+        with self.assertRaises(Retry):
+            self.check_stock_orders(stock_ids=[1, 2, 3, 4])
+
+        close_triggered_orders.assert_called_once_with(mock.ANY, stock_ids=[2, 4])
+        retry.assert_called_once_with(kwargs={"stock_ids": [1, 3]}, countdown=1)
+
+    @mock.patch.object(tasks, "close_triggered_orders")
+    @mock.patch.object(tasks.check_stock_orders, "retry", side_effect=MaxRetriesExceededError())
+    def test_busy_partitions_are_left_after_max_retries(self, retry, close_triggered_orders, _):
+        close_triggered_orders.return_value = {"triggered": 1, "closed": 1, "canceled": 0}
+
+        result = self.check_stock_orders(stock_ids=[1, 2, 3, 4])
+
+        self.assertEqual(result, {"triggered": 1, "closed": 1, "canceled": 0})
+        retry.assert_called_once()
+
+    def test_aggregate_counts_skipped_partitions(self, _):
+        result = tasks.aggregate_order_checks([{"triggered": 2, "closed": 1, "canceled": 1}, None])
+
+        self.assertEqual(
+            result, {"triggered": 2, "closed": 1, "canceled": 1, "skipped_partitions": 1}
+        )
+
+    @mock.patch.object(tasks, "close_triggered_orders", return_value={"triggered": 0})
+    def test_partition_lock_is_named_after_positional_arguments(self, close_triggered_orders, _):
+        names = []
+
+        def acquire(lock):
+            names.append(lock.name)
+            return True
+
+        with mock.patch.object(LeaseLock, "acquire", acquire), mock.patch.object(
+            LeaseLock, "release"
+        ), mock.patch("base.locks.get_redis_client"):
+            tasks.close_partition_stock_orders(1, 2, [3])
+
+        self.assertEqual(names, ["orders:partition:1:2"])
@@ -0,0 +1,92 @@
+from unittest import mock
+
+import redis
+from django.test import SimpleTestCase, override_settings
+
+from orders.models import Order
+from orders.trigger_index import OrderTriggerIndex
+
+
+@override_settings(ORDER_TRIGGER_INDEX_ENABLED=True)
+class OrderTriggerIndexTestCase(SimpleTestCase):
+    def setUp(self):
+        self.client = mock.MagicMock()
+        self.pipeline = self.client.pipeline.return_value
+        self.trigger_index = OrderTriggerIndex(client=self.client)
+
+    def test_add_indexes_open_automatic_orders_by_price_limit(self):
+        orders = [
+            Order(
+                id=1,
+                stock_id=7,
+                order_type=Order.ORDER_TYPE.LONG,
+                user_action_type=Order.USER_ACTION_TYPE.BUY,
+                price_limit=100,
+                manual=False,
+            ),
+            Order(id=2, stock_id=7, user_action_type=Order.USER_ACTION_TYPE.BUY, manual=True),
+        ]
+        self.trigger_index.add(orders)
+        self.pipeline.zadd.assert_called_once_with("orders:trigger:7:long:buy", {1: 100.0})
+
+    def test_get_triggered_order_ids_range_by_order_type(self):
+        self.pipeline.execute.return_value = [[b"5"], [], [b"3", b"4"], [b"1"]]
+
+        chunks = list(self.trigger_index.get_triggered_order_ids({7: (120, 110)}, chunk_size=3))
+
+        self.assertEqual(chunks, [[1, 3, 4], [5]])
+        self.pipeline.zrangebyscore.assert_has_calls(
+            [
+                mock.call("orders:trigger:7:short:buy", "-inf", 120.0),
+                mock.call("orders:trigger:7:long:buy", 120.0, "+inf"),
+                mock.call("orders:trigger:7:short:sell", "-inf", 110.0),
+                mock.call("orders:trigger:7:long:sell", 110.0, "+inf"),
+            ]
+        )
+
+    def test_redis_failure_after_commit_is_logged(self):
+        self.pipeline.execute.side_effect = redis.ConnectionError("down")
+        order = Order(
+            id=1,
+            stock_id=7,
+            order_type=Order.ORDER_TYPE.LONG,
+            user_action_type=Order.USER_ACTION_TYPE.BUY,
+            price_limit=100,
+            manual=False,
+        )
+
+        with self.assertLogs("orders.trigger_index", level="ERROR") as logs:
+            self.trigger_index.add([order])
+            self.trigger_index.remove([order])
+
+        self.assertEqual(len(logs.records), 2)
+
+    @override_settings(ORDER_TRIGGER_INDEX_ENABLED=False)
+    def test_disabled_index_is_not_maintained(self):
+        self.trigger_index.add([Order(id=1, stock_id=7, manual=False)])
+        self.client.pipeline.assert_not_called()
+
+    def test_rebuild_replaces_live_keys_in_one_transaction(self):
+        self.client.scan_iter.return_value = [
+            b"orders:trigger:7:long:buy",
+            b"orders:trigger:8:long:buy",
+        ]
+        orders = [
+            Order(
+                id=1,
+                stock_id=7,
+                order_type=Order.ORDER_TYPE.LONG,
+                user_action_type=Order.USER_ACTION_TYPE.BUY,
+                price_limit=100,
+                manual=False,
+            )
+        ]
+
+        self.assertEqual(self.trigger_index.rebuild(orders), 1)
+
+        (built_key,) = [call.args[0] for call in self.pipeline.zadd.call_args_list]
+        self.assertTrue(built_key.startswith("orders:trigger-rebuild:"))
+        self.client.pipeline.assert_called_with(transaction=True)
+        self.pipeline.rename.assert_called_once_with(built_key, "orders:trigger:7:long:buy")
+        self.pipeline.delete.assert_called_once_with("orders:trigger:8:long:buy")
+        self.client.delete.assert_not_called()
@@ -0,0 +1,148 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+
+from orders.models import Order
+from orders.services import OrderService
+from stocks.models import Stock
+from stocks.signals import stock_prices_changed
+
+User = get_user_model()
+
+
+class TriggeredOrdersTestCase(TestCase):
+    order_service = OrderService()
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="user_test", password="user_password", email="user_test@gmail.com"
+        )
+        self.stock = Stock.objects.create(
+            name="test Stock 1",
+            symbol="tFS1",
+            price_per_unit_sail=120,
+            price_per_unit_buy=110,
+            available_quantity=10,
+        )
+        self.orders = {}
+        for order_type in Order.ORDER_TYPE.values:
+            for user_action_type in Order.USER_ACTION_TYPE.values:
+                self.orders[(order_type, user_action_type)] = Order.objects.create(
+                    user=self.user,
+                    stock=self.stock,
+                    quantity=1,
+                    status=Order.ORDER_STATUS.OPEN,
+                    manual=False,
+                    user_action_type=user_action_type,
+                    price_limit=100,
+                    order_type=order_type,
+                )
+
+    def get_triggered_order_ids(self, chunk_size=1000):
+        order_ids = []
+        for chunk in self.order_service.get_triggered_order_ids(chunk_size=chunk_size):
+            order_ids.extend(chunk)
+        return order_ids
+
+    def set_prices(self, price_per_unit_sail, price_per_unit_buy):
+        self.stock.price_per_unit_sail = price_per_unit_sail
+        self.stock.price_per_unit_buy = price_per_unit_buy
+        self.stock.save()
+
+    def test_short_orders_triggered_when_price_rises(self):
+        self.set_prices(price_per_unit_sail=130, price_per_unit_buy=130)
+        self.assertEqual(
+            sorted(self.get_triggered_order_ids()),
+            sorted(
+                [
+                    self.orders[(Order.ORDER_TYPE.SHORT, Order.USER_ACTION_TYPE.BUY)].id,
+                    self.orders[(Order.ORDER_TYPE.SHORT, Order.USER_ACTION_TYPE.SELL)].id,
+                ]
+            ),
+        )
+
+    def test_long_orders_triggered_when_price_falls(self):
+        self.set_prices(price_per_unit_sail=80, price_per_unit_buy=80)
+        self.assertEqual(
+            sorted(self.get_triggered_order_ids()),
+            sorted(
+                [
+                    self.orders[(Order.ORDER_TYPE.LONG, Order.USER_ACTION_TYPE.BUY)].id,
+                    self.orders[(Order.ORDER_TYPE.LONG, Order.USER_ACTION_TYPE.SELL)].id,
+                ]
+            ),
+        )
+
+    def test_price_of_user_action_is_used(self):
+        # buy orders check price_per_unit_sail, sell orders check price_per_unit_buy
+        self.set_prices(price_per_unit_sail=130, price_per_unit_buy=80)
+        self.assertEqual(
+            sorted(self.get_triggered_order_ids()),
+            sorted(
+                [
+                    self.orders[(Order.ORDER_TYPE.SHORT, Order.USER_ACTION_TYPE.BUY)].id,
+                    self.orders[(Order.ORDER_TYPE.LONG, Order.USER_ACTION_TYPE.SELL)].id,
+                ]
+            ),
+        )
+
+    def test_matches_is_ready_to_close(self):
+        self.set_prices(price_per_unit_sail=100, price_per_unit_buy=90)
+        expected = [
+            order.id
+            for order in Order.objects.select_related("stock")
+            if self.order_service.is_ready_to_close(order)
+        ]
+        self.assertEqual(sorted(self.get_triggered_order_ids()), sorted(expected))
+
+    def test_chunks(self):
+        self.set_prices(price_per_unit_sail=100, price_per_unit_buy=100)
+        chunks = list(self.order_service.get_triggered_order_ids(chunk_size=3))
+        self.assertEqual([len(chunk) for chunk in chunks], [3, 1])
+
+    def test_closed_and_manual_orders_are_not_triggered(self):
+        self.set_prices(price_per_unit_sail=100, price_per_unit_buy=100)
+        Order.objects.filter(order_type=Order.ORDER_TYPE.SHORT).update(
+            status=Order.ORDER_STATUS.CLOSED
+        )
+        Order.objects.filter(order_type=Order.ORDER_TYPE.LONG).update(manual=True)
+        self.assertEqual(self.get_triggered_order_ids(), [])
+
+    def test_stock_prices_changed_schedules_check_stock_orders(self):
+        with mock.patch("orders.tasks.check_stock_orders.delay") as check_stock_orders:
+            with self.captureOnCommitCallbacks(execute=True):
+                stock_prices_changed.send(sender=None, stock_ids=[self.stock.id])
+        check_stock_orders.assert_called_once_with(stock_ids=[self.stock.id])
+
+    def test_partitions_split_orders_by_stock(self):
+        other_stock = Stock.objects.create(
+            name="test Stock 2",
+            symbol="tFS2",
+            price_per_unit_sail=100,
+            price_per_unit_buy=100,
+            available_quantity=10,
+        )
+        other_order = Order.objects.create(
+            user=self.user,
+            stock=other_stock,
+            quantity=1,
+            status=Order.ORDER_STATUS.OPEN,
+            manual=False,
+            user_action_type=Order.USER_ACTION_TYPE.BUY,
+            price_limit=100,
+            order_type=Order.ORDER_TYPE.LONG,
+        )
+        self.set_prices(price_per_unit_sail=100, price_per_unit_buy=100)
+
+        partitions = []
+        for index in range(2):
+            order_ids = []
+            for chunk in self.order_service.get_triggered_order_ids(
+                chunk_size=1000, partition=(index, 2)
+            ):
+                order_ids.extend(chunk)
+            partitions.append(order_ids)
+
+        stock_orders = sorted(order.id for order in self.orders.values())
+        self.assertEqual(sorted(partitions, key=len), [[other_order.id], stock_orders])
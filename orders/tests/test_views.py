@@ -1,3 +1,5 @@
+from unittest import mock
+
 from django.contrib.auth import get_user_model
 from django.test import TestCase
 from django.urls import reverse
@@ -27,6 +29,11 @@ class BaseOrderTestCase(TestCase):
     user_service = UserService()
 
     def setUp(self):
+        # order checks run under partition locks kept in Redis
+        patcher = mock.patch("base.locks.get_redis_client")
+        patcher.start().return_value.set.return_value = True
+        self.addCleanup(patcher.stop)
+
         admin_user_data = {
             "username": "admin_test",
             "password": "admin_password",
@@ -0,0 +1,173 @@
+import logging
+import uuid
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import redis
+from django.conf import settings
+
+from base.redis_client import get_redis_client
+from orders.models import Order
+
+logger = logging.getLogger(__name__)
+
+
+class OrderTriggerIndex:
+    """
+    Index of open automatic orders in Redis sorted sets.
+
+    Every (stock, order_type, user_action_type) has its own sorted set of order ids
+    scored by price_limit, so the orders crossed by a price are one range query away:
+    short orders trigger when the price rises to the limit, long orders when it falls to it.
+    """
+
+    KEY_PREFIX = "orders:trigger"
+    # prefix of the keys a rebuild fills before they replace the live ones
+    REBUILD_PREFIX = "orders:trigger-rebuild"
+
+    def __init__(self, client: Optional[redis.Redis] = None) -> None:
+        self._client = client
+
+    @property
+    def enabled(self) -> bool:
+        return settings.ORDER_TRIGGER_INDEX_ENABLED
+
+    @property
+    def client(self) -> redis.Redis:
+        if self._client is None:
+            self._client = get_redis_client()
+        return self._client
+
+    def key(
+        self, stock_id: int, order_type: str, user_action_type: str, prefix: Optional[str] = None
+    ) -> str:
+        return f"{prefix or self.KEY_PREFIX}:{stock_id}:{order_type}:{user_action_type}"
+
+    def add(self, orders: Iterable[Order]) -> None:
+        """
+        Add open automatic orders to the index. Runs after the orders are committed, so
+        a Redis failure is logged instead of raised; rebuild_trigger_index and the SQL
+        sweep of check_open_orders recover the orders it missed.
+
+        Args:
+        orders (Iterable[Order]): The orders to add.
+        """
+        if not self.enabled:
+            return
+        try:
+            self._add(orders)
+        except redis.RedisError as e:
+            logger.error(f"[ERROR] OrderTriggerIndex.add: failed to index orders: {e}")
+
+    def _add(self, orders: Iterable[Order], prefix: Optional[str] = None) -> List[str]:
+        keys = set()
+        pipeline = self.client.pipeline(transaction=False)
+        for order in orders:
+            if order.manual or order.status != Order.ORDER_STATUS.OPEN:
+                continue
+            key = self.key(order.stock_id, order.order_type, order.user_action_type, prefix)
+            pipeline.zadd(key, {order.id: float(order.price_limit)})
+            keys.add(key)
+        pipeline.execute()
+        return list(keys)
+
+    def remove(self, orders: Iterable[Order]) -> None:
+        """
+        Remove orders from the index. Like add, a Redis failure is logged instead of raised:
+        orders left in the index are skipped once loaded, as they are no longer open.
+
+        Args:
+        orders (Iterable[Order]): The orders to remove.
+        """
+        if not self.enabled:
+            return
+        pipeline = self.client.pipeline(transaction=False)
+        for order in orders:
+            if order.manual:
+                continue
+            pipeline.zrem(
+                self.key(order.stock_id, order.order_type, order.user_action_type), order.id
+            )
+        try:
+            pipeline.execute()
+        except redis.RedisError as e:
+            logger.error(f"[ERROR] OrderTriggerIndex.remove: failed to unindex orders: {e}")
+
+    def get_triggered_order_ids(
+        self, stock_prices: Dict[int, Tuple[float, float]], chunk_size: int
+    ) -> Iterator[List[int]]:
+        """
+        Get ids of indexed orders crossed by the current prices of stocks, in chunks.
+
+        Args:
+        stock_prices (Dict[int, Tuple[float, float]]): price_per_unit_sail and
+            price_per_unit_buy by stock id.
+        chunk_size (int): Max number of ids in one chunk.
+
+        Returns:
+        Iterator[List[int]]: Chunks of ids of orders ready to close.
+        """
+        pipeline = self.client.pipeline(transaction=False)
+        for stock_id, (price_per_unit_sail, price_per_unit_buy) in stock_prices.items():
+            for user_action_type, price in (
+                (Order.USER_ACTION_TYPE.BUY, float(price_per_unit_sail)),
+                (Order.USER_ACTION_TYPE.SELL, float(price_per_unit_buy)),
+            ):
+                pipeline.zrangebyscore(
+                    self.key(stock_id, Order.ORDER_TYPE.SHORT, user_action_type), "-inf", price
+                )
+                pipeline.zrangebyscore(
+                    self.key(stock_id, Order.ORDER_TYPE.LONG, user_action_type), price, "+inf"
+                )
+
+        order_ids = sorted(int(order_id) for result in pipeline.execute() for order_id in result)
+        for start in range(0, len(order_ids), chunk_size):
+            end = start + chunk_size
+            yield order_ids[start:end]
+
+    def rebuild(self, orders: Iterable[Order], batch_size: int = 1000) -> int:
+        """
+        Replace the index with one filled from the given orders.
+
+        The orders are indexed under temporary keys, which then replace the live keys in one
+        MULTI/EXEC block, so checks running meanwhile see either the old or the new index,
+        never a partly filled one.
+
+        Args:
+        orders (Iterable[Order]): Open automatic orders.
+        batch_size (int): Number of orders sent to Redis in one pipeline.
+
+        Returns:
+        int: Number of indexed orders.
+        """
+        prefix = f"{self.REBUILD_PREFIX}:{uuid.uuid4().hex}"
+        built_keys = set()
+        indexed, batch = 0, []
+        try:
+            for order in orders:
+                batch.append(order)
+                if len(batch) == batch_size:
+                    built_keys.update(self._add(batch, prefix))
+                    indexed += len(batch)
+                    batch = []
+            built_keys.update(self._add(batch, prefix))
+            indexed += len(batch)
+        except Exception:
+            if built_keys:
+                self.client.delete(*built_keys)
+            raise
+
+        live_keys = {
+            key.decode() if isinstance(key, bytes) else key
+            for key in self.client.scan_iter(match=f"{self.KEY_PREFIX}:*")
+        }
+        pipeline = self.client.pipeline(transaction=True)
+        for built_key in built_keys:
+            live_key = self.KEY_PREFIX + built_key.removeprefix(prefix)
+            pipeline.rename(built_key, live_key)
+            live_keys.discard(live_key)
+        if live_keys:
+            # sets of stocks without open orders anymore
+            pipeline.delete(*live_keys)
+        pipeline.execute()
+        logger.info(f"[INFO] OrderTriggerIndex.rebuild: {indexed} orders indexed")
+        return indexed
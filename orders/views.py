@@ -3,13 +3,12 @@ from rest_framework.generics import ListAPIView, RetrieveAPIView
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from base.container import container
 from orders.models import Order
 from orders.serializers import CreateOrderSerializer, OrderSerializer
 from orders.services import OrderService
 from user_management.permissions import CanCancelOrder, IsAdminOrAnalyst, IsUser, IsUserOrAdmin
 
-order_service = OrderService()
-
 
 class OrderList(ListAPIView):
     """
@@ -18,9 +17,12 @@ class OrderList(ListAPIView):
     """
 
     permission_classes = [IsAdminOrAnalyst]
-    queryset = order_service.get_all()
     serializer_class = OrderSerializer
 
+    def get_queryset(self):
+        order_service = container.get(OrderService)
+        return order_service.get_all()
+
 
 class UserOrderList(ListAPIView):
     """
@@ -33,7 +35,8 @@ class UserOrderList(ListAPIView):
 
     def get_queryset(self):
         user_id = self.kwargs["user_id"]
-        return order_service.filter_objs(user=user_id)
+        order_service = container.get(OrderService)
+        return order_service.get_user_orders(user_id=user_id)
 
 
 class CurrentUserOrderList(ListAPIView):
@@ -46,7 +49,8 @@ class CurrentUserOrderList(ListAPIView):
     serializer_class = OrderSerializer
 
     def get_queryset(self):
-        return order_service.filter_objs(user=self.request.user)
+        order_service = container.get(OrderService)
+        return order_service.get_user_orders(user_id=self.request.user.id)
 
 
 class CancelOrderView(RetrieveAPIView):
@@ -60,6 +64,7 @@ class CancelOrderView(RetrieveAPIView):
     permission_classes = [CanCancelOrder]
 
     def put(self, request, pk):
+        order_service = container.get(OrderService)
         order = order_service.get_by_id(obj_id=pk)
         if order_service.can_cancel_order(order=order):
             order_service.cancel_order(order=order)
@@ -91,6 +96,7 @@ class CreateOrderView(APIView):
         serializer = self.serializer_class(data=request.data, context={"request": request})
         serializer.is_valid(raise_exception=True)
 
+        order_service = container.get(OrderService)
         order = order_service.create_order(**serializer.data)
 
         if order.status == Order.ORDER_STATUS.CLOSED:
@@ -0,0 +1,155 @@
+import bisect
+import mmap
+import os
+import re
+import struct
+import sys
+from collections import OrderedDict
+from typing import Dict, NamedTuple, Optional, Sequence, Tuple
+
+try:
+    import numpy
+except ImportError:  # optional: columns are exposed as memoryviews without numpy
+    numpy = None
+
+# one file per column, of int64 little endian values
+COLUMNS = ("time", "sell", "buy")
+ITEM = struct.Struct("<q")
+
+SYMBOL_PATTERN = re.compile(r"^[A-Za-z0-9_\-][A-Za-z0-9_.\-]*$")
+
+
+class TickColumns(NamedTuple):
+    """
+    Ticks of a symbol as columns: timestamps in milliseconds since the epoch and sell and buy
+    prices in ticks. Numpy arrays if numpy is installed, memoryviews of int64 otherwise;
+    either way they are views of the mapped files, not copies.
+    """
+
+    time: Sequence[int]
+    sell: Sequence[int]
+    buy: Sequence[int]
+
+
+class TickArchive:
+    """
+    Append-only archive of price ticks, a directory of fixed-width column files per symbol.
+
+    Rows are appended in time order: a timestamp older than the last one of the symbol is
+    raised to it, so readers can binary-search the time column. The time column is written
+    last and readers use the shortest column, so a row torn by a crash is not read.
+    """
+
+    def __init__(self, root: str, max_open_symbols: int = 256) -> None:
+        self.root = root
+        self.max_open_symbols = max_open_symbols
+        # column files and last timestamp of recently written symbols, least recent first
+        self._open: "OrderedDict[str, Tuple[tuple, int]]" = OrderedDict()
+
+    def path(self, symbol: str, column: str) -> str:
+        if not SYMBOL_PATTERN.match(symbol):
+            raise ValueError(f"Symbol {symbol!r} can't be used as an archive file name.")
+        return os.path.join(self.root, symbol, f"{column}.i8")
+
+    def append(self, ticks: Dict[str, Tuple[int, int]], timestamp: int) -> None:
+        """
+        Append a row per symbol.
+
+        Args:
+        - ticks (Dict[str, Tuple[int, int]]): sell and buy prices in ticks by symbol.
+        - timestamp (int): The time of the prices, in milliseconds since the epoch.
+
+        Returns:
+        - None.
+        """
+        written = []
+        for symbol, (sell, buy) in ticks.items():
+            files, last_time = self._files(symbol)
+            time = max(timestamp, last_time)
+            time_file, sell_file, buy_file = files
+            sell_file.write(ITEM.pack(sell))
+            buy_file.write(ITEM.pack(buy))
+            time_file.write(ITEM.pack(time))
+            self._open[symbol] = (files, time)
+            written.append(files)
+        for files in written:
+            for file in reversed(files):
+                file.flush()
+
+    def read(
+        self, symbol: str, start: Optional[int] = None, end: Optional[int] = None
+    ) -> TickColumns:
+        """
+        Map the ticks of a symbol from start (inclusive) to end (exclusive).
+        Only the two binary searches of the time column touch the data.
+
+        Args:
+        - symbol (str): The symbol.
+        - start (Optional[int]): The first time, in milliseconds since the epoch.
+        - end (Optional[int]): The time after the last one, in milliseconds since the epoch.
+
+        Returns:
+        - TickColumns: The columns of the ticks, empty if the symbol has none.
+        """
+        paths = [self.path(symbol, column) for column in COLUMNS]
+        sizes = [os.path.getsize(path) if os.path.exists(path) else 0 for path in paths]
+        rows = min(sizes) // ITEM.size
+        columns = [self._map(path, rows) for path in paths]
+
+        search = self._search if numpy is not None else bisect.bisect_left
+        first = 0 if start is None else search(columns[0], start)
+        last = rows if end is None else search(columns[0], end)
+        return TickColumns(*(column[first:last] for column in columns))
+
+    def close(self) -> None:
+        """Close files kept open for appending."""
+        while self._open:
+            self._close_oldest()
+
+    def _files(self, symbol: str) -> Tuple[tuple, int]:
+        if symbol in self._open:
+            self._open.move_to_end(symbol)
+            return self._open[symbol]
+
+        os.makedirs(os.path.join(self.root, symbol), exist_ok=True)
+        paths = [self.path(symbol, column) for column in COLUMNS]
+        rows = min(os.path.getsize(p) if os.path.exists(p) else 0 for p in paths) // ITEM.size
+        last_time = 0
+        files = []
+        for path in paths:
+            file = open(path, "ab")
+            # drop the rest of a row torn by a crash
+            file.truncate(rows * ITEM.size)
+            files.append(file)
+        if rows:
+            with open(paths[0], "rb") as time_file:
+                time_file.seek((rows - 1) * ITEM.size)
+                (last_time,) = ITEM.unpack(time_file.read(ITEM.size))
+
+        self._open[symbol] = (tuple(files), last_time)
+        if len(self._open) > self.max_open_symbols:
+            self._close_oldest()
+        return self._open[symbol]
+
+    def _close_oldest(self) -> None:
+        _, (files, _) = self._open.popitem(last=False)
+        for file in files:
+            file.close()
+
+    @staticmethod
+    def _search(time, value: int) -> int:
+        return int(time.searchsorted(value))
+
+    @staticmethod
+    def _map(path: str, rows: int):
+        if numpy is not None:
+            if not rows:
+                return numpy.empty(0, dtype="<i8")
+            return numpy.memmap(path, dtype="<i8", mode="r", shape=(rows,))
+        if not rows:
+            return memoryview(b"").cast("q")
+        if sys.byteorder != "little":
+            raise RuntimeError("Reading the tick archive without numpy needs a little endian host.")
+        with open(path, "rb") as file:
+            mapped = mmap.mmap(file.fileno(), rows * ITEM.size, access=mmap.ACCESS_READ)
+        return memoryview(mapped).cast("q")
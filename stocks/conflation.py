@@ -0,0 +1,113 @@
+import time
+from typing import Any, Callable, Collection, Dict, Iterable, Optional, Tuple, Union
+
+from kafka_service.serializers import PriceBatch, to_ticks
+
+
+class PriceConflator:
+    """
+    Buffer of price ticks that keeps only the latest tick of each symbol.
+
+    The buffer is ready to be written when window_ms passed since its first tick or when it
+    holds max_batch symbols, so a burst of ticks costs at most one write per symbol per window.
+    Counters of received, conflated (replaced before being written) and written ticks are kept
+    for the lifetime of the conflator.
+    """
+
+    def __init__(
+        self, window_ms: int, max_batch: int, clock: Callable[[], float] = time.monotonic
+    ) -> None:
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self.clock = clock
+        self.received = 0
+        self.conflated = 0
+        self.written = 0
+        self._pending: Dict[Union[str, int], Tuple[int, int]] = {}
+        # partition of the latest tick of each symbol, for ticks added with one
+        self._partitions: Dict[Union[str, int], Any] = {}
+        self._window_start: Optional[float] = None
+
+    def add(self, stocks_prices: Iterable[Dict], partition: Any = None) -> None:
+        """
+        Add ticks of a JSON or msgpack message in the order they were received.
+
+        Args:
+        - stocks_prices (Iterable[Dict]): symbol, sell_price and buy_price of stocks.
+        - partition (Any): The partition of the message, if any.
+        """
+        # parsed as a whole first, so a malformed message adds no ticks
+        ticks = [
+            (
+                stock_prices["symbol"],
+                (to_ticks(stock_prices["sell_price"]), to_ticks(stock_prices["buy_price"])),
+            )
+            for stock_prices in stocks_prices
+        ]
+        self._add(ticks, partition)
+
+    def add_batch(self, batch: PriceBatch, partition: Any = None) -> None:
+        """
+        Add ticks of a binary price batch, keyed by symbol dictionary ids.
+
+        Args:
+        - batch (PriceBatch): The decoded batch.
+        - partition (Any): The partition of the message, if any.
+        """
+        self._add(zip(batch.symbol_ids, zip(batch.sell_ticks, batch.buy_ticks)), partition)
+
+    def _add(
+        self, ticks: Iterable[Tuple[Union[str, int], Tuple[int, int]]], partition: Any
+    ) -> None:
+        for key, prices in ticks:
+            if key in self._pending:
+                self.conflated += 1
+            self._pending[key] = prices
+            if partition is not None:
+                self._partitions[key] = partition
+            self.received += 1
+        if self._pending and self._window_start is None:
+            self._window_start = self.clock()
+
+    def is_ready(self) -> bool:
+        """Return True if the buffered ticks should be written now."""
+        if not self._pending:
+            return False
+        return len(self._pending) >= self.max_batch or self.time_left() == 0
+
+    def time_left(self) -> float:
+        """Return seconds left until the current window closes; the window if it isn't open."""
+        if self._window_start is None:
+            return self.window
+        return max(0.0, self._window_start + self.window - self.clock())
+
+    def drain(self, skip_partitions: Collection = ()) -> Dict[Union[str, int], Tuple[int, int]]:
+        """
+        Take the latest tick of each buffered symbol and start a new window.
+
+        Args:
+        - skip_partitions (Collection): Partitions whose ticks are dropped instead.
+
+        Returns:
+        - Dict[Union[str, int], Tuple[int, int]]: sell and buy prices in ticks by symbol
+        or by symbol dictionary id.
+        """
+        prices, partitions = self._pending, self._partitions
+        if skip_partitions:
+            prices = {
+                key: tick
+                for key, tick in prices.items()
+                if partitions.get(key) not in skip_partitions
+            }
+        self.written += len(prices)
+        self.clear()
+        return prices
+
+    def clear(self) -> None:
+        """Drop buffered ticks, e.g. when they will be received again."""
+        self._pending = {}
+        self._partitions = {}
+        self._window_start = None
+
+    def stats(self) -> Dict[str, int]:
+        return {"received": self.received, "conflated": self.conflated, "written": self.written}
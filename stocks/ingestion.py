@@ -0,0 +1,184 @@
+import logging
+import time
+from typing import Callable, Dict, Iterable, Optional
+
+from django.conf import settings
+from django.db import transaction
+
+from base.container import container
+from kafka_service.kafka_service import KafkaService
+from kafka_service.serializers import PriceBatch
+from kafka_service.services import ConsumerOffsetService
+from stocks.archive import TickArchive
+from stocks.conflation import PriceConflator
+from stocks.services import StockService
+from stocks.symbol_map import symbol_map
+
+logger = logging.getLogger(__name__)
+
+
+class PriceIngestor:
+    """
+    Consume stock prices of the partitions assigned to this consumer and save them.
+
+    Ticks are conflated per window and saved in one transaction together with the offsets
+    of the messages they came from, so a crash never loses saved offsets or replays saved
+    ticks: on assignment the consumer seeks to the stored offsets. Offsets are also committed
+    to Kafka afterwards, for lag monitoring only. Price messages are keyed by symbol, so
+    a stock belongs to one partition; buffered ticks are saved before partitions are revoked,
+    so two consumers of the group never write the same stock.
+    Saved ticks are also appended to the tick archive, if one is given.
+    """
+
+    # pause before a failed batch is polled again, in seconds
+    RETRY_DELAY = 1
+
+    def __init__(
+        self,
+        stock_service: StockService,
+        window_ms: int,
+        max_batch: int,
+        max_records: int,
+        poll_timeout_ms: int,
+        consumer_factory: Optional[Callable] = None,
+        group_id: str = KafkaService.STOCK_PRICES_GROUP,
+        archive: Optional[TickArchive] = None,
+    ) -> None:
+        self.stock_service = stock_service
+        self.offset_service = container.get(ConsumerOffsetService)
+        self.group_id = group_id
+        self.archive = archive
+        self.conflator = PriceConflator(window_ms=window_ms, max_batch=max_batch)
+        self.max_records = max_records
+        self.poll_timeout_ms = poll_timeout_ms
+        self.consumer_factory = consumer_factory or KafkaService.create_stock_prices_consumer
+        self.consumer = None
+        # first offset not yet committed of every partition with buffered ticks
+        self.uncommitted: Dict = {}
+        # offset after the last buffered message of every partition with buffered ticks
+        self.positions: Dict = {}
+        # malformed messages passed over
+        self.skipped = 0
+        self.running = False
+
+    def run(self) -> None:
+        """Consume until stop() is called, then save buffered ticks and close the consumer."""
+        self.running = True
+        self.consumer = self.consumer_factory(
+            group_id=self.group_id,
+            on_revoked=self.on_partitions_revoked,
+            on_assigned=self.on_partitions_assigned,
+        )
+        stats_logged_at = time.monotonic()
+        logger.info("ingest_prices: started")
+        try:
+            while self.running:
+                timeout_ms = min(self.poll_timeout_ms, int(self.conflator.time_left() * 1000))
+                records = self.consumer.poll(timeout_ms=timeout_ms, max_records=self.max_records)
+                for partition, messages in records.items():
+                    self.uncommitted.setdefault(partition, messages[0].offset)
+                    self.positions[partition] = messages[-1].offset + 1
+                    for message in messages:
+                        self.add(message, partition)
+                if self.conflator.is_ready():
+                    self.write()
+
+                if time.monotonic() - stats_logged_at >= settings.STOCK_PRICES_STATS_INTERVAL:
+                    logger.info(
+                        f"ingest_prices: ticks {self.conflator.stats()}, "
+                        f"skipped messages {self.skipped}"
+                    )
+                    stats_logged_at = time.monotonic()
+            # ticks of the last window
+            if self.uncommitted:
+                self.write()
+        finally:
+            self.consumer.close()
+            if self.archive is not None:
+                self.archive.close()
+            logger.info(f"ingest_prices: stopped, ticks {self.conflator.stats()}")
+
+    def add(self, message, partition=None) -> None:
+        """Buffer the ticks of a message; a malformed message is logged and skipped."""
+        if message.value is None:
+            # the deserializer logged why the message couldn't be decoded
+            self.skipped += 1
+            return
+        try:
+            if isinstance(message.value, PriceBatch):
+                self.conflator.add_batch(message.value, partition)
+            else:
+                self.conflator.add(message.value["stocks"], partition)
+        except (KeyError, TypeError, ValueError, ArithmeticError) as e:
+            self.skipped += 1
+            logger.error(
+                f"ingest_prices: skipped malformed message at {message.topic}:"
+                f"{message.partition}:{message.offset}: {e!r} {message.value!r:.200}"
+            )
+
+    def stop(self, signum=None, frame=None) -> None:
+        """Finish the current batch and exit; usable as a signal handler."""
+        self.running = False
+
+    def on_partitions_revoked(self, partitions: Iterable) -> None:
+        """Save ticks of partitions that move to another consumer of the group."""
+        if self.uncommitted:
+            self.write()
+
+    def on_partitions_assigned(self, partitions: Iterable) -> None:
+        """Continue partitions from the offsets saved with the prices."""
+        self.offset_service.seek_stored(self.consumer, self.group_id, partitions)
+
+    def write(self) -> None:
+        """
+        Save the latest buffered prices and offsets of the messages they came from.
+        Prices of partitions another consumer of the group already saved past, e.g. after
+        this one was dropped from the group during a slow write, are older than the saved
+        ones and are dropped; stored offsets never move back.
+        """
+        try:
+            with transaction.atomic():
+                saved_past = self.offset_service.lock_saved_past(self.group_id, self.positions)
+                if saved_past:
+                    logger.warning(
+                        f"ingest_prices: dropped prices of {sorted(saved_past)}, "
+                        f"already saved by another consumer"
+                    )
+                prices = self.conflator.drain(skip_partitions=saved_past)
+                self.stock_service.ingest_prices(prices)
+                self.offset_service.store(self.group_id, self.positions)
+        except Exception as e:
+            logger.error(f"ingest_prices: failed to save prices, retrying: {e}")
+            # poll the messages of the window again
+            self.conflator.clear()
+            for partition, offset in self.uncommitted.items():
+                self.consumer.seek(partition, offset)
+            self.uncommitted.clear()
+            self.positions.clear()
+            time.sleep(self.RETRY_DELAY)
+            return
+        self.uncommitted.clear()
+        self.positions.clear()
+        if self.archive is not None:
+            self.write_archive(prices)
+        try:
+            self.consumer.commit()
+        except Exception as e:
+            # the offsets saved with the prices are the ones consumers seek to
+            logger.warning(f"ingest_prices: failed to commit offsets to kafka: {e}")
+
+    def write_archive(self, prices: Dict) -> None:
+        """
+        Append saved prices to the tick archive. Prices are saved first, so ticks of a crash
+        between the two are missing from the archive rather than archived twice.
+        """
+        # only stocks the prices were saved for: symbols come from the feed
+        symbols = [key for key in prices if isinstance(key, str)]
+        ticks = {symbol: prices[symbol] for symbol in symbol_map.get_ids(symbols)}
+        ids = [key for key in prices if isinstance(key, int)]
+        for stock_id, symbol in symbol_map.get_symbols(ids).items():
+            ticks[symbol] = prices[stock_id]
+        try:
+            self.archive.append(ticks, timestamp=int(time.time() * 1000))
+        except (OSError, ValueError) as e:
+            logger.error(f"ingest_prices: failed to archive ticks: {e}")
@@ -0,0 +1,105 @@
+import random
+import threading
+import time
+import uuid
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from base.container import container
+from kafka_service.kafka_service import KafkaService, reset_producer
+from kafka_service.models import ConsumerOffset
+from kafka_service.transports import InMemoryTransport, set_transport
+from orders.signals import check_orders_on_stock_prices_changed
+from stocks.ingestion import PriceIngestor
+from stocks.models import Stock
+from stocks.services import StockService
+from stocks.signals import stock_prices_changed
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure price ingestion throughput with N consumers of one group, publishing and "
+        "consuming through the in-memory Kafka transport. "
+        "Prices of existing stocks are overwritten with random ticks."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--ticks", type=int, default=100000)
+        parser.add_argument("--partitions", type=int, default=8)
+        parser.add_argument("--consumers", type=int, default=4)
+        parser.add_argument("--window-ms", type=int, default=100)
+        parser.add_argument("--max-batch", type=int, default=5000)
+        parser.add_argument("--max-records", type=int, default=500)
+        parser.add_argument(
+            "--with-order-checks",
+            action="store_true",
+            help="Enqueue checks of open orders for changed stocks, as ingestion does.",
+        )
+
+    def handle(self, *args, **options):
+        symbols = list(Stock.objects.values_list("symbol", flat=True))
+        if not symbols:
+            raise CommandError("Create stocks to benchmark ingestion of their prices.")
+        if not options["with_order_checks"]:
+            stock_prices_changed.disconnect(check_orders_on_stock_prices_changed)
+
+        transport = InMemoryTransport(partitions=options["partitions"])
+        set_transport(transport)
+        reset_producer()
+        kafka_service = KafkaService()
+        prices = {symbol: random.uniform(10, 1000) for symbol in symbols}
+        for _ in range(options["ticks"]):
+            symbol = random.choice(symbols)
+            prices[symbol] *= random.uniform(0.99, 1.01)
+            kafka_service.send_stock_prices(
+                [{"symbol": symbol, "sell_price": prices[symbol], "buy_price": prices[symbol]}]
+            )
+
+        # offsets stored by earlier runs point into logs of other in-memory brokers
+        group_id = f"benchmark-{uuid.uuid4()}"
+        ingestors = [
+            PriceIngestor(
+                container.get(StockService),
+                window_ms=options["window_ms"],
+                max_batch=options["max_batch"],
+                max_records=options["max_records"],
+                poll_timeout_ms=100,
+                group_id=group_id,
+            )
+            for _ in range(options["consumers"])
+        ]
+        threads = [threading.Thread(target=self.run, args=(ingestor,)) for ingestor in ingestors]
+        started_at = time.monotonic()
+        for thread in threads:
+            thread.start()
+
+        broker = transport.broker
+        end_offsets = broker.end_offsets(KafkaService.KAFKA_TOPIC_STOCK_PRICES)
+        while any(
+            broker.committed(group_id, partition) < offset
+            for partition, offset in end_offsets.items()
+        ):
+            time.sleep(0.01)
+        elapsed = time.monotonic() - started_at
+        for ingestor in ingestors:
+            ingestor.stop()
+        for thread in threads:
+            thread.join()
+        ConsumerOffset.objects.filter(group_id=group_id).delete()
+
+        written = sum(ingestor.conflator.written for ingestor in ingestors)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{options['ticks']} ticks of {len(symbols)} stocks ingested by "
+                f"{options['consumers']} consumers in {elapsed:.2f}s: "
+                f"{options['ticks'] / elapsed:.0f} ticks/s, {written} stock rows written."
+            )
+        )
+
+    def run(self, ingestor: PriceIngestor) -> None:
+        try:
+            ingestor.run()
+        finally:
+            # every thread has its own database connection
+            connection.close()
@@ -0,0 +1,124 @@
+import logging
+import multiprocessing
+import multiprocessing.connection
+import signal
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from base.container import container
+from stocks.archive import TickArchive
+from stocks.ingestion import PriceIngestor
+from stocks.services import StockService
+
+logger = logging.getLogger(__name__)
+
+
+def run_ingestor(options) -> None:
+    archive = None
+    if settings.STOCK_TICK_ARCHIVE_DIR:
+        archive = TickArchive(settings.STOCK_TICK_ARCHIVE_DIR)
+    ingestor = PriceIngestor(
+        container.get(StockService),
+        window_ms=options["window_ms"],
+        max_batch=options["max_batch"],
+        max_records=options["max_records"],
+        poll_timeout_ms=options["poll_timeout_ms"],
+        archive=archive,
+    )
+    signal.signal(signal.SIGTERM, ingestor.stop)
+    signal.signal(signal.SIGINT, ingestor.stop)
+    ingestor.run()
+
+
+class Command(BaseCommand):
+    help = (
+        "Keep Kafka consumers open and save stock prices as they arrive, conflated to "
+        "the latest tick of each symbol per window. "
+        "Offsets are committed after the prices are committed to the database. "
+        "With --processes N, N consumers of one group share the partitions of the topic; "
+        "a consumer process that dies is restarted."
+    )
+
+    # pause before a consumer process that died is started again, in seconds
+    RESTART_DELAY = 1
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--processes",
+            type=int,
+            default=settings.STOCK_PRICES_INGEST_PROCESSES,
+            help="The number of consumer processes; more than partitions leaves some idle.",
+        )
+        parser.add_argument(
+            "--max-records",
+            type=int,
+            default=settings.STOCK_PRICES_MAX_RECORDS,
+            help="The maximum number of Kafka messages returned by one poll.",
+        )
+        parser.add_argument(
+            "--window-ms",
+            type=int,
+            default=settings.STOCK_PRICES_CONFLATION_WINDOW_MS,
+            help="How long ticks are buffered; only the latest tick of a symbol is saved.",
+        )
+        parser.add_argument(
+            "--max-batch",
+            type=int,
+            default=settings.STOCK_PRICES_CONFLATION_MAX_BATCH,
+            help="The number of buffered symbols that are saved without waiting for the window.",
+        )
+        parser.add_argument(
+            "--poll-timeout-ms",
+            type=int,
+            default=settings.STOCK_PRICES_POLL_TIMEOUT_MS,
+            help="How long one poll waits for messages.",
+        )
+
+    def handle(self, *args, **options):
+        if options["processes"] <= 1:
+            run_ingestor(options)
+            return
+
+        # children open their own connections
+        connections.close_all()
+        context = multiprocessing.get_context("fork")
+
+        def start(index: int):
+            process = context.Process(
+                target=run_ingestor, args=(options,), name=f"ingest_prices-{index}"
+            )
+            process.start()
+            return process
+
+        processes = {index: start(index) for index in range(options["processes"])}
+        stopping = False
+
+        def stop(signum, frame):
+            nonlocal stopping
+            stopping = True
+            for process in processes.values():
+                process.terminate()
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+        # a child that dies is started again: its partitions move to the other consumers
+        # of the group meanwhile and are rebalanced when it joins again
+        while not stopping:
+            multiprocessing.connection.wait([process.sentinel for process in processes.values()])
+            for index, process in list(processes.items()):
+                if process.is_alive() or stopping:
+                    continue
+                process.join()
+                logger.error(f"{process.name} exited with code {process.exitcode}, restarting")
+                time.sleep(self.RESTART_DELAY)
+                if not stopping:
+                    processes[index] = start(index)
+
+        for process in processes.values():
+            if process.is_alive():
+                # started while stopping
+                process.terminate()
+            process.join()
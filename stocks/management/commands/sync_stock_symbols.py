@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from base.container import container
+from stocks.services import StockService
+
+
+class Command(BaseCommand):
+    help = "Publish stock symbols added or removed since the last published version to Kafka."
+
+    def handle(self, *args, **options):
+        message = container.get(StockService).sync_symbols()
+        if message is None:
+            self.stdout.write(self.style.SUCCESS("Stock symbols are up to date."))
+            return
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Stock symbols version {message['version']} published: "
+                f"{len(message['added'])} added, {len(message['removed'])} removed."
+            )
+        )
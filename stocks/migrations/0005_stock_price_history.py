@@ -0,0 +1,89 @@
+# Generated by Django 4.2.5 on 2026-10-18 03:59
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("stocks", "0004_stock_symbol_sync"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StockTick",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True, primary_key=True, serialize=False, verbose_name="ID"
+                    ),
+                ),
+                ("time", models.DateTimeField()),
+                ("price_per_unit_sail", models.DecimalField(decimal_places=2, max_digits=10)),
+                ("price_per_unit_buy", models.DecimalField(decimal_places=2, max_digits=10)),
+                (
+                    "stock",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="ticks",
+                        to="stocks.stock",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(fields=["stock", "time"], name="stock_tick_stock_time_idx"),
+                    models.Index(fields=["time"], name="stock_tick_time_idx"),
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name="StockCandle",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True, primary_key=True, serialize=False, verbose_name="ID"
+                    ),
+                ),
+                (
+                    "interval",
+                    models.CharField(
+                        choices=[
+                            ("1m", "1 minute"),
+                            ("5m", "5 minutes"),
+                            ("1h", "1 hour"),
+                            ("1d", "1 day"),
+                        ],
+                        max_length=2,
+                    ),
+                ),
+                ("start", models.DateTimeField()),
+                ("open", models.DecimalField(decimal_places=2, max_digits=10)),
+                ("high", models.DecimalField(decimal_places=2, max_digits=10)),
+                ("low", models.DecimalField(decimal_places=2, max_digits=10)),
+                ("close", models.DecimalField(decimal_places=2, max_digits=10)),
+                ("ticks", models.PositiveIntegerField(default=0)),
+                (
+                    "stock",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="candles",
+                        to="stocks.stock",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(fields=["interval", "start"], name="stock_candle_interval_idx")
+                ],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="stockcandle",
+            constraint=models.UniqueConstraint(
+                fields=("stock", "interval", "start"), name="unique_stock_candle"
+            ),
+        ),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 4.2.5 on 2026-10-18 04:12
+
+from django.db import migrations, models
+
+
+def create_price_sequence(apps, schema_editor):
+    # the counter row serves databases other than PostgreSQL, which use the sequence
+    apps.get_model("stocks", "StockPriceSequence").objects.create(id=1)
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute("CREATE SEQUENCE stocks_price_seq")
+
+
+def drop_price_sequence(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute("DROP SEQUENCE stocks_price_seq")
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("stocks", "0005_stock_price_history"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StockPriceSequence",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True, primary_key=True, serialize=False, verbose_name="ID"
+                    ),
+                ),
+                ("value", models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name="stock",
+            name="price_seq",
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="stock",
+            name="price_change_id",
+            field=models.BigIntegerField(db_index=True, default=0),
+        ),
+        migrations.CreateModel(
+            name="DeletedStock",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True, primary_key=True, serialize=False, verbose_name="ID"
+                    ),
+                ),
+                ("stock_id", models.BigIntegerField()),
+                ("price_change_id", models.BigIntegerField(db_index=True)),
+            ],
+        ),
+        migrations.RunPython(create_price_sequence, drop_price_sequence),
+    ]
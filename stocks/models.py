@@ -11,12 +11,97 @@ def upload_to(instance, filename: str) -> str:
 
 
 class Stock(models.Model):
+    PRICE_FIELDS = ("price_per_unit_sail", "price_per_unit_buy")
+
     image = models.ImageField(storage=S3Boto3Storage(), upload_to=upload_to, null=True, blank=True)
     name = models.CharField(max_length=255)
     symbol = models.CharField(max_length=10, unique=True)
     price_per_unit_sail = models.DecimalField(max_digits=10, decimal_places=2)
     price_per_unit_buy = models.DecimalField(max_digits=10, decimal_places=2)
     available_quantity = models.PositiveIntegerField()
+    # price sequence value of the last change of prices, larger for each later change
+    price_seq = models.BigIntegerField(default=0)
+    # ID of the transaction of the last change of prices: see StockPriceSequenceRepository
+    price_change_id = models.BigIntegerField(default=0, db_index=True)
 
     def __str__(self):
         return f"{self.name}"
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        stock = super().from_db(db, field_names, values)
+        # prices as loaded, to tell whether a save changed them; None if deferred
+        stock._loaded_prices = tuple(stock.__dict__.get(field) for field in cls.PRICE_FIELDS)
+        return stock
+
+
+class StockSymbolSync(models.Model):
+    """
+    The set of stock symbols last published to Kafka and its version.
+    A single row; each sync publishes only the difference to the current symbols.
+    """
+
+    version = models.PositiveIntegerField(default=0)
+    symbols = models.JSONField(default=list)
+    updated_at = models.DateTimeField(auto_now=True)
+
+
+class StockPriceSequence(models.Model):
+    """
+    Counter of price changes on databases other than PostgreSQL; a single row, created by
+    the migration. PostgreSQL uses the stocks_price_seq sequence instead: see
+    StockPriceSequenceRepository.
+    """
+
+    value = models.BigIntegerField(default=0)
+
+
+class DeletedStock(models.Model):
+    """
+    Tombstone of a deleted stock, with the ID of the deleting transaction like a price
+    change, so clients of the delta prices endpoint learn about deletions.
+    """
+
+    stock_id = models.BigIntegerField()
+    price_change_id = models.BigIntegerField(db_index=True)
+
+
+class StockTick(models.Model):
+    """Prices of a stock saved by price ingestion, one row per changed stock per batch."""
+
+    stock = models.ForeignKey(Stock, on_delete=models.CASCADE, related_name="ticks")
+    time = models.DateTimeField()
+    price_per_unit_sail = models.DecimalField(max_digits=10, decimal_places=2)
+    price_per_unit_buy = models.DecimalField(max_digits=10, decimal_places=2)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["stock", "time"], name="stock_tick_stock_time_idx"),
+            models.Index(fields=["time"], name="stock_tick_time_idx"),
+        ]
+
+
+class StockCandle(models.Model):
+    """
+    OHLC of the sail price of a stock over an interval starting at start,
+    updated as ticks of the interval are saved.
+    """
+
+    INTERVAL_CHOICES = [("1m", "1 minute"), ("5m", "5 minutes"), ("1h", "1 hour"), ("1d", "1 day")]
+
+    stock = models.ForeignKey(Stock, on_delete=models.CASCADE, related_name="candles")
+    interval = models.CharField(max_length=2, choices=INTERVAL_CHOICES)
+    start = models.DateTimeField()
+    open = models.DecimalField(max_digits=10, decimal_places=2)
+    high = models.DecimalField(max_digits=10, decimal_places=2)
+    low = models.DecimalField(max_digits=10, decimal_places=2)
+    close = models.DecimalField(max_digits=10, decimal_places=2)
+    ticks = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["stock", "interval", "start"], name="unique_stock_candle"
+            )
+        ]
+        indexes = [models.Index(fields=["interval", "start"], name="stock_candle_interval_idx")]
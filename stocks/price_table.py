@@ -0,0 +1,146 @@
+import mmap
+import os
+import struct
+import threading
+from decimal import Decimal
+from typing import Dict, Optional, Tuple
+
+from django.conf import settings
+
+from kafka_service.serializers import from_ticks, to_ticks
+
+# magic, version and capacity in slots
+HEADER = struct.Struct("<2sBxI")
+MAGIC = b"PT"
+VERSION = 2
+# write sequence, sell and buy ticks and price sequence value of a stock, 32 bytes
+SLOT = struct.Struct("<Qqqq")
+SEQUENCE = struct.Struct("<Q")
+PRICES = struct.Struct("<qqq")
+
+
+class PriceTable:
+    """
+    Latest prices of stocks in a memory-mapped file shared by all processes of a host,
+    one fixed-size slot per stock, indexed by stock id.
+
+    Each slot is guarded by a sequence lock: the writer makes the sequence odd, writes the
+    prices and makes it even again; readers retry while the sequence is odd or changed
+    under them, so they never see a sell price of one update and a buy price of another.
+    A slot has a single writer at a time, the consumer that owns the stock's partition:
+    prices saved in other ways aren't written to the table, whose readers fall back to the
+    stock row when it holds a later price_seq than the slot.
+
+    Slots also keep the price_seq of the change they hold, so readers can tell whether
+    a slot is older than a stock row they loaded. The table of a host only sees prices
+    saved by processes of that host and is a cache for display: prices that move money
+    are read from locked stock rows.
+    """
+
+    # reads of a slot being written before giving up and reading the database instead
+    MAX_READ_ATTEMPTS = 100
+
+    def __init__(self, path: str, capacity: int) -> None:
+        self.path = path
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            size = HEADER.size + capacity * SLOT.size
+            if os.fstat(fd).st_size < size:
+                # new slots read as zero: never written
+                os.ftruncate(fd, size)
+            self._map = mmap.mmap(fd, os.fstat(fd).st_size)
+        finally:
+            os.close(fd)
+        magic, version, _ = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            HEADER.pack_into(self._map, 0, MAGIC, VERSION, capacity)
+        elif version != VERSION:
+            raise ValueError(
+                f"Price table {path} has version {version}, expected {VERSION}; remove the file."
+            )
+        self.capacity = (len(self._map) - HEADER.size) // SLOT.size
+
+    def publish(self, prices: Dict[int, Tuple[Decimal, Decimal]], price_seq: int) -> None:
+        """
+        Write prices of stocks; stocks with ids beyond the capacity are left out, and so are
+        stocks whose slot already holds a later change.
+
+        Args:
+        - prices (Dict[int, Tuple[Decimal, Decimal]]): price_per_unit_sail and
+        price_per_unit_buy by stock ID.
+        - price_seq (int): The price sequence value of the change.
+
+        Returns:
+        - None.
+        """
+        for stock_id, (sail, buy) in prices.items():
+            offset = self._offset(stock_id)
+            if offset is None:
+                continue
+            sequence, _, _, slot_price_seq = SLOT.unpack_from(self._map, offset)
+            if sequence and slot_price_seq > price_seq:
+                continue
+            # odd: a writer died in the middle of this slot
+            writing = sequence if sequence & 1 else sequence + 1
+            SEQUENCE.pack_into(self._map, offset, writing)
+            PRICES.pack_into(
+                self._map, offset + SEQUENCE.size, to_ticks(sail), to_ticks(buy), price_seq
+            )
+            SEQUENCE.pack_into(self._map, offset, writing + 1)
+
+    def get(self, stock_id: int, min_price_seq: int = 0) -> Optional[Tuple[Decimal, Decimal]]:
+        """
+        Read the latest prices of a stock.
+
+        Args:
+        - stock_id (int): The ID of the stock.
+        - min_price_seq (int): The price_seq of the stock row known to the caller; a slot
+        holding an older change isn't read.
+
+        Returns:
+        - Optional[Tuple[Decimal, Decimal]]: price_per_unit_sail and price_per_unit_buy,
+        or None if they were never published, are older than min_price_seq or are being
+        written for too long.
+        """
+        offset = self._offset(stock_id)
+        if offset is None:
+            return None
+        for _ in range(self.MAX_READ_ATTEMPTS):
+            (sequence,) = SEQUENCE.unpack_from(self._map, offset)
+            if sequence == 0:
+                return None
+            if sequence & 1:
+                continue
+            sail, buy, price_seq = PRICES.unpack_from(self._map, offset + SEQUENCE.size)
+            if SEQUENCE.unpack_from(self._map, offset)[0] == sequence:
+                if price_seq < min_price_seq:
+                    return None
+                return from_ticks(sail), from_ticks(buy)
+        return None
+
+    def close(self) -> None:
+        self._map.close()
+
+    def _offset(self, stock_id: int) -> Optional[int]:
+        if not 0 < stock_id < self.capacity:
+            return None
+        return HEADER.size + stock_id * SLOT.size
+
+
+_tables: Dict[str, PriceTable] = {}
+_tables_lock = threading.Lock()
+
+
+def get_price_table() -> Optional[PriceTable]:
+    """Return the price table of the host, or None if STOCK_PRICE_TABLE_PATH isn't set."""
+    path = settings.STOCK_PRICE_TABLE_PATH
+    if not path:
+        return None
+    table = _tables.get(path)
+    if table is None:
+        with _tables_lock:
+            table = _tables.get(path)
+            if table is None:
+                table = PriceTable(path, settings.STOCK_PRICE_TABLE_CAPACITY)
+                _tables[path] = table
+    return table
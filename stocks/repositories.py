@@ -1,10 +1,14 @@
+from datetime import datetime
 from decimal import Decimal
-from typing import Type
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple, Type
 
-from django.db.models import QuerySet
+from django.db import connection
+from django.db.models import F, Q, QuerySet
 
+from base import identity_map
 from base.repositories import BaseRepository
-from stocks.models import Stock
+from stocks.models import (DeletedStock, Stock, StockCandle, StockPriceSequence, StockSymbolSync,
+                           StockTick)
 from user_management.models import CustomUser as User
 
 
@@ -79,6 +83,42 @@ class StockRepository(BaseRepository):
         stock.available_quantity = new_value
         stock.save()
 
+    def credit_available_quantity(self, stock: Stock, quantity: int) -> bool:
+        """
+        Increase the available_quantity in one UPDATE statement.
+
+        Args:
+        - stock (Stock): The stock object.
+        - quantity (int): The quantity to add.
+
+        Returns:
+        - bool: True if the stock was updated.
+        """
+        updated = self.model.objects.filter(id=stock.id).update(
+            available_quantity=F("available_quantity") + quantity
+        )
+        if updated:
+            self.sync_loaded(stock.id, "available_quantity", quantity, obj=stock)
+        return bool(updated)
+
+    def debit_available_quantity(self, stock: Stock, quantity: int) -> bool:
+        """
+        Decrease the available_quantity if it is enough, in one conditional UPDATE statement.
+
+        Args:
+        - stock (Stock): The stock object.
+        - quantity (int): The quantity to subtract.
+
+        Returns:
+        - bool: True if the available_quantity was enough and was updated.
+        """
+        updated = self.model.objects.filter(id=stock.id, available_quantity__gte=quantity).update(
+            available_quantity=F("available_quantity") - quantity
+        )
+        if updated:
+            self.sync_loaded(stock.id, "available_quantity", -quantity, obj=stock)
+        return bool(updated)
+
     def find_by_symbol(self, symbol: str) -> Stock:
         """
         Find a stock by its symbol.
@@ -94,3 +134,319 @@ class StockRepository(BaseRepository):
             return stock
         except Stock.DoesNotExist:
             return None
+
+    def get_prices(
+        self, stock_ids: Iterable[int], for_update: bool = False
+    ) -> Dict[int, Tuple[Decimal, Decimal]]:
+        """
+        Get current prices of stocks.
+
+        Args:
+        - stock_ids (Iterable[int]): The IDs of the stocks.
+        - for_update (bool): Lock the stocks until the end of the transaction.
+
+        Returns:
+        - Dict[int, Tuple[Decimal, Decimal]]: price_per_unit_sail and price_per_unit_buy
+        by stock ID.
+        """
+        stocks = self.model.objects.filter(id__in=list(stock_ids))
+        if for_update:
+            # in id order, so transactions locking the same stocks don't deadlock
+            stocks = stocks.select_for_update().order_by("id")
+        prices = stocks.values_list("id", "price_per_unit_sail", "price_per_unit_buy")
+        return {stock_id: (sail, buy) for stock_id, sail, buy in prices}
+
+    def get_symbols(self) -> List[str]:
+        """
+        Get symbols of all stocks.
+
+        Returns:
+        - List[str]: The symbols.
+        """
+        return list(self.model.objects.values_list("symbol", flat=True))
+
+    def get_symbol_ids(self, symbols: Optional[List[str]] = None) -> Dict[str, int]:
+        """
+        Get ids of stocks by symbol.
+
+        Args:
+        - symbols (Optional[List[str]]): The symbols, all stocks by default.
+
+        Returns:
+        - Dict[str, int]: Stock ID by symbol.
+        """
+        stocks = self.model.objects.all()
+        if symbols is not None:
+            stocks = stocks.filter(symbol__in=symbols)
+        return dict(stocks.values_list("symbol", "id"))
+
+    def bulk_update_prices(
+        self, prices: Dict[int, Tuple[Decimal, Decimal]], change: Optional["PriceChange"] = None
+    ) -> None:
+        """
+        Set new prices of stocks in one UPDATE statement.
+
+        Args:
+        - prices (Dict[int, Tuple[Decimal, Decimal]]): price_per_unit_sail and
+        price_per_unit_buy by stock ID.
+        - change (Optional[PriceChange]): The price sequence value and change ID, if any.
+
+        Returns:
+        - None.
+        """
+        fields = ["price_per_unit_sail", "price_per_unit_buy"]
+        numbers = change._asdict() if change is not None else {}
+        fields.extend(numbers)
+        stocks = [
+            self.model(id=stock_id, price_per_unit_sail=sail, price_per_unit_buy=buy, **numbers)
+            for stock_id, (sail, buy) in prices.items()
+        ]
+        self.model.objects.bulk_update(stocks, fields)
+        for stock_id, (sail, buy) in prices.items():
+            loaded = identity_map.get(self.model, stock_id)
+            if loaded is not None:
+                loaded.price_per_unit_sail = sail
+                loaded.price_per_unit_buy = buy
+                for field, value in numbers.items():
+                    setattr(loaded, field, value)
+
+    def get_prices_since(self, change_id: Optional[int]) -> QuerySet[Stock]:
+        """
+        Get prices of stocks changed by transactions from a change ID on.
+
+        Args:
+        - change_id (Optional[int]): The change ID, None for all stocks.
+
+        Returns:
+        - QuerySet[Stock]: Stocks with only id, symbol, prices and price_seq loaded,
+        in price_change_id order.
+        """
+        stocks = self.model.objects.only(
+            "id", "symbol", "price_per_unit_sail", "price_per_unit_buy", "price_seq"
+        )
+        if change_id is not None:
+            stocks = stocks.filter(price_change_id__gte=change_id)
+        return stocks.order_by("price_change_id", "id")
+
+
+class StockSymbolSyncRepository(BaseRepository):
+    def __init__(self, model: Type[StockSymbolSync]):
+        super().__init__(model=model)
+
+    def get_state_for_update(self) -> StockSymbolSync:
+        """
+        Lock the sync state, creating it on the first sync.
+
+        Returns:
+        - StockSymbolSync: The locked sync state.
+        """
+        state, _ = self.model.objects.select_for_update().get_or_create(id=1)
+        return state
+
+    def save_state(self, state: StockSymbolSync, version: int, symbols: List[str]) -> None:
+        """
+        Save the published symbols and their version.
+
+        Args:
+        - state (StockSymbolSync): The sync state.
+        - version (int): The new version.
+        - symbols (List[str]): The published symbols.
+
+        Returns:
+        - None.
+        """
+        state.version = version
+        state.symbols = symbols
+        state.save()
+
+
+class StockTickRepository(BaseRepository):
+    def __init__(self, model: Type[StockTick]):
+        super().__init__(model=model)
+
+    def bulk_create_ticks(self, prices: Dict[int, Tuple[Decimal, Decimal]], time: datetime) -> None:
+        """
+        Save prices of stocks at a time in one INSERT statement.
+
+        Args:
+        - prices (Dict[int, Tuple[Decimal, Decimal]]): price_per_unit_sail and
+        price_per_unit_buy by stock ID.
+        - time (datetime): The time of the prices.
+
+        Returns:
+        - None.
+        """
+        self.model.objects.bulk_create(
+            [
+                self.model(
+                    stock_id=stock_id,
+                    time=time,
+                    price_per_unit_sail=sail,
+                    price_per_unit_buy=buy,
+                )
+                for stock_id, (sail, buy) in prices.items()
+            ]
+        )
+
+    def delete_before(self, time: datetime) -> int:
+        """
+        Delete ticks older than a time.
+
+        Args:
+        - time (datetime): The oldest time to keep.
+
+        Returns:
+        - int: The number of deleted ticks.
+        """
+        deleted, _ = self.model.objects.filter(time__lt=time).delete()
+        return deleted
+
+
+class StockCandleRepository(BaseRepository):
+    def __init__(self, model: Type[StockCandle]):
+        super().__init__(model=model)
+
+    def get_current(
+        self, stock_ids: Iterable[int], starts: Dict[str, datetime]
+    ) -> Dict[Tuple[int, str], StockCandle]:
+        """
+        Get candles of stocks for intervals starting at given times, in one SELECT statement.
+
+        Args:
+        - stock_ids (Iterable[int]): The IDs of the stocks.
+        - starts (Dict[str, datetime]): Start of the candle by interval.
+
+        Returns:
+        - Dict[Tuple[int, str], StockCandle]: Candles by stock ID and interval.
+        """
+        periods = Q()
+        for interval, start in starts.items():
+            periods |= Q(interval=interval, start=start)
+        candles = self.model.objects.filter(periods, stock_id__in=list(stock_ids))
+        return {(candle.stock_id, candle.interval): candle for candle in candles}
+
+    def save_candles(self, new: List[StockCandle], changed: List[StockCandle]) -> None:
+        """
+        Insert new candles and update changed ones, one statement each.
+
+        Args:
+        - new (List[StockCandle]): Candles to insert.
+        - changed (List[StockCandle]): Candles to update.
+
+        Returns:
+        - None.
+        """
+        if new:
+            self.model.objects.bulk_create(new)
+        if changed:
+            self.model.objects.bulk_update(changed, ["high", "low", "close", "ticks"])
+
+    def get_latest(self, stock_id: int, interval: str, limit: int) -> List[StockCandle]:
+        """
+        Get the latest candles of a stock.
+
+        Args:
+        - stock_id (int): The ID of the stock.
+        - interval (str): The interval of the candles.
+        - limit (int): The maximum number of candles.
+
+        Returns:
+        - List[StockCandle]: The candles from the oldest to the latest.
+        """
+        candles = self.model.objects.filter(stock_id=stock_id, interval=interval)
+        return list(reversed(candles.order_by("-start")[:limit]))
+
+    def delete_before(self, interval: str, time: datetime) -> int:
+        """
+        Delete candles of an interval that started before a time.
+
+        Args:
+        - interval (str): The interval of the candles.
+        - time (datetime): The oldest start to keep.
+
+        Returns:
+        - int: The number of deleted candles.
+        """
+        deleted, _ = self.model.objects.filter(interval=interval, start__lt=time).delete()
+        return deleted
+
+
+class PriceChange(NamedTuple):
+    """Numbers of a change of prices, named after the Stock fields that keep them."""
+
+    price_seq: int
+    price_change_id: int
+
+
+class StockPriceSequenceRepository(BaseRepository):
+    """
+    Numbers of price changes: price_seq orders the changes of a stock, and price_change_id
+    identifies the transaction of a change for clients of the delta prices endpoint.
+
+    On PostgreSQL price_seq comes from the stocks_price_seq sequence and the change ID is
+    the transaction ID. Changed stocks are locked before taking a value, so later changes
+    of a stock get larger ones. Readers never wait for writers: all transactions with an
+    ID below the xmin of a snapshot have ended, so a client that saw the changes up to
+    that xmin has seen every change with a smaller ID.
+
+    Other databases lock the counter row until the writer commits, so values are committed
+    in order and serve as both numbers.
+    """
+
+    SEQUENCE = "stocks_price_seq"
+
+    def __init__(self, model: Type[StockPriceSequence]):
+        super().__init__(model=model)
+
+    def next_value(self) -> PriceChange:
+        """
+        Take the next price sequence value and the change ID of the current transaction.
+        Call it in the transaction of the change, after locking the changed rows.
+
+        Returns:
+        - PriceChange: The value and the change ID.
+        """
+        if connection.vendor == "postgresql":
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"SELECT nextval('{self.SEQUENCE}'), pg_current_xact_id()::text::bigint"
+                )
+                return PriceChange(*cursor.fetchone())
+        self.model.objects.filter(id=1).update(value=F("value") + 1)
+        value = self.model.objects.values_list("value", flat=True).get(id=1)
+        return PriceChange(value, value)
+
+    def get_watermark(self) -> int:
+        """
+        Get the first change ID whose transaction may not have ended: all changes with
+        smaller IDs are committed or rolled back. Doesn't lock anything.
+
+        Returns:
+        - int: The change ID.
+        """
+        if connection.vendor == "postgresql":
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT pg_snapshot_xmin(pg_current_snapshot())::text::bigint")
+                return cursor.fetchone()[0]
+        return self.model.objects.values_list("value", flat=True).get(id=1) + 1
+
+
+class DeletedStockRepository(BaseRepository):
+    def __init__(self, model: Type[DeletedStock]):
+        super().__init__(model=model)
+
+    def get_ids_since(self, change_id: int) -> List[int]:
+        """
+        Get IDs of stocks deleted by transactions from a change ID on.
+
+        Args:
+        - change_id (int): The change ID.
+
+        Returns:
+        - List[int]: The IDs of the stocks, in price_change_id order.
+        """
+        return list(
+            self.model.objects.filter(price_change_id__gte=change_id)
+            .order_by("price_change_id")
+            .values_list("stock_id", flat=True)
+        )
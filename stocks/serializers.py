@@ -1,9 +1,22 @@
 from rest_framework import serializers
 
-from .models import Stock
+from .models import Stock, StockCandle
 
 
 class StockSerializer(serializers.ModelSerializer):
     class Meta:
         model = Stock
         fields = "__all__"
+        read_only_fields = ("price_seq", "price_change_id")
+
+
+class StockPriceSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Stock
+        fields = ("id", "symbol", "price_per_unit_sail", "price_per_unit_buy", "price_seq")
+
+
+class StockCandleSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = StockCandle
+        fields = ("start", "open", "high", "low", "close", "ticks")
@@ -1,26 +1,54 @@
 import logging
-from typing import List, Literal
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from functools import partial
+from typing import Dict, Iterable, List, Literal, Optional, Tuple, Union
 
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone as django_timezone
+
+from base.container import container
 from base.services import BaseService
 from kafka_service.kafka_service import KafkaService
+from kafka_service.serializers import from_ticks, to_ticks
+from kafka_service.services import OutboxService
 from stocks.exceptions import CreateSubcriptionException, PriceNotExist, RemoveSubcriptionException
-from stocks.models import Stock
-from stocks.repositories import StockRepository
+from stocks.models import (DeletedStock, Stock, StockCandle, StockPriceSequence, StockSymbolSync,
+                           StockTick)
+from stocks.price_table import get_price_table
+from stocks.repositories import (DeletedStockRepository, PriceChange, StockCandleRepository,
+                                 StockPriceSequenceRepository, StockRepository,
+                                 StockSymbolSyncRepository, StockTickRepository)
+from stocks.signals import stock_prices_changed
+from stocks.stream import publish_prices
+from stocks.symbol_map import symbol_map
 from user_management.services import UserService
 
 logger = logging.getLogger(__name__)
 
 
 class StockService(BaseService):
+    STOCK_SYMBOLS_KEY = "stock_symbols"
+
     def __init__(self) -> None:
         """Initialize StockService instance."""
-        self.user_service = UserService()
+        self.user_service = container.get(UserService)
         self.kafka_service = KafkaService()
+        self.outbox_service = container.get(OutboxService)
+        self.symbol_sync_repository = container.get(StockSymbolSyncRepository, StockSymbolSync)
+        self.history_service = container.get(StockPriceHistoryService)
+        self.price_sequence_repository = container.get(
+            StockPriceSequenceRepository, StockPriceSequence
+        )
+        self.deleted_stock_repository = container.get(DeletedStockRepository, DeletedStock)
         super().__init__(model=Stock, repository=StockRepository)
 
     def create(self, **kwargs) -> Stock:
         """Create Stock.
-        Send to kafka symbol of stock that need to be created at mongodb for regular checks of price.
+        Send to kafka symbol of stock that need to be created at mongodb for regular checks of
+        price, as the next symbols version published through the outbox once the stock is
+        committed.
 
         Kwargs:
         - symbol (str): The symbol of the stock.
@@ -33,44 +61,169 @@ class StockService(BaseService):
         - Stock: The created stock.
 
         """
-        symbol = kwargs.get("symbol")
-        self.kafka_service.send_stock_symbols_to_kafka(symbol)
-        return self.repository.create(**kwargs)
+        with transaction.atomic():
+            stock = self.repository.create(**self.next_price_change()._asdict(), **kwargs)
+            self.sync_symbols()
+        return stock
+
+    def ingest_prices(self, prices: Dict[Union[str, int], Tuple[int, int]]) -> List[int]:
+        """
+        Save a batch of prices received from kafka in one transaction, with their history.
+        Send stock_prices_changed for stocks whose prices changed; its receivers run after commit.
 
-    def update_stock_prices(self):
+        Args:
+        - prices (Dict[Union[str, int], Tuple[int, int]]): sell and buy prices in ticks by symbol
+        or by symbol dictionary id, as conflated by PriceConflator.
+
+        Returns:
+        - List[int]: The IDs of stocks whose prices changed.
         """
-        Update stock prices from kafka.
+        with transaction.atomic():
+            changed_prices, price_seq = self.apply_prices(prices)
+            changed_stock_ids = list(changed_prices)
+            if changed_stock_ids:
+                self.history_service.record(changed_prices)
+                price_table = get_price_table()
+                if price_table is not None:
+                    transaction.on_commit(partial(price_table.publish, changed_prices, price_seq))
+                if settings.STOCK_PRICE_STREAM_ENABLED:
+                    transaction.on_commit(partial(publish_prices, changed_prices))
+                stock_prices_changed.send(sender=self.__class__, stock_ids=changed_stock_ids)
+        return changed_stock_ids
+
+    def apply_prices(
+        self, prices: Dict[Union[str, int], Tuple[int, int]]
+    ) -> Tuple[Dict[int, Tuple[Decimal, Decimal]], Optional[int]]:
         """
-        logger.info("Start update prices")
-        for kafka_data in self.kafka_service.read_stock_prices_from_kafka():
-            stocks = kafka_data["stocks"]
-            for stock in stocks:
-                symbol = stock["symbol"]
-                new_stock_prices = {
-                    "price_per_unit_sail": stock["sell_price"],
-                    "price_per_unit_buy": stock["buy_price"],
-                }
-                stock = self.find_by_symbol(symbol)
-                if stock is None:
-                    continue
+        Save a batch of prices received from kafka, skipping stocks whose prices didn't change.
+        Changed stocks are numbered with the next price sequence value. The batch takes
+        one SELECT of current prices, which locks the stocks, and, if prices changed,
+        one statement to number them (two on databases other than PostgreSQL) and one
+        UPDATE of changed stocks.
 
-                stock = self.update(obj_id=stock.id, **new_stock_prices)
-                logger.info(
-                    f"Stock {symbol} were updated successfully: {stock.price_per_unit_sail},{stocks.price_per_unit_buy}"
-                )
+        Args:
+        - prices (Dict[Union[str, int], Tuple[int, int]]): sell and buy prices in ticks by symbol,
+        or by symbol dictionary id (the stock ID) for binary price batches.
 
-    def send_stock_symbols_to_kafka(self):
-        symbols = self.get_all_symbols()
-        logger.info("Symbols from db:", symbols)
-        if symbols:
-            self.kafka_service.send_stock_symbols_to_kafka(symbols=symbols)
+        Returns:
+        - Tuple[Dict[int, Tuple[Decimal, Decimal]], Optional[int]]: New price_per_unit_sail
+        and price_per_unit_buy of stocks whose prices changed, by stock ID, and the price
+        sequence value of the change, None if no price changed.
+        """
+        stock_ids = symbol_map.get_ids(key for key in prices if isinstance(key, str))
+        stock_ids.update((key, key) for key in prices if isinstance(key, int))
+        current_prices = self.repository.get_prices(stock_ids.values(), for_update=True)
+        if len(current_prices) < len(stock_ids):
+            # some of the mapped stocks were deleted by another process
+            symbol_map.invalidate()
+
+        changed_prices, price_seq = {}, None
+        for key, stock_id in stock_ids.items():
+            if stock_id not in current_prices:
+                continue
+            sell_ticks, buy_ticks = prices[key]
+            sail, buy = current_prices[stock_id]
+            if (to_ticks(sail), to_ticks(buy)) != (sell_ticks, buy_ticks):
+                changed_prices[stock_id] = (from_ticks(sell_ticks), from_ticks(buy_ticks))
+        if changed_prices:
+            change = self.next_price_change()
+            self.repository.bulk_update_prices(changed_prices, change=change)
+            price_seq = change.price_seq
+        logger.debug(
+            f"Stock prices were updated successfully: {len(changed_prices)} changed "
+            f"of {len(prices)} received"
+        )
+        return changed_prices, price_seq
+
+    def next_price_change(self) -> PriceChange:
+        """
+        Number a change of prices; call it in the transaction of the change, after locking
+        the changed stocks.
+
+        Returns:
+        - PriceChange: price_seq and price_change_id of the change.
+        """
+        return self.price_sequence_repository.next_value()
+
+    def record_deletion(self, stock_id: int) -> None:
+        """
+        Number the deletion of a stock for clients of get_prices_since; call it in the
+        transaction of the deletion.
+
+        Args:
+        - stock_id (int): The ID of the deleted stock.
+
+        Returns:
+        - None.
+        """
+        self.deleted_stock_repository.create(
+            stock_id=stock_id, price_change_id=self.next_price_change().price_change_id
+        )
+
+    def get_prices_since(
+        self, change_id: Optional[int] = None
+    ) -> Tuple[List[Stock], List[int], int]:
+        """
+        Return prices of stocks changed and IDs of stocks deleted from a change ID on, and
+        the change ID to ask from next time. Transactions of all changes with smaller IDs
+        have ended before the stocks are read, so none of them can show up later; changes
+        committed meanwhile may be returned again next time. Never waits for writers.
+
+        Args:
+        - change_id (Optional[int]): The change ID returned by the previous call, None for
+        prices of all stocks.
+
+        Returns:
+        - Tuple[List[Stock], List[int], int]: The changed stocks, the deleted stock IDs
+        (none without change_id: stocks missing from the result don't exist) and the new
+        change ID.
+        """
+        watermark = self.price_sequence_repository.get_watermark()
+        stocks = list(self.repository.get_prices_since(change_id))
+        deleted_ids = []
+        if change_id is not None:
+            deleted_ids = self.deleted_stock_repository.get_ids_since(change_id)
+        return stocks, deleted_ids, watermark
+
+    def sync_symbols(self) -> Optional[Dict]:
+        """
+        Publish symbols added and removed since the last sync as one versioned message,
+        with the ids of added symbols,
+        keyed by STOCK_SYMBOLS_KEY for the log-compacted symbols topic.
+        Concurrent syncs are serialized by the lock of the sync state, so each version
+        is published once.
 
-    def get_all_symbols(self):
-        stocks = self.get_all()
-        symbols = []
-        for stock in stocks:
-            symbols.append(stock.symbol)
-        return symbols
+        Returns:
+        - Optional[Dict]: The published message, or None if the symbols didn't change.
+        """
+        with transaction.atomic():
+            state = self.symbol_sync_repository.get_state_for_update()
+            symbols = set(self.repository.get_symbols())
+            published_symbols = set(state.symbols)
+            added = sorted(symbols - published_symbols)
+            removed = sorted(published_symbols - symbols)
+            if not added and not removed:
+                return None
+
+            message = {
+                "version": state.version + 1,
+                "base_version": state.version,
+                "added": added,
+                "removed": removed,
+                # symbol dictionary: binary price batches refer to stocks by these ids
+                "ids": self.repository.get_symbol_ids(added),
+            }
+            self.outbox_service.enqueue(
+                topic=self.kafka_service.KAFKA_TOPIC_STOCK_SYMBOLS,
+                key=self.STOCK_SYMBOLS_KEY,
+                value=message,
+            )
+            self.symbol_sync_repository.save_state(state, message["version"], sorted(symbols))
+        logger.info(
+            f"Stock symbols version {message['version']}: "
+            f"{len(added)} added, {len(removed)} removed"
+        )
+        return message
 
     def find_by_symbol(self, symbol: str) -> Stock:
         """
@@ -159,9 +312,24 @@ class StockService(BaseService):
         user = self.user_service.get_by_id(obj_id=user_id)
         return self.repository.get_user_subscriptions(user=user)
 
+    def get_subscription_prices(self, user_id: int) -> Dict[int, Tuple[Decimal, Decimal]]:
+        """
+        Return current prices of stocks a user is subscribed to.
+
+        Args:
+        - user_id (int): The ID of the user.
+
+        Returns:
+        - Dict[int, Tuple[Decimal, Decimal]]: price_per_unit_sail and price_per_unit_buy
+        by stock ID.
+        """
+        subscriptions = self.get_all_user_subscriptions(user_id)
+        return self.repository.get_prices(subscriptions.values_list("id", flat=True))
+
     def get_price(self, stock: Stock, action: Literal["sell", "buy"]) -> float:
         """
-        Return the price based on the action.
+        Return the price based on the action, from the stock object: pass a row locked
+        with get_for_update when the price moves money.
 
         Args:
         - stock (Stock): The stock object.
@@ -179,6 +347,48 @@ class StockService(BaseService):
             return stock.price_per_unit_sail
         raise PriceNotExist()
 
+    def get_latest_price(self, stock: Stock, action: Literal["sell", "buy"]) -> float:
+        """
+        Return the price based on the action for display: from the price table of the host
+        if it is enabled and holds a change at least as recent as the stock object, from
+        the stock object otherwise.
+
+        Args:
+        - stock (Stock): The stock object.
+        - action (Literal["sell", "buy"]): Action type to determine the price.
+
+        Returns:
+        - float: Price of the stock based on the action.
+
+        Raises:
+        - PriceNotExist: If the action is not 'sell' or 'buy'.
+        """
+        price_table = get_price_table()
+        prices = None
+        if price_table is not None:
+            prices = price_table.get(stock.id, min_price_seq=stock.price_seq)
+        if prices is None:
+            return self.get_price(stock, action)
+        sail, buy = prices
+        if action == "sell":
+            return buy
+        if action == "buy":
+            return sail
+        raise PriceNotExist()
+
+    def get_prices(self, stock_ids: Iterable[int]) -> Dict[int, Tuple[Decimal, Decimal]]:
+        """
+        Return current prices of stocks.
+
+        Args:
+        - stock_ids (Iterable[int]): The IDs of the stocks.
+
+        Returns:
+        - Dict[int, Tuple[Decimal, Decimal]]: price_per_unit_sail and price_per_unit_buy
+        by stock ID.
+        """
+        return self.repository.get_prices(stock_ids)
+
     def set_price(self, stock: Stock, action: Literal["sell", "buy"], new_value: float) -> None:
         """
         Set the price based on the action.
@@ -215,6 +425,33 @@ class StockService(BaseService):
             return True
         return False
 
+    def credit_available_quantity(self, stock: Stock, quantity: int) -> bool:
+        """
+        Return quantity to the available_quantity of a stock.
+
+        Args:
+        - stock (Stock): The stock object.
+        - quantity (int): Returned quantity.
+
+        Returns:
+        - bool: True if the stock was updated.
+        """
+        return self.repository.credit_available_quantity(stock, quantity)
+
+    def debit_available_quantity(self, stock: Stock, quantity: int) -> bool:
+        """
+        Take quantity from the available_quantity of a stock if it is enough.
+
+        Args:
+        - stock (Stock): The stock object.
+        - quantity (int): Quantity for buy.
+
+        Returns:
+        - True: available_quantity was enough and was decreased.
+        - False: available_quantity not enough.
+        """
+        return self.repository.debit_available_quantity(stock, quantity)
+
     def set_available_quantity(self, stock: Stock, new_value: int) -> None:
         """
         Check available_quantity before buy.
@@ -238,3 +475,114 @@ class StockService(BaseService):
         - None
         """
         return self.repository.set_available_quantity(stock, new_value)
+
+
+class StockPriceHistoryService(BaseService):
+    # lengths of candle intervals, which start at multiples of the length since the epoch
+    INTERVALS = {
+        "1m": timedelta(minutes=1),
+        "5m": timedelta(minutes=5),
+        "1h": timedelta(hours=1),
+        "1d": timedelta(days=1),
+    }
+
+    def __init__(self) -> None:
+        """Initialize StockPriceHistoryService instance."""
+        self.candle_repository = container.get(StockCandleRepository, StockCandle)
+        super().__init__(model=StockTick, repository=StockTickRepository)
+
+    @classmethod
+    def get_start(cls, interval: str, time: datetime) -> datetime:
+        """
+        Get the start of the candle of an interval a time belongs to.
+
+        Args:
+        - interval (str): The interval of the candle.
+        - time (datetime): The time.
+
+        Returns:
+        - datetime: The start of the candle, in UTC.
+        """
+        length = int(cls.INTERVALS[interval].total_seconds())
+        timestamp = int(time.timestamp())
+        return datetime.fromtimestamp(timestamp - timestamp % length, tz=timezone.utc)
+
+    def record(
+        self, prices: Dict[int, Tuple[Decimal, Decimal]], time: Optional[datetime] = None
+    ) -> None:
+        """
+        Save new prices of stocks as ticks and roll the sail prices up into the candles
+        of every interval. Takes one INSERT of ticks, one SELECT of current candles
+        and at most one INSERT and one UPDATE of candles, whatever the number of stocks.
+
+        Args:
+        - prices (Dict[int, Tuple[Decimal, Decimal]]): price_per_unit_sail and
+        price_per_unit_buy by stock ID.
+        - time (Optional[datetime]): The time of the prices, now by default.
+
+        Returns:
+        - None.
+        """
+        time = time or django_timezone.now()
+        self.repository.bulk_create_ticks(prices, time)
+
+        starts = {interval: self.get_start(interval, time) for interval in self.INTERVALS}
+        candles = self.candle_repository.get_current(prices, starts)
+        new, changed = [], []
+        for stock_id, (sail, _) in prices.items():
+            for interval, start in starts.items():
+                candle = candles.get((stock_id, interval))
+                if candle is None:
+                    new.append(
+                        StockCandle(
+                            stock_id=stock_id,
+                            interval=interval,
+                            start=start,
+                            open=sail,
+                            high=sail,
+                            low=sail,
+                            close=sail,
+                            ticks=1,
+                        )
+                    )
+                    continue
+                candle.high = max(candle.high, sail)
+                candle.low = min(candle.low, sail)
+                candle.close = sail
+                candle.ticks += 1
+                changed.append(candle)
+        self.candle_repository.save_candles(new, changed)
+
+    def get_candles(self, stock_id: int, interval: str, limit: int) -> List[StockCandle]:
+        """
+        Get the latest candles of a stock.
+
+        Args:
+        - stock_id (int): The ID of the stock.
+        - interval (str): One of INTERVALS.
+        - limit (int): The maximum number of candles.
+
+        Returns:
+        - List[StockCandle]: The candles from the oldest to the latest.
+        """
+        return self.candle_repository.get_latest(stock_id, interval, limit)
+
+    def prune(self, now: Optional[datetime] = None) -> Dict[str, int]:
+        """
+        Delete ticks and candles older than their retention, so only the rollups of
+        longer intervals are kept for older prices.
+
+        Args:
+        - now (Optional[datetime]): The current time, now by default.
+
+        Returns:
+        - Dict[str, int]: The number of deleted ticks and candles of every interval.
+        """
+        now = now or django_timezone.now()
+        retention = settings.STOCK_TICKS_RETENTION_HOURS
+        deleted = {"ticks": self.repository.delete_before(now - timedelta(hours=retention))}
+        for interval, days in settings.STOCK_CANDLES_RETENTION_DAYS.items():
+            deleted[interval] = self.candle_repository.delete_before(
+                interval, now - timedelta(days=days)
+            )
+        return deleted
@@ -0,0 +1,48 @@
+from functools import partial
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import Signal, receiver
+
+from base.container import container
+from stocks.models import Stock
+from stocks.stream import publish_prices
+from stocks.symbol_map import symbol_map
+
+# Sent by StockService when new prices of stocks were saved.
+# Kwargs: stock_ids (List[int]) - ids of stocks whose prices changed.
+stock_prices_changed = Signal()
+
+
+@receiver(post_save, sender=Stock)
+def invalidate_symbol_map_on_stock_created(sender, instance, created, **kwargs):
+    if created:
+        symbol_map.invalidate()
+
+
+@receiver(post_delete, sender=Stock)
+def invalidate_symbol_map_on_stock_deleted(sender, instance, **kwargs):
+    symbol_map.invalidate()
+
+
+@receiver(post_save, sender=Stock)
+def publish_prices_on_stock_saved(sender, instance, created, **kwargs):
+    """
+    Announce prices changed by a save to price streams. The price table isn't written:
+    only ingestion writes it, and readers of a stock row newer than its slot read the row.
+    """
+    prices = (instance.price_per_unit_sail, instance.price_per_unit_buy)
+    if not created and prices == getattr(instance, "_loaded_prices", None):
+        return
+    instance._loaded_prices = prices
+    if settings.STOCK_PRICE_STREAM_ENABLED:
+        transaction.on_commit(partial(publish_prices, {instance.id: prices}))
+
+
+@receiver(post_delete, sender=Stock)
+def record_deletion_on_stock_deleted(sender, instance, **kwargs):
+    """Leave a tombstone for clients of the delta prices endpoint."""
+    from stocks.services import StockService
+
+    container.get(StockService).record_deletion(instance.id)
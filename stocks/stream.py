@@ -0,0 +1,203 @@
+import asyncio
+import json
+import logging
+import secrets
+from decimal import Decimal
+from typing import AsyncGenerator, Dict, Iterable, List, Optional, Set, Tuple
+
+import redis
+import redis.asyncio
+from django.conf import settings
+
+from base.redis_client import get_redis_client
+
+logger = logging.getLogger(__name__)
+
+# Redis channel of price changes: a JSON object of [sail, buy] by stock id per saved batch
+PRICES_CHANNEL = "stocks:prices"
+# Redis key of a stream ticket, holding the ID of the user it was issued to
+TICKET_KEY = "stocks:stream-ticket:{ticket}"
+
+
+def to_message(prices: Dict[int, Tuple[Decimal, Decimal]]) -> Dict[str, List[str]]:
+    """Convert prices by stock ID to [sail, buy] strings by stock ID, as sent to clients."""
+    return {str(stock_id): [str(sail), str(buy)] for stock_id, (sail, buy) in prices.items()}
+
+
+def publish_prices(prices: Dict[int, Tuple[Decimal, Decimal]]) -> None:
+    """
+    Announce saved prices to price streams of all web processes; call it after commit.
+    A failed publish only delays the stream, so it is logged instead of raised.
+
+    Args:
+    - prices (Dict[int, Tuple[Decimal, Decimal]]): price_per_unit_sail and
+    price_per_unit_buy by stock ID.
+
+    Returns:
+    - None.
+    """
+    try:
+        get_redis_client().publish(PRICES_CHANNEL, json.dumps(to_message(prices)))
+    except redis.RedisError as e:
+        logger.error(f"[ERROR] Price stream: failed to publish prices: {e}")
+
+
+def issue_ticket(user_id: int) -> str:
+    """
+    Issue a ticket that opens one price stream of a user within STOCK_PRICE_STREAM_TICKET_TTL
+    seconds. EventSource can't send headers, so streams take a ticket in their URL instead
+    of the JWT, which would be left in access logs and browser history for its whole life.
+
+    Args:
+    - user_id (int): The ID of the user.
+
+    Returns:
+    - str: The ticket.
+    """
+    ticket = secrets.token_urlsafe(32)
+    get_redis_client().set(
+        TICKET_KEY.format(ticket=ticket), user_id, ex=settings.STOCK_PRICE_STREAM_TICKET_TTL
+    )
+    return ticket
+
+
+def redeem_ticket(ticket: str) -> Optional[int]:
+    """
+    Use up a ticket.
+
+    Args:
+    - ticket (str): The ticket.
+
+    Returns:
+    - Optional[int]: The ID of the user the ticket was issued to, None if it doesn't exist,
+    expired or was already used.
+    """
+    user_id = get_redis_client().getdel(TICKET_KEY.format(ticket=ticket))
+    return int(user_id) if user_id is not None else None
+
+
+class PriceWatcher:
+    """
+    Price changes of a set of stocks for one stream connection.
+
+    Changes are conflated: only the latest prices of a stock are kept until the connection
+    sends them, so a slow client receives one event per interval however fast prices move.
+    """
+
+    # how long clients wait before reconnecting when the stream ends, in milliseconds
+    RECONNECT_DELAY_MS = 1000
+
+    def __init__(self, stock_ids: Iterable[int]) -> None:
+        self.stock_ids = {str(stock_id) for stock_id in stock_ids}
+        self.pending: Dict[str, List[str]] = {}
+        self.changed = asyncio.Event()
+
+    def update(self, prices: Dict[str, List[str]]) -> None:
+        """Keep the latest prices of watched stocks among prices."""
+        watched = self.stock_ids.intersection(prices)
+        if watched:
+            for stock_id in watched:
+                self.pending[stock_id] = prices[stock_id]
+            self.changed.set()
+
+    def drain(self) -> Dict[str, List[str]]:
+        """Return and forget prices not sent yet."""
+        pending, self.pending = self.pending, {}
+        self.changed.clear()
+        return pending
+
+    async def events(
+        self,
+        heartbeat: float,
+        min_interval: float,
+        max_age: float,
+        initial: Optional[Dict] = None,
+    ) -> AsyncGenerator[str, None]:
+        """
+        Yield Server-Sent Events: a "prices" event with the changed prices at most once per
+        min_interval, and a comment after heartbeat seconds without changes, which keeps
+        proxies from closing the idle connection. The stream ends after max_age seconds and
+        the client reconnects; the server isn't told when a client goes away, so this bounds
+        the life of streams of clients that are gone.
+
+        Args:
+        - heartbeat (float): Seconds without events before a heartbeat.
+        - min_interval (float): Minimum seconds between two prices events.
+        - max_age (float): Seconds before the stream ends.
+        - initial (Optional[Dict]): Prices to send first, e.g. the current ones.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + max_age
+        yield f"retry: {self.RECONNECT_DELAY_MS}\n\n"
+        if initial:
+            yield self.format(initial)
+        while True:
+            timeout = min(heartbeat, deadline - loop.time())
+            if timeout <= 0:
+                return
+            try:
+                await asyncio.wait_for(self.changed.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                if loop.time() < deadline:
+                    yield ": heartbeat\n\n"
+                continue
+            yield self.format(self.drain())
+            # changes until then are merged into the next event
+            await asyncio.sleep(min_interval)
+
+    @staticmethod
+    def format(prices: Dict) -> str:
+        return f"event: prices\ndata: {json.dumps(prices)}\n\n"
+
+
+class PriceHub:
+    """
+    Fan-out of the price channel to the watchers of this process.
+
+    The process holds one Redis subscription while it has watchers, so thousands of
+    connections cost one Redis connection and one message per saved batch.
+    """
+
+    # pause before subscribing again after Redis failed, in seconds
+    RETRY_DELAY = 1
+
+    def __init__(self) -> None:
+        self.watchers: Set[PriceWatcher] = set()
+        self._listener: Optional[asyncio.Task] = None
+
+    def watch(self, stock_ids: Iterable[int]) -> PriceWatcher:
+        """Start receiving changes of stock_ids; call from the event loop of the server."""
+        watcher = PriceWatcher(stock_ids)
+        self.watchers.add(watcher)
+        if self._listener is None or self._listener.done():
+            self._listener = asyncio.get_running_loop().create_task(self.listen())
+        return watcher
+
+    def unwatch(self, watcher: PriceWatcher) -> None:
+        """Stop receiving changes; the subscription is closed with the last watcher."""
+        self.watchers.discard(watcher)
+        if not self.watchers and self._listener is not None:
+            self._listener.cancel()
+            self._listener = None
+
+    def dispatch(self, prices: Dict[str, List[str]]) -> None:
+        for watcher in list(self.watchers):
+            watcher.update(prices)
+
+    async def listen(self) -> None:
+        while self.watchers:
+            client = redis.asyncio.Redis.from_url(settings.REDIS_URL)
+            pubsub = client.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(PRICES_CHANNEL)
+                async for message in pubsub.listen():
+                    self.dispatch(json.loads(message["data"]))
+            except redis.RedisError as e:
+                logger.error(f"[ERROR] Price stream: subscription failed, retrying: {e}")
+                await asyncio.sleep(self.RETRY_DELAY)
+            finally:
+                await pubsub.aclose()
+                await client.aclose()
+
+
+hub = PriceHub()
@@ -0,0 +1,80 @@
+import threading
+import time
+from typing import Dict, Iterable, Optional
+
+from django.conf import settings
+
+from base.container import container
+from stocks.models import Stock
+from stocks.repositories import StockRepository
+
+
+class SymbolMap:
+    """
+    Process-wide map of stock symbols to stock ids, used to apply price batches by id.
+
+    The map is loaded once and invalidated when stocks are created or deleted in this
+    process. Symbols it doesn't know reload it at most once per
+    STOCK_SYMBOL_MAP_REFRESH_INTERVAL, which picks up stocks created by other processes.
+    """
+
+    def __init__(self) -> None:
+        self.repository = container.get(StockRepository, Stock)
+        self._ids: Optional[Dict[str, int]] = None
+        self._symbols: Dict[int, str] = {}
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    def get_ids(self, symbols: Iterable[str]) -> Dict[str, int]:
+        """
+        Return ids of known stocks by symbol; unknown symbols are left out.
+
+        Args:
+        - symbols (Iterable[str]): The symbols of stocks.
+
+        Returns:
+        - Dict[str, int]: Stock ID by symbol.
+        """
+        symbols = list(symbols)
+        ids = self._ids
+        if ids is None or (
+            any(symbol not in ids for symbol in symbols)
+            and time.monotonic() - self._loaded_at >= settings.STOCK_SYMBOL_MAP_REFRESH_INTERVAL
+        ):
+            ids = self._load()
+        return {symbol: ids[symbol] for symbol in symbols if symbol in ids}
+
+    def get_symbols(self, stock_ids: Iterable[int]) -> Dict[int, str]:
+        """
+        Return symbols of known stocks by id; unknown ids are left out.
+
+        Args:
+        - stock_ids (Iterable[int]): The IDs of stocks.
+
+        Returns:
+        - Dict[int, str]: Symbol by stock ID.
+        """
+        stock_ids = list(stock_ids)
+        symbols = self._symbols
+        if self._ids is None or (
+            any(stock_id not in symbols for stock_id in stock_ids)
+            and time.monotonic() - self._loaded_at >= settings.STOCK_SYMBOL_MAP_REFRESH_INTERVAL
+        ):
+            self._load()
+            symbols = self._symbols
+        return {stock_id: symbols[stock_id] for stock_id in stock_ids if stock_id in symbols}
+
+    def invalidate(self) -> None:
+        """Reload the map on the next lookup."""
+        self._ids = None
+
+    def _load(self) -> Dict[str, int]:
+        with self._lock:
+            ids = self.repository.get_symbol_ids()
+            self._symbols = {stock_id: symbol for symbol, stock_id in ids.items()}
+            self._ids = ids
+            self._loaded_at = time.monotonic()
+        return ids
+
+
+symbol_map = SymbolMap()
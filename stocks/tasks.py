@@ -2,21 +2,21 @@ import logging
 
 from celery import shared_task
 
-from stocks.services import StockService
+from base.container import container
+from base.locks import single_instance
+from stocks.services import StockPriceHistoryService, StockService
 
 logger = logging.getLogger(__name__)
 
 
 @shared_task
-def update_stock_prices():
-    StockService().update_stock_prices()
-    logger.info("[INFO] celery_task [update_stock_prices]: prices updated successfully.")
+def sync_stock_symbols():
+    message = container.get(StockService).sync_symbols()
+    logger.info(f"[INFO] celery_task [sync_stock_symbols]: published {message}.")
 
 
 @shared_task
-def send_stock_symbols_to_kafka():
-    StockService().send_stock_symbols_to_kafka()
-    logger.info(
-        "[INFO] celery_task [send_stock_symbols_to_kafka]:\
-              send stock symbols to kafka successfully."
-    )
+@single_instance("stocks:prune_price_history")
+def prune_price_history():
+    deleted = container.get(StockPriceHistoryService).prune()
+    logger.info(f"[INFO] celery_task [prune_price_history]: deleted {deleted}.")
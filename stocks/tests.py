@@ -1,11 +1,34 @@
+import asyncio
+import os
+import tempfile
+from array import array
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from typing import Dict, Tuple, Union
+from unittest import mock
+
+import redis
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.test import SimpleTestCase, TestCase, override_settings
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APIClient
 
-from stocks.models import Stock
-from stocks.services import StockService
+from base.redis_client import get_redis_client
+from kafka_service import kafka_service
+from kafka_service.memory import InMemoryBroker, InMemoryConsumer, TopicPartition
+from kafka_service.models import ConsumerOffset, OutboxMessage
+from kafka_service.serializers import PriceBatch
+from stocks.archive import TickArchive
+from stocks.conflation import PriceConflator
+from stocks.ingestion import PriceIngestor
+from stocks.models import Stock, StockCandle, StockTick
+from stocks.price_table import HEADER, SEQUENCE, SLOT, PriceTable
+from stocks.services import StockPriceHistoryService, StockService
+from stocks.signals import stock_prices_changed
+from stocks.stream import PRICES_CHANNEL, PriceWatcher, hub, publish_prices
+from stocks.symbol_map import symbol_map
+from user_management.authentication import JWTAuthentication
 from user_management.services import UserService
 
 User = get_user_model()
@@ -133,3 +156,641 @@ class StockDetailViewTests(BaseStockTestCase):
         response = client.delete(reverse("stock-detail", kwargs={"pk": stock.id}))
 
         self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+
+
+class UpdateStockPricesTests(TestCase):
+    stock_service = StockService()
+
+    def setUp(self):
+        self.stock = Stock.objects.create(
+            name="test Stock 1",
+            symbol="tFS1",
+            price_per_unit_sail=110,
+            price_per_unit_buy=70,
+            available_quantity=10,
+        )
+        self.unchanged_stock = Stock.objects.create(
+            name="test Stock 2",
+            symbol="tFS2",
+            price_per_unit_sail=50.5,
+            price_per_unit_buy=40,
+            available_quantity=10,
+        )
+
+    def test_ingest_prices_sends_changed_stocks(self):
+        prices: Dict[Union[str, int], Tuple[int, int]] = {
+            "tFS1": (12010, 8000),
+            "tFS2": (5050, 4000),
+            "unknown": (100, 100),
+        }
+        receiver = mock.Mock()
+        stock_prices_changed.connect(receiver)
+        self.addCleanup(stock_prices_changed.disconnect, receiver)
+
+        self.stock_service.ingest_prices(prices)
+
+        self.stock.refresh_from_db()
+        self.assertEqual(str(self.stock.price_per_unit_sail), "120.10")
+        self.assertEqual(self.stock.price_per_unit_buy, 80)
+        receiver.assert_called_once()
+        self.assertEqual(receiver.call_args.kwargs["stock_ids"], [self.stock.id])
+
+    def create_ingestor(self, broker, stop_when_idle=True):
+        def consumer_factory(group_id, on_revoked, on_assigned):
+            consumer = broker.consumer(
+                "stock_prices", group_id, on_revoked=on_revoked, on_assigned=on_assigned
+            )
+            poll = consumer.poll
+
+            def poll_until_idle(**kwargs):
+                records = poll(**kwargs)
+                if not records and stop_when_idle:
+                    ingestor.stop()
+                return records
+
+            consumer.poll = poll_until_idle
+            return consumer
+
+        ingestor = PriceIngestor(
+            self.stock_service,
+            window_ms=10000,
+            max_batch=100,
+            max_records=10,
+            poll_timeout_ms=0,
+            consumer_factory=consumer_factory,
+            group_id="ingestion",
+        )
+        return ingestor
+
+    def test_ingestor_commits_offsets_after_saving(self):
+        broker = InMemoryBroker(partitions=2)
+        for symbol, price in (("tFS1", 1), ("tFS2", 2), ("tFS1", 3)):
+            tick = {"symbol": symbol, "sell_price": price, "buy_price": price}
+            broker.send("stock_prices", {"stocks": [tick]}, key=symbol.encode())
+
+        ingestor = self.create_ingestor(broker)
+        ingestor.run()
+
+        self.stock.refresh_from_db()
+        self.assertEqual(self.stock.price_per_unit_sail, 3)
+        self.assertEqual(ingestor.conflator.stats(), {"received": 3, "conflated": 1, "written": 2})
+        for partition, offset in broker.end_offsets("stock_prices").items():
+            self.assertEqual(broker.committed("ingestion", partition), offset)
+
+    def test_ingestor_skips_malformed_messages(self):
+        broker = InMemoryBroker(partitions=1)
+        for value in (
+            {"prices": []},
+            {"stocks": [{"symbol": "tFS1", "sell_price": "abc", "buy_price": 1}]},
+            {"stocks": [{"symbol": "tFS1", "sell_price": 4, "buy_price": 4}, {"symbol": "x"}]},
+            None,
+            {"stocks": [{"symbol": "tFS1", "sell_price": 6, "buy_price": 6}]},
+        ):
+            broker.send("stock_prices", value)
+
+        ingestor = self.create_ingestor(broker)
+        ingestor.run()
+
+        self.stock.refresh_from_db()
+        self.assertEqual(self.stock.price_per_unit_sail, 6)
+        self.assertEqual(ingestor.skipped, 4)
+        self.assertEqual(ingestor.conflator.stats()["received"], 1)
+        self.assertEqual(broker.committed("ingestion", TopicPartition("stock_prices", 0)), 5)
+
+    def test_ingestor_resumes_from_offsets_saved_with_prices(self):
+        broker = InMemoryBroker(partitions=2)
+        tick = {"symbol": "tFS1", "sell_price": 7, "buy_price": 7}
+        broker.send("stock_prices", {"stocks": [tick]}, key=b"tFS1")
+        ingestor = self.create_ingestor(broker)
+        # the process dies after saving prices, before committing offsets to Kafka
+        with mock.patch.object(InMemoryConsumer, "commit", side_effect=RuntimeError("crash")):
+            ingestor.run()
+        self.assertEqual(
+            sum(broker.committed("ingestion", p) for p in broker.end_offsets("stock_prices")), 0
+        )
+
+        Stock.objects.filter(id=self.stock.id).update(price_per_unit_sail=1)
+        ingestor = self.create_ingestor(broker)
+        ingestor.run()
+
+        self.stock.refresh_from_db()
+        self.assertEqual(self.stock.price_per_unit_sail, 1)
+        self.assertEqual(ingestor.conflator.stats()["received"], 0)
+        self.assertEqual(
+            ConsumerOffset.objects.get(group_id="ingestion", topic="stock_prices").offset, 1
+        )
+
+    def test_ingestor_drops_prices_of_partitions_saved_past_by_another_consumer(self):
+        partition = TopicPartition("stock_prices", 0)
+        # a consumer that took the partition over saved a later price and offset
+        Stock.objects.filter(id=self.stock.id).update(price_per_unit_sail=6)
+        ConsumerOffset.objects.create(
+            group_id="ingestion", topic="stock_prices", partition=0, offset=2
+        )
+        ingestor = self.create_ingestor(InMemoryBroker(partitions=1))
+        ingestor.consumer = mock.Mock()
+        ingestor.uncommitted[partition] = 0
+        ingestor.positions[partition] = 1
+        ingestor.conflator.add([{"symbol": "tFS1", "sell_price": 5, "buy_price": 5}], partition)
+        ingestor.conflator.add([{"symbol": "tFS2", "sell_price": 5, "buy_price": 5}])
+
+        ingestor.write()
+
+        self.stock.refresh_from_db()
+        self.assertEqual(self.stock.price_per_unit_sail, 6)
+        self.assertEqual(Stock.objects.get(symbol="tFS2").price_per_unit_sail, 5)
+        self.assertEqual(ConsumerOffset.objects.get(group_id="ingestion").offset, 2)
+
+    def test_ingestor_archives_saved_ticks_by_symbol(self):
+        broker = InMemoryBroker(partitions=1)
+        batch = PriceBatch(array("I", [self.stock.id]), array("q", [900]), array("q", [800]))
+        broker.send("stock_prices", batch)
+        for symbol in ("tFS2", "unknown", "../tFS1"):
+            tick = {"symbol": symbol, "sell_price": 5, "buy_price": 4}
+            broker.send("stock_prices", {"stocks": [tick]})
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        ingestor = self.create_ingestor(broker)
+        ingestor.archive = TickArchive(directory.name)
+
+        ingestor.run()
+
+        ticks = TickArchive(directory.name).read("tFS1")
+        self.assertEqual((list(ticks.sell), list(ticks.buy)), ([900], [800]))
+        self.assertEqual(list(TickArchive(directory.name).read("tFS2").sell), [500])
+        self.assertEqual(sorted(os.listdir(directory.name)), ["tFS1", "tFS2"])
+
+    def test_ingestor_saves_buffered_ticks_before_partitions_are_revoked(self):
+        broker = InMemoryBroker(partitions=2)
+        broker.send(
+            "stock_prices",
+            {"stocks": [{"symbol": "tFS1", "sell_price": 5, "buy_price": 5}]},
+            key=b"tFS1",
+        )
+        ingestor = self.create_ingestor(broker, stop_when_idle=False)
+        ingestor.consumer = ingestor.consumer_factory(
+            "ingestion", ingestor.on_partitions_revoked, ingestor.on_partitions_assigned
+        )
+        for partition, messages in ingestor.consumer.poll(max_records=10).items():
+            ingestor.uncommitted.setdefault(partition, messages[0].offset)
+            ingestor.conflator.add(messages[0].value["stocks"])
+
+        broker.consumer("stock_prices", "ingestion")
+        ingestor.consumer.poll(max_records=10)
+
+        self.stock.refresh_from_db()
+        self.assertEqual(self.stock.price_per_unit_sail, 5)
+        self.assertEqual(len(ingestor.consumer.assignment()), 1)
+
+    def test_apply_prices_takes_constant_queries(self):
+        symbol_map.get_ids([])
+        prices = {"tFS1": (12100, 8100), self.unchanged_stock.id: (5100, 4100), "unknown": (1, 1)}
+
+        # SELECT FOR UPDATE of current prices, UPDATE and SELECT of the price sequence counter
+        # (one statement on PostgreSQL), UPDATE of prices
+        with self.assertNumQueries(4):
+            changed_prices, price_seq = self.stock_service.apply_prices(prices)
+
+        self.assertEqual(list(changed_prices), [self.stock.id, self.unchanged_stock.id])
+        self.unchanged_stock.refresh_from_db()
+        self.assertEqual(self.unchanged_stock.price_per_unit_sail, 51)
+        self.assertEqual(self.unchanged_stock.price_per_unit_buy, 41)
+        self.assertEqual(self.unchanged_stock.price_seq, price_seq)
+
+    def test_prices_view_returns_stocks_changed_since_seq(self):
+        client = APIClient()
+        response = client.get(reverse("stock-prices"))
+        self.assertEqual(len(response.data["prices"]), 2)
+
+        self.stock_service.ingest_prices({"tFS1": (12000, 8000)})
+        response = client.get(reverse("stock-prices"), {"since": response.data["seq"]})
+        self.assertEqual(
+            [(p["symbol"], str(p["price_per_unit_sail"])) for p in response.data["prices"]],
+            [("tFS1", "120.00")],
+        )
+
+        seq = response.data["seq"]
+        response = client.get(reverse("stock-prices"), {"since": seq})
+        self.assertEqual(response.data, {"seq": seq, "prices": [], "deleted": []})
+
+    def test_prices_view_returns_stocks_deleted_since_seq(self):
+        client = APIClient()
+        seq = client.get(reverse("stock-prices")).data["seq"]
+        deleted_id = self.unchanged_stock.id
+
+        self.unchanged_stock.delete()
+        response = client.get(reverse("stock-prices"), {"since": seq})
+        self.assertEqual(response.data["deleted"], [deleted_id])
+        self.assertGreater(response.data["seq"], seq)
+
+        response = client.get(reverse("stock-prices"), {"since": response.data["seq"]})
+        self.assertEqual(response.data["deleted"], [])
+        response = client.get(reverse("stock-prices"))
+        self.assertEqual([p["symbol"] for p in response.data["prices"]], ["tFS1"])
+        self.assertEqual(response.data["deleted"], [])
+
+    def test_symbol_map_is_refreshed_on_stock_created_and_deleted(self):
+        self.assertEqual(symbol_map.get_ids(["tFS3"]), {})
+
+        stock = Stock.objects.create(
+            name="test Stock 3",
+            symbol="tFS3",
+            price_per_unit_sail=10,
+            price_per_unit_buy=9,
+            available_quantity=10,
+        )
+        self.assertEqual(symbol_map.get_ids(["tFS3"]), {"tFS3": stock.id})
+
+        stock.delete()
+        self.assertEqual(symbol_map.get_ids(["tFS3"]), {})
+
+
+class PriceHistoryTests(TestCase):
+    def setUp(self):
+        self.history_service = StockPriceHistoryService()
+        self.stock = Stock.objects.create(
+            name="test Stock 1",
+            symbol="tFS1",
+            price_per_unit_sail=110,
+            price_per_unit_buy=70,
+            available_quantity=10,
+        )
+        self.start = datetime(2024, 1, 2, 10, 0, tzinfo=timezone.utc)
+
+    def record(self, sail, seconds):
+        prices = {self.stock.id: (Decimal(sail), Decimal(sail))}
+        self.history_service.record(prices, time=self.start + timedelta(seconds=seconds))
+
+    def test_record_rolls_ticks_up_into_candles_of_every_interval(self):
+        for sail, seconds in ((10, 0), (12, 20), (9, 40), (11, 59), (20, 61)):
+            self.record(sail, seconds)
+
+        minutes = self.history_service.get_candles(self.stock.id, "1m", limit=10)
+        self.assertEqual(
+            [(c.start, c.open, c.high, c.low, c.close, c.ticks) for c in minutes],
+            [
+                (self.start, 10, 12, 9, 11, 4),
+                (self.start + timedelta(minutes=1), 20, 20, 20, 20, 1),
+            ],
+        )
+        (hour,) = self.history_service.get_candles(self.stock.id, "1h", limit=10)
+        self.assertEqual(
+            (hour.open, hour.high, hour.low, hour.close, hour.ticks), (10, 20, 9, 20, 5)
+        )
+        self.assertEqual(StockTick.objects.filter(stock=self.stock).count(), 5)
+
+    def test_record_takes_constant_queries(self):
+        other = Stock.objects.create(
+            name="test Stock 2",
+            symbol="tFS2",
+            price_per_unit_sail=1,
+            price_per_unit_buy=1,
+            available_quantity=1,
+        )
+        self.record(10, 0)
+
+        with self.assertNumQueries(4):
+            self.history_service.record(
+                {self.stock.id: (Decimal(11), Decimal(11)), other.id: (Decimal(2), Decimal(2))},
+                time=self.start + timedelta(seconds=1),
+            )
+
+    def test_prune_keeps_longer_intervals(self):
+        self.record(10, 0)
+
+        deleted = self.history_service.prune(now=self.start + timedelta(days=8))
+
+        self.assertEqual(deleted, {"ticks": 1, "1m": 1, "5m": 0, "1h": 0})
+        self.assertEqual(
+            set(StockCandle.objects.values_list("interval", flat=True)), {"5m", "1h", "1d"}
+        )
+
+    def test_candles_view(self):
+        self.record(10, 0)
+        client = APIClient()
+
+        response = client.get(
+            reverse("stock-candles", kwargs={"pk": self.stock.id}), {"interval": "5m"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(str(response.data["candles"][0]["close"]), "10.00")
+
+        response = client.get(
+            reverse("stock-candles", kwargs={"pk": self.stock.id}), {"interval": "2m"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class TickArchiveTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.archive = TickArchive(directory.name)
+        self.addCleanup(self.archive.close)
+
+    def test_read_slices_time_range(self):
+        for timestamp in (1000, 2000, 3000, 4000):
+            self.archive.append({"A": (timestamp + 1, timestamp + 2), "B": (1, 1)}, timestamp)
+
+        ticks = self.archive.read("A", start=2000, end=4000)
+
+        self.assertEqual(list(ticks.time), [2000, 3000])
+        self.assertEqual(list(ticks.sell), [2001, 3001])
+        self.assertEqual(list(ticks.buy), [2002, 3002])
+        self.assertEqual(len(self.archive.read("B").time), 4)
+        self.assertEqual(len(self.archive.read("C").time), 0)
+
+    def test_timestamps_never_go_back(self):
+        self.archive.append({"A": (1, 1)}, 2000)
+        self.archive.close()
+        TickArchive(self.archive.root).append({"A": (2, 2)}, 1000)
+
+        self.assertEqual(list(self.archive.read("A").time), [2000, 2000])
+
+    def test_torn_row_is_ignored_and_dropped_on_append(self):
+        self.archive.append({"A": (1, 1)}, 1000)
+        self.archive.close()
+        with open(self.archive.path("A", "sell"), "ab") as sell_file:
+            sell_file.write(b"\x01" * 8)
+
+        self.assertEqual(list(self.archive.read("A").sell), [1])
+        self.archive.append({"A": (2, 2)}, 2000)
+        self.assertEqual(list(self.archive.read("A").sell), [1, 2])
+
+    def test_rejects_symbols_that_are_not_file_names(self):
+        with self.assertRaises(ValueError):
+            self.archive.append({"../A": (1, 1)}, 1000)
+
+
+class PriceTableTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "prices")
+
+    def test_prices_are_shared_through_the_file(self):
+        writer = PriceTable(self.path, capacity=10)
+        reader = PriceTable(self.path, capacity=10)
+
+        writer.publish({3: (Decimal("1.25"), Decimal("1.20")), 10: (Decimal(1), Decimal(1))}, 5)
+
+        self.assertEqual(reader.get(3), (Decimal("1.25"), Decimal("1.20")))
+        self.assertEqual(reader.get(3, min_price_seq=5), (Decimal("1.25"), Decimal("1.20")))
+        self.assertIsNone(reader.get(3, min_price_seq=6))
+        self.assertIsNone(reader.get(4))
+        self.assertIsNone(reader.get(10))
+        writer.publish({3: (Decimal(2), Decimal(2))}, 4)
+        self.assertEqual(reader.get(3), (Decimal("1.25"), Decimal("1.20")))
+
+    def test_slot_left_in_the_middle_of_a_write_is_not_read(self):
+        table = PriceTable(self.path, capacity=10)
+        table.publish({3: (Decimal(1), Decimal(1))}, 1)
+        offset = HEADER.size + 3 * SLOT.size
+        SEQUENCE.pack_into(table._map, offset, 3)
+
+        self.assertIsNone(table.get(3))
+        table.publish({3: (Decimal(2), Decimal(2))}, 2)
+        self.assertEqual(table.get(3), (Decimal(2), Decimal(2)))
+
+    def test_latest_price_reads_table_unless_stock_row_is_newer(self):
+        stock = Stock.objects.create(
+            name="test Stock 1",
+            symbol="tFS1",
+            price_per_unit_sail=110,
+            price_per_unit_buy=70,
+            available_quantity=10,
+        )
+        stock_service = StockService()
+        with self.settings(STOCK_PRICE_TABLE_PATH=self.path):
+            with self.captureOnCommitCallbacks(execute=True):
+                stock_service.ingest_prices({"tFS1": (12000, 8000)})
+
+            # prices that move money come from the stock row only
+            self.assertEqual(stock_service.get_price(stock, "buy"), 110)
+            self.assertEqual(stock_service.get_latest_price(stock, "buy"), 120)
+            self.assertEqual(stock_service.get_latest_price(stock, "sell"), 80)
+
+            # saved on another host, so not in this table
+            stock.refresh_from_db()
+            Stock.objects.filter(id=stock.id).update(
+                price_per_unit_sail=130, price_seq=stock.price_seq + 1
+            )
+            stock.refresh_from_db()
+            self.assertEqual(stock_service.get_latest_price(stock, "buy"), 130)
+
+
+@override_settings(STOCK_PRICE_STREAM_ENABLED=True)
+class PriceStreamTests(TestCase):
+    def setUp(self):
+        self.stock = Stock.objects.create(
+            name="test Stock 1",
+            symbol="tFS1",
+            price_per_unit_sail=110,
+            price_per_unit_buy=70,
+            available_quantity=10,
+        )
+        self.user = User.objects.create_user(
+            username="user_test", password="user_password", email="user_test@gmail.com"
+        )
+        self.user.subscriptions.add(self.stock)
+        self.token = JWTAuthentication.create_jwt(self.user)
+        patcher = mock.patch("stocks.stream.get_redis_client")
+        self.redis_client = patcher.start().return_value
+        self.addCleanup(patcher.stop)
+        self.redis_client.getdel.return_value = str(self.user.id).encode()
+
+    async def test_watcher_conflates_changes_of_watched_stocks(self):
+        watcher = PriceWatcher([self.stock.id])
+        events = watcher.events(heartbeat=0.05, min_interval=0, max_age=10)
+
+        self.assertTrue((await events.__anext__()).startswith("retry:"))
+        self.assertEqual(await events.__anext__(), ": heartbeat\n\n")
+        watcher.update({str(self.stock.id): ["1", "1"], "0": ["5", "5"]})
+        watcher.update({str(self.stock.id): ["2", "1"]})
+        event = await events.__anext__()
+        await events.aclose()
+
+        self.assertEqual(event, PriceWatcher.format({str(self.stock.id): ["2", "1"]}))
+
+    async def test_stream_sends_current_prices_then_changes_until_max_age(self):
+        with self.settings(STOCK_PRICE_STREAM_MAX_AGE=1, STOCK_PRICE_STREAM_HEARTBEAT=10):
+            response = await self.async_client.get(
+                reverse("stock-prices-stream"), {"ticket": "ticket"}
+            )
+            self.assertEqual(response["Content-Type"], "text/event-stream")
+            events = response.streaming_content
+
+            await events.__anext__()
+            first = await events.__anext__()
+            hub.dispatch({str(self.stock.id): ["120.00", "80.00"]})
+            second = await events.__anext__()
+            rest = [event async for event in events]
+
+        self.assertIn(b'"110.00", "70.00"', first)
+        self.assertIn(b'"120.00", "80.00"', second)
+        self.assertEqual(rest, [])
+        self.assertEqual(hub.watchers, set())
+
+    async def test_hub_fans_out_published_prices(self):
+        redis_client = get_redis_client()
+        try:
+            redis_client.ping()
+        except redis.RedisError:
+            self.skipTest("Redis isn't available.")
+        watcher = hub.watch([self.stock.id])
+        try:
+            for _ in range(100):
+                if redis_client.pubsub_numsub(PRICES_CHANNEL)[0][1]:
+                    break
+                await asyncio.sleep(0.01)
+
+            with mock.patch("stocks.stream.get_redis_client", return_value=redis_client):
+                publish_prices({self.stock.id: (Decimal("1.50"), Decimal("1.40"))})
+            await asyncio.wait_for(watcher.changed.wait(), timeout=5)
+        finally:
+            hub.unwatch(watcher)
+            await asyncio.sleep(0)
+
+        self.assertEqual(watcher.drain(), {str(self.stock.id): ["1.50", "1.40"]})
+
+    def test_stream_needs_authentication(self):
+        response = self.client.get(reverse("stock-prices-stream"))
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_used_or_expired_ticket_is_refused(self):
+        self.redis_client.getdel.return_value = None
+
+        response = self.client.get(reverse("stock-prices-stream"), {"ticket": "used"})
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.redis_client.getdel.assert_called_once_with("stocks:stream-ticket:used")
+
+    def test_ticket_is_issued_to_authenticated_user(self):
+        client = APIClient()
+        self.assertEqual(
+            client.post(reverse("stock-prices-stream-ticket")).status_code,
+            status.HTTP_403_FORBIDDEN,
+        )
+
+        client.credentials(HTTP_AUTHORIZATION="Bearer " + self.token)
+        response = client.post(reverse("stock-prices-stream-ticket"))
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.redis_client.set.assert_called_once_with(
+            f"stocks:stream-ticket:{response.data['ticket']}", self.user.id, ex=30
+        )
+
+    def test_saved_stock_is_published_only_when_prices_changed(self):
+        stock = Stock.objects.get(id=self.stock.id)
+        with mock.patch("stocks.signals.publish_prices") as publish:
+            with self.captureOnCommitCallbacks(execute=True):
+                stock.available_quantity = 5
+                stock.save()
+            publish.assert_not_called()
+
+            with self.captureOnCommitCallbacks(execute=True):
+                stock.price_per_unit_sail = Decimal(111)
+                stock.save()
+                stock.save()
+            publish.assert_called_once_with({stock.id: (Decimal(111), Decimal(70))})
+
+    @override_settings(STOCK_PRICE_STREAM_ENABLED=False)
+    def test_disabled_stream_is_not_found(self):
+        response = self.client.get(reverse("stock-prices-stream"), {"ticket": "ticket"})
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class PriceConflatorTests(SimpleTestCase):
+    def setUp(self):
+        self.now = 0.0
+        self.conflator = PriceConflator(window_ms=100, max_batch=3, clock=lambda: self.now)
+
+    def tick(self, symbol, price):
+        return {"symbol": symbol, "sell_price": price, "buy_price": price}
+
+    def test_keeps_latest_tick_per_symbol_until_window_closes(self):
+        self.conflator.add([self.tick("A", 1), self.tick("B", 1)])
+        self.now = 0.05
+        self.conflator.add([self.tick("A", 2)])
+        self.assertFalse(self.conflator.is_ready())
+
+        self.now = 0.1
+        self.assertTrue(self.conflator.is_ready())
+        self.assertEqual(self.conflator.drain(), {"A": (200, 200), "B": (100, 100)})
+        self.assertEqual(self.conflator.stats(), {"received": 3, "conflated": 1, "written": 2})
+        self.assertFalse(self.conflator.is_ready())
+        self.assertEqual(self.conflator.time_left(), 0.1)
+
+    def test_add_batch_conflates_by_symbol_id(self):
+        self.conflator.add_batch(
+            PriceBatch(array("I", [1, 2, 1]), array("q", [10, 20, 11]), array("q", [9, 19, 10]))
+        )
+
+        self.assertEqual(self.conflator.drain(), {1: (11, 10), 2: (20, 19)})
+        self.assertEqual(self.conflator.stats(), {"received": 3, "conflated": 1, "written": 2})
+
+    def test_is_ready_at_max_batch(self):
+        self.conflator.add([self.tick("A", 1), self.tick("B", 1), self.tick("C", 1)])
+
+        self.assertTrue(self.conflator.is_ready())
+
+
+class SyncSymbolsTests(TestCase):
+    stock_service = StockService()
+
+    def setUp(self):
+        self.stock = Stock.objects.create(
+            name="test Stock 1",
+            symbol="tFS1",
+            price_per_unit_sail=110,
+            price_per_unit_buy=70,
+            available_quantity=10,
+        )
+
+    def test_sync_symbols_publishes_only_changes_since_last_version(self):
+        first = self.stock_service.sync_symbols()
+        self.assertEqual(
+            first,
+            {
+                "version": 1,
+                "base_version": 0,
+                "added": ["tFS1"],
+                "removed": [],
+                "ids": {"tFS1": self.stock.id},
+            },
+        )
+        self.assertIsNone(self.stock_service.sync_symbols())
+
+        self.stock.delete()
+        second = self.stock_service.sync_symbols()
+
+        self.assertEqual(
+            second,
+            {"version": 2, "base_version": 1, "added": [], "removed": ["tFS1"], "ids": {}},
+        )
+        self.assertEqual(
+            list(OutboxMessage.objects.values_list("key", "value__version").order_by("id")),
+            [(StockService.STOCK_SYMBOLS_KEY, 1), (StockService.STOCK_SYMBOLS_KEY, 2)],
+        )
+
+
+class KafkaConnectionTests(SimpleTestCase):
+    def setUp(self):
+        kafka_service.reset_producer()
+        self.addCleanup(kafka_service.reset_producer)
+
+    @mock.patch("kafka.KafkaProducer")
+    def test_producer_is_created_on_first_use_and_shared(self, producer_class):
+        stock_services = [StockService(), StockService()]
+        producer_class.assert_not_called()
+
+        for stock_service in stock_services:
+            stock_service.kafka_service.producer.send("stock_symbols", value={})
+
+        producer_class.assert_called_once()
+        self.assertEqual(producer_class.return_value.send.call_count, 2)
+
+        kafka_service.close_producer()
+        producer_class.return_value.close.assert_called_once_with()
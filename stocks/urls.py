@@ -1,8 +1,17 @@
 from django.urls import path
 
-from .views import StockDetailView, StockView
+from .views import (StockCandlesView, StockDetailView, StockPricesStreamTicketView, StockPricesView,
+                    StockView, stock_prices_stream)
 
 urlpatterns = [
     path("all/", StockView.as_view(), name="all-stocks"),
     path("<int:pk>", StockDetailView.as_view(), name="stock-detail"),
+    path("prices", StockPricesView.as_view(), name="stock-prices"),
+    path("prices/stream", stock_prices_stream, name="stock-prices-stream"),
+    path(
+        "prices/stream/ticket",
+        StockPricesStreamTicketView.as_view(),
+        name="stock-prices-stream-ticket",
+    ),
+    path("<int:pk>/candles", StockCandlesView.as_view(), name="stock-candles"),
 ]
@@ -1,9 +1,27 @@
+from typing import Optional
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.http import JsonResponse, StreamingHttpResponse
 from rest_framework import status, views
+from rest_framework.exceptions import AuthenticationFailed, ParseError
 from rest_framework.permissions import AllowAny, IsAdminUser
 from rest_framework.response import Response
 
+from base.container import container
+from user_management.authentication import JWTAuthentication
+from user_management.permissions import IsAuthenticated
+
 from .models import Stock
-from .serializers import StockSerializer
+from .serializers import StockCandleSerializer, StockPriceSerializer, StockSerializer
+from .services import StockPriceHistoryService, StockService
+from .stream import hub, issue_ticket, redeem_ticket, to_message
+
+PRICE_FIELDS = {"price_per_unit_sail", "price_per_unit_buy"}
+
+User = get_user_model()
 
 
 class StockView(views.APIView):
@@ -20,11 +38,11 @@ class StockView(views.APIView):
     def post(self, request):
         serializer = StockSerializer(data=request.data)
         if serializer.is_valid():
-            serializer.save()
+            stock = container.get(StockService).create(**serializer.validated_data)
             return Response(
                 {
                     "message": "Stock was created successfully.",
-                    "stock": serializer.data,
+                    "stock": StockSerializer(stock).data,
                 },
                 status=status.HTTP_201_CREATED,
             )
@@ -48,15 +66,22 @@ class StockDetailView(views.APIView):
             )
 
     def put(self, request, pk):
-        try:
-            stock = Stock.objects.get(pk=pk)
-        except Stock.DoesNotExist:
-            return Response(status=status.HTTP_404_NOT_FOUND)
+        with transaction.atomic():
+            try:
+                # locked before numbering, so later changes of the stock get larger values
+                stock = Stock.objects.select_for_update().get(pk=pk)
+            except Stock.DoesNotExist:
+                return Response(status=status.HTTP_404_NOT_FOUND)
 
-        serializer = StockSerializer(stock, data=request.data, partial=True)
-        if serializer.is_valid():
-            serializer.save()
-            return Response(serializer.data)
+            serializer = StockSerializer(stock, data=request.data, partial=True)
+            if serializer.is_valid():
+                if PRICE_FIELDS.intersection(serializer.validated_data):
+                    # numbered for clients of the delta prices endpoint
+                    change = container.get(StockService).next_price_change()
+                    serializer.save(**change._asdict())
+                else:
+                    serializer.save()
+                return Response(serializer.data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
     def delete(self, request, pk):
@@ -67,3 +92,121 @@ class StockDetailView(views.APIView):
             return Response(status=status.HTTP_204_NO_CONTENT)
         except Stock.DoesNotExist:
             return Response(status=status.HTTP_404_NOT_FOUND)
+
+
+class StockPricesView(views.APIView):
+    permission_classes = [AllowAny]
+
+    def get(self, request):
+        since = request.query_params.get("since")
+        if since is not None:
+            try:
+                since = int(since)
+            except ValueError:
+                return Response(
+                    {"message": "since must be a number."}, status=status.HTTP_400_BAD_REQUEST
+                )
+        stocks, deleted, seq = container.get(StockService).get_prices_since(since)
+        serializer = StockPriceSerializer(stocks, many=True)
+        return Response({"seq": seq, "prices": serializer.data, "deleted": deleted})
+
+
+class StockCandlesView(views.APIView):
+    permission_classes = [AllowAny]
+    DEFAULT_LIMIT = 100
+    MAX_LIMIT = 1000
+
+    def get(self, request, pk):
+        interval = request.query_params.get("interval", "1m")
+        if interval not in StockPriceHistoryService.INTERVALS:
+            return Response(
+                {"message": f"interval must be one of {list(StockPriceHistoryService.INTERVALS)}."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        try:
+            limit = min(int(request.query_params.get("limit", self.DEFAULT_LIMIT)), self.MAX_LIMIT)
+        except ValueError:
+            return Response(
+                {"message": "limit must be a number."}, status=status.HTTP_400_BAD_REQUEST
+            )
+        if not Stock.objects.filter(pk=pk).exists():
+            return Response(
+                {"message": f"Stock/{pk} does't exist."}, status=status.HTTP_404_NOT_FOUND
+            )
+
+        candles = container.get(StockPriceHistoryService).get_candles(pk, interval, max(limit, 1))
+        serializer = StockCandleSerializer(candles, many=True)
+        return Response({"interval": interval, "candles": serializer.data})
+
+
+class StockPricesStreamTicketView(views.APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        if not settings.STOCK_PRICE_STREAM_ENABLED:
+            return Response(
+                {"message": "Price streams are disabled."}, status=status.HTTP_404_NOT_FOUND
+            )
+        ticket = issue_ticket(request.user.id)
+        return Response(
+            {"ticket": ticket, "expires_in": settings.STOCK_PRICE_STREAM_TICKET_TTL},
+            status=status.HTTP_201_CREATED,
+        )
+
+
+async def authenticate_stream(request) -> Optional[int]:
+    """Return the ID of the active user opening a stream, by ticket or by JWT header."""
+    ticket = request.GET.get("ticket")
+    if ticket:
+        user_id = await sync_to_async(redeem_ticket)(ticket)
+        if user_id is None:
+            return None
+        user = await User.objects.filter(id=user_id, is_active=True).afirst()
+    else:
+        try:
+            authenticated = await sync_to_async(JWTAuthentication().authenticate)(request)
+        except (AuthenticationFailed, ParseError):
+            authenticated = None
+        user = authenticated[0] if authenticated is not None else None
+    return user.id if user is not None else None
+
+
+async def stock_prices_stream(request):
+    """
+    Stream prices of the stocks the user is subscribed to as Server-Sent Events:
+    the current prices first, then changes as they are saved. Needs an ASGI server.
+    EventSource can't send headers, so browsers pass a ticket taken from
+    prices/stream/ticket as the ticket parameter; a ticket opens one stream, so clients take
+    a new one to reconnect.
+    """
+    if not settings.STOCK_PRICE_STREAM_ENABLED:
+        return JsonResponse(
+            {"message": "Price streams are disabled."}, status=status.HTTP_404_NOT_FOUND
+        )
+    user_id = await authenticate_stream(request)
+    if user_id is None:
+        return JsonResponse(
+            {"message": "Authentication credentials were not provided or are invalid."},
+            status=status.HTTP_401_UNAUTHORIZED,
+        )
+    stock_service = container.get(StockService)
+    prices = await sync_to_async(stock_service.get_subscription_prices)(user_id)
+
+    async def events():
+        watcher = hub.watch(prices)
+        try:
+            async for event in watcher.events(
+                heartbeat=settings.STOCK_PRICE_STREAM_HEARTBEAT,
+                min_interval=settings.STOCK_PRICE_STREAM_MIN_INTERVAL_MS / 1000,
+                max_age=settings.STOCK_PRICE_STREAM_MAX_AGE,
+                initial=to_message(prices),
+            ):
+                yield event
+        finally:
+            hub.unwatch(watcher)
+
+    response = StreamingHttpResponse(events(), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    # keep nginx from buffering events
+    response["X-Accel-Buffering"] = "no"
+    return response
@@ -1,7 +1,8 @@
 import os
 
 from celery import Celery
-from celery.signals import worker_process_init
+from celery.signals import (task_postrun, task_prerun, worker_process_init, worker_process_shutdown,
+                            worker_ready)
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "trading_platform.settings")
 app = Celery("trading_platform")
@@ -10,23 +11,67 @@ app.config_from_object("django.conf:settings", namespace="CELERY")
 app.autodiscover_tasks()
 
 
-@worker_process_init.connect
+@worker_ready.connect
 def on_worker_startup(**kwargs):
     """Run the task 1 time when the worker is ready.
-    Syncronise stocks in the Django db with MongoDB."""
+    Syncronise stocks in the Django db with MongoDB: only symbols changed since the last
+    published version are sent, so restarts and extra workers publish nothing."""
+
+    from stocks.tasks import sync_stock_symbols
+
+    sync_stock_symbols.delay()
+
+
+@worker_process_init.connect
+def on_worker_process_init_kafka(**kwargs):
+    """Connect to Kafka in the child process on first use, not with the parent's producer."""
+    from kafka_service.kafka_service import reset_producer
+
+    reset_producer()
+
+
+@worker_process_shutdown.connect
+def on_worker_process_shutdown(**kwargs):
+    """Flush messages sent by tasks of the process before it exits."""
+    from kafka_service.kafka_service import close_producer
 
-    from stocks.tasks import send_stock_symbols_to_kafka
+    close_producer()
 
-    send_stock_symbols_to_kafka.delay()
 
+_identity_map_tokens = {}
 
+
+@task_prerun.connect
+def on_task_prerun(task_id=None, **kwargs):
+    """Share loaded objects between services for the duration of one task."""
+    from base import identity_map
+
+    _identity_map_tokens[task_id] = identity_map.open_scope()
+
+
+@task_postrun.connect
+def on_task_postrun(task_id=None, **kwargs):
+    from base import identity_map
+
+    token = _identity_map_tokens.pop(task_id, None)
+    if token is not None:
+        identity_map.close_scope(token)
+
+
+# runs are guarded by lease locks, so the schedule may be shorter than a run.
+# Stock prices are ingested by the ingest_prices command, not by a periodic task.
 app.conf.beat_schedule = {
-    "check_open_orders_every_minute": {
+    "check_open_orders": {
         "task": "orders.tasks.check_open_orders",
-        "schedule": 60.0,
+        "schedule": float(os.environ.get("CHECK_OPEN_ORDERS_INTERVAL", 5.0)),
+    },
+    # picks up messages whose relay task was lost, e.g. when the broker was down
+    "relay_outbox": {
+        "task": "kafka_service.tasks.relay_outbox",
+        "schedule": float(os.environ.get("OUTBOX_RELAY_INTERVAL", 30.0)),
     },
-    "update_stock_prices_every_minute": {
-        "task": "stocks.tasks.update_stock_prices",
-        "schedule": 60.0,
+    "prune_price_history": {
+        "task": "stocks.tasks.prune_price_history",
+        "schedule": float(os.environ.get("STOCK_PRICE_HISTORY_PRUNE_INTERVAL", 3600.0)),
     },
 }
@@ -25,6 +25,7 @@ INSTALLED_APPS = [
     "orders.apps.OrdersConfig",
     "inventory.apps.InventoryConfig",
     "stocks.apps.StocksConfig",
+    "kafka_service.apps.KafkaServiceConfig",
     "rest_framework",
 ]
 
@@ -36,6 +37,7 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "base.middleware.IdentityMapMiddleware",
 ]
 
 ROOT_URLCONF = "trading_platform.urls"
@@ -57,6 +59,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = "trading_platform.wsgi.application"
+ASGI_APPLICATION = "trading_platform.asgi.application"
 
 DATABASES = {
     "default": {
@@ -133,6 +136,61 @@ CELERY_IMPORTS = [
     "orders.tasks",
 ]
 
+REDIS_URL = os.environ.get("REDIS_URL", CELERY_BROKER_URL)
+
+ORDER_TRIGGER_CHUNK_SIZE = int(os.environ.get("ORDER_TRIGGER_CHUNK_SIZE", 1000))
+ORDER_TRIGGER_PARTITIONS = int(os.environ.get("ORDER_TRIGGER_PARTITIONS", 8))
+ORDER_TRIGGER_INDEX_ENABLED = os.environ.get("ORDER_TRIGGER_INDEX_ENABLED", "False") == "True"
+
+# lease of the locks that keep periodic runs from overlapping, in seconds
+ORDER_CHECK_LOCK_TTL = int(os.environ.get("ORDER_CHECK_LOCK_TTL", 60))
+# re-checks of stocks whose partitions were busy, before leaving them to the periodic check
+ORDER_CHECK_MAX_RETRIES = int(os.environ.get("ORDER_CHECK_MAX_RETRIES", 5))
+
+# consumer processes and batching of the ingest_prices daemon
+STOCK_PRICES_INGEST_PROCESSES = int(os.environ.get("STOCK_PRICES_INGEST_PROCESSES", 1))
+STOCK_PRICES_MAX_RECORDS = int(os.environ.get("STOCK_PRICES_MAX_RECORDS", 500))
+STOCK_PRICES_POLL_TIMEOUT_MS = int(os.environ.get("STOCK_PRICES_POLL_TIMEOUT_MS", 100))
+STOCK_PRICES_CONFLATION_WINDOW_MS = int(os.environ.get("STOCK_PRICES_CONFLATION_WINDOW_MS", 100))
+STOCK_PRICES_CONFLATION_MAX_BATCH = int(os.environ.get("STOCK_PRICES_CONFLATION_MAX_BATCH", 5000))
+# how often the daemon logs its tick counters, in seconds
+STOCK_PRICES_STATS_INTERVAL = int(os.environ.get("STOCK_PRICES_STATS_INTERVAL", 60))
+
+# publishing of the Kafka outbox
+OUTBOX_RELAY_BATCH_SIZE = int(os.environ.get("OUTBOX_RELAY_BATCH_SIZE", 500))
+OUTBOX_RELAY_FLUSH_TIMEOUT = int(os.environ.get("OUTBOX_RELAY_FLUSH_TIMEOUT", 30))
+
+# retention of price history; 1d candles are kept forever
+STOCK_TICKS_RETENTION_HOURS = int(os.environ.get("STOCK_TICKS_RETENTION_HOURS", 24))
+STOCK_CANDLES_RETENTION_DAYS = {
+    "1m": int(os.environ.get("STOCK_CANDLES_1M_RETENTION_DAYS", 7)),
+    "5m": int(os.environ.get("STOCK_CANDLES_5M_RETENTION_DAYS", 30)),
+    "1h": int(os.environ.get("STOCK_CANDLES_1H_RETENTION_DAYS", 365)),
+}
+
+# directory of the per symbol tick archive written by ingest_prices; empty disables it
+STOCK_TICK_ARCHIVE_DIR = os.environ.get("STOCK_TICK_ARCHIVE_DIR", "")
+
+# memory-mapped table of the latest prices shared by processes of a host, e.g. a file in
+# /dev/shm; empty disables it. Stocks with ids from the capacity on are read from the database.
+STOCK_PRICE_TABLE_PATH = os.environ.get("STOCK_PRICE_TABLE_PATH", "")
+STOCK_PRICE_TABLE_CAPACITY = int(os.environ.get("STOCK_PRICE_TABLE_CAPACITY", 100000))
+
+# Server-Sent Events of price changes, published through Redis pub/sub
+# needs the ASGI server; off by default, like other optional price features
+STOCK_PRICE_STREAM_ENABLED = os.environ.get("STOCK_PRICE_STREAM_ENABLED", "False") == "True"
+# seconds a ticket taken to open a stream stays valid
+STOCK_PRICE_STREAM_TICKET_TTL = int(os.environ.get("STOCK_PRICE_STREAM_TICKET_TTL", 30))
+# seconds without events before a heartbeat comment
+STOCK_PRICE_STREAM_HEARTBEAT = int(os.environ.get("STOCK_PRICE_STREAM_HEARTBEAT", 15))
+# seconds before a stream ends and its client reconnects
+STOCK_PRICE_STREAM_MAX_AGE = int(os.environ.get("STOCK_PRICE_STREAM_MAX_AGE", 300))
+# minimum time between two events of a connection; changes in between are conflated
+STOCK_PRICE_STREAM_MIN_INTERVAL_MS = int(os.environ.get("STOCK_PRICE_STREAM_MIN_INTERVAL_MS", 250))
+
+# how often an unknown symbol in the price feed may reload the symbol map, in seconds
+STOCK_SYMBOL_MAP_REFRESH_INTERVAL = int(os.environ.get("STOCK_SYMBOL_MAP_REFRESH_INTERVAL", 60))
+
 LOGGING = {
     "version": 1,
     "disable_existing_loggers": False,
@@ -6,6 +6,8 @@ from django.contrib.auth import get_user_model
 from rest_framework import authentication
 from rest_framework.exceptions import AuthenticationFailed, ParseError
 
+from base import identity_map
+
 User = get_user_model()
 
 
@@ -28,6 +30,7 @@ class JWTAuthentication(authentication.BaseAuthentication):
             user = User.objects.get(username=username)
         except User.DoesNotExist as exc:
             raise AuthenticationFailed(f"User with username - {username} not found") from exc
+        identity_map.add(user)
         return user, payload
 
     @staticmethod
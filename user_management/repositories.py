@@ -1,6 +1,7 @@
-from typing import Type
+from typing import Optional, Type
 
 from django.core.exceptions import ObjectDoesNotExist
+from django.db.models import F
 
 from base.repositories import BaseRepository
 from user_management.exceptions import AuthenticationFailedException, SubtractBalanceException
@@ -123,10 +124,9 @@ class UserRepository(BaseRepository):
         - value_to_add (Union[int, float]): The value to be added to the balance.
 
         Returns:
-        - Union[int, float]: The updated balance of the user.
+        - None.
         """
-        new_balance = user.balance + value_to_add
-        self.set_new_balance(user, new_balance)
+        self.credit_balance(user.id, value_to_add, user=user)
 
     def subtract_from_balance(self, user: User, value_to_subtract: float) -> None:
         """
@@ -137,12 +137,47 @@ class UserRepository(BaseRepository):
         - value_to_subtract (Union[int, float]): The value to be subtracted from the balance.
 
         Returns:
-        - Union[int, float]: The updated balance of the user.
+        - None.
 
         Raises:
         - SubtractBalanceException: If the user has an insufficient balance.
         """
-        if user.balance < value_to_subtract:
+        if not self.debit_balance(user.id, value_to_subtract, user=user):
             raise SubtractBalanceException("Insufficient balance.")
-        new_balance = user.balance - value_to_subtract
-        self.set_new_balance(user, new_balance)
+
+    def credit_balance(self, user_id: int, value: float, user: Optional[User] = None) -> bool:
+        """
+        Add a value to the balance of a user in one UPDATE statement.
+
+        Args:
+        - user_id (int): The ID of the user.
+        - value (Union[int, float]): The value to be added to the balance.
+        - user (User, optional): Loaded user object to keep in sync.
+
+        Returns:
+        - bool: True if the balance was updated.
+        """
+        updated = self.model.objects.filter(id=user_id).update(balance=F("balance") + value)
+        if updated:
+            self.sync_loaded(user_id, "balance", value, obj=user)
+        return bool(updated)
+
+    def debit_balance(self, user_id: int, value: float, user: Optional[User] = None) -> bool:
+        """
+        Subtract a value from the balance of a user if the balance is enough,
+        in one conditional UPDATE statement.
+
+        Args:
+        - user_id (int): The ID of the user.
+        - value (Union[int, float]): The value to be subtracted from the balance.
+        - user (User, optional): Loaded user object to keep in sync.
+
+        Returns:
+        - bool: True if the balance was enough and was updated.
+        """
+        updated = self.model.objects.filter(id=user_id, balance__gte=value).update(
+            balance=F("balance") - value
+        )
+        if updated:
+            self.sync_loaded(user_id, "balance", -value, obj=user)
+        return bool(updated)
@@ -4,8 +4,10 @@ from base.services import BaseService
 from user_management.authentication import JWTAuthentication
 from user_management.exceptions import (
     AuthenticationFailedException,
+    ChangeBalanceException,
     DoNotBlockException,
     DoNotUnblockException,
+    SubtractBalanceException,
 )
 from user_management.models import CustomUser as User
 from user_management.repositories import UserRepository
@@ -196,8 +198,8 @@ class UserService(BaseService):
         Returns:
         - None.
         """
-        user = self.repository.get_by_id(user_id)
-        self.repository.add_to_balance(user, value_to_add)
+        if not self.repository.credit_balance(user_id, value_to_add):
+            raise ChangeBalanceException(f"Object of <{User.__name__}> by this obj_id not exist.")
 
     def subtract_from_balance(self, user_id: int, value_to_subtract: None) -> None:
         """
@@ -213,8 +215,8 @@ class UserService(BaseService):
         Raises:
         - SubtractBalanceException: If the user has an insufficient balance.
         """
-        user = self.repository.get_by_id(user_id)
-        self.repository.subtract_from_balance(user, value_to_subtract)
+        if not self.repository.debit_balance(user_id, value_to_subtract):
+            raise SubtractBalanceException("Insufficient balance.")
 
     def authentificate_user(self, username: str, password: str) -> str:
         """
@@ -0,0 +1,39 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+
+from base import identity_map
+from user_management.exceptions import SubtractBalanceException
+from user_management.services import UserService
+
+User = get_user_model()
+
+
+class ConditionalBalanceUpdateTestCase(TestCase):
+    user_service = UserService()
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="user_test", password="user_password", email="user_test@gmail.com"
+        )
+        self.user.balance = 100
+        self.user.save()
+
+    def test_debit_balance_is_one_statement(self):
+        with self.assertNumQueries(1):
+            self.assertTrue(self.user_service.repository.debit_balance(self.user.id, 40))
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.balance, 60)
+
+    def test_debit_balance_not_applied_when_insufficient(self):
+        self.assertFalse(self.user_service.repository.debit_balance(self.user.id, 101))
+        with self.assertRaises(SubtractBalanceException):
+            self.user_service.subtract_from_balance(self.user.id, 101)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.balance, 100)
+
+    def test_loaded_user_is_kept_in_sync(self):
+        with identity_map.scope():
+            user = self.user_service.get_by_id(self.user.id)
+            self.user_service.subtract_from_balance(self.user.id, 30)
+            self.user_service.add_to_balance(self.user.id, 5)
+            self.assertEqual(user.balance, 75)
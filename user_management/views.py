@@ -4,6 +4,7 @@ from rest_framework.generics import RetrieveUpdateAPIView
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from base.container import container
 from stocks.serializers import StockSerializer
 from stocks.services import StockService
 from user_management.permissions import IsAdmin, IsAuthenticated, IsUser
@@ -13,9 +14,6 @@ from user_management.services import UserService
 
 User = get_user_model()
 
-user_service = UserService()
-stock_service = StockService()
-
 
 class ObtainTokenView(APIView):
     """
@@ -36,6 +34,7 @@ class ObtainTokenView(APIView):
         """
         serializer = self.serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
+        user_service = container.get(UserService)
         jwt_token = user_service.authentificate_user(**serializer.validated_data)
         return Response({"token": jwt_token})
 
@@ -59,6 +58,7 @@ class UserRegistrationView(APIView):
         """
         serializer = self.serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
+        user_service = container.get(UserService)
         user = user_service.register_user(**serializer.validated_data)
         jwt_token = user_service.authentificate_user(
             username=user.username, password=serializer.validated_data.get("password")
@@ -91,6 +91,7 @@ class ResetPasswordView(APIView):
         """
         serializer = self.serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
+        user_service = container.get(UserService)
         user = user_service.reset_password(**serializer.validated_data)
         jwt_token = user_service.authentificate_user(
             username=user.username, password=serializer.validated_data.get("new_password")
@@ -119,6 +120,7 @@ class UsersView(APIView):
         Returns:
         - Response: JSON response containing a list of users.
         """
+        user_service = container.get(UserService)
         users = user_service.get_all()
         users = self.serializer(users, many=True).data
         return Response({"users": users})
@@ -142,6 +144,7 @@ class BlockUserView(RetrieveUpdateAPIView):
         Returns:
         - Response: JSON response confirming the successful blocking of the user.
         """
+        user_service = container.get(UserService)
         user_service.block_user(user_id=kwargs.get("pk"))
         return Response({"message": "User blocked successfully."}, status=status.HTTP_200_OK)
 
@@ -164,6 +167,7 @@ class UnblockUserView(RetrieveUpdateAPIView):
         Returns:
         - Response: JSON response confirming the successful unblocking of the user.
         """
+        user_service = container.get(UserService)
         user_service.unblock_user(user_id=kwargs.get("pk"))
         return Response({"message": "User unblocked successfully."}, status=status.HTTP_200_OK)
 
@@ -184,6 +188,7 @@ class BalanceView(APIView):
         Returns:
         - Response: JSON response containing the user's balance.
         """
+        user_service = container.get(UserService)
         balance = user_service.get_user_balance(user_id=request.user.id)
         return Response({"balance": balance})
 
@@ -206,6 +211,7 @@ class ChangeBalanceView(APIView):
         Returns:
         - Response: JSON response containing the balance of the specified user.
         """
+        user_service = container.get(UserService)
         balance = user_service.get_user_balance(user_id=pk)
         return Response({"balance": balance})
 
@@ -222,6 +228,7 @@ class ChangeBalanceView(APIView):
         """
         serializer = self.serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
+        user_service = container.get(UserService)
         new_balance = user_service.change_balance(user_id=pk, **serializer.validated_data)
         return Response(
             {
@@ -248,6 +255,7 @@ class SubscriptionsView(APIView):
         Returns:
         - Response: JSON response containing the list of user-subscribed stocks.
         """
+        stock_service = container.get(StockService)
         user_subscribed_stocks = stock_service.get_all_user_subscriptions(user_id=request.user.id)
         return Response(
             {
@@ -274,6 +282,7 @@ class SubscribeToStockView(APIView):
         Returns:
         - Response: JSON response indicating the subscription status for the stock.
         """
+        stock_service = container.get(StockService)
         stock = stock_service.get_by_id(pk)
         subscribed = stock_service.check_subscription(user_id=request.user.id, stock_id=pk)
         if subscribed:
@@ -294,6 +303,7 @@ class SubscribeToStockView(APIView):
         Returns:
         - Response: JSON response confirming successful subscription to the stock.
         """
+        stock_service = container.get(StockService)
         stock_service.create_subscription(user_id=request.user.id, stock_id=pk)
         return Response(
             {"message": "Subscribed to the stock successfully."}, status=status.HTTP_201_CREATED
@@ -310,5 +320,6 @@ class SubscribeToStockView(APIView):
         Returns:
         - Response: JSON response confirming successful unsubscription from the stock.
         """
+        stock_service = container.get(StockService)
         stock_service.remove_subscription(user_id=request.user.id, stock_id=pk)
         return Response({"message": "Unsubscribed from the stock successfully."})